@@ -1,17 +1,27 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Query, Body, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
 import uuid
-import subprocess
-import os
-import json
 import logging
 import shutil
+import time
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-import asyncio
+
+from api.events import KEEPALIVE_INTERVAL, STATUS_EVENT, ScanEventBus, format_sse
+from api.store import FINISHED_STATUSES, ScanStore
+from api.workers import ScanWorkerPool
+from scansible.core.hostindex import HostIndex, forget_host_index, get_host_index, host_summary, index_path
+from scansible.core.model import load_scan_result, model_path, to_record
+from scansible.core.ndjson import REPORT_FORMATS
+from scansible.core.parser import TemplateParser
+from scansible.core.scanner import REPORT_NAME, Scanner
+from scansible.core.summary import summary_path
+from scansible.core.tools import get_tool_registry
+from scansible.utils.config import Config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,10 +33,39 @@ TEMPLATES_DIR = BASE_DIR / "scansible" / "templates"
 REPORTS_DIR = BASE_DIR / "reports"
 SCANS_DIR = BASE_DIR / "scans"
 
+# Share of the progress bar covered by the scan commands themselves
+SCAN_PERCENT_START = 20
+SCAN_PERCENT_END = 80
+
+# Media types of the report files served by the API
+REPORT_MEDIA_TYPES = {
+    ".json": "application/json",
+    ".ndjson": "application/x-ndjson",
+    ".ndjson.gz": "application/gzip",
+}
+
+# Placeholder AI report, written next to the scan report
+AI_REPORT_NAME = f"{REPORT_NAME}_ai_report.pdf"
+
 # Ensure directories exist
 REPORTS_DIR.mkdir(exist_ok=True)
 SCANS_DIR.mkdir(exist_ok=True)
 
+# Shared, disk-cached registry of installed tools
+tool_registry = get_tool_registry(Config().get_cache_dir() / "tools.json")
+
+# Compiled templates, used to serve the real tag set
+template_parser = TemplateParser(TEMPLATES_DIR, Config().get_cache_dir() / "templates.json")
+
+# Status changes and host results pushed to the clients following scans
+scan_events = ScanEventBus(Config().get("event_queue_size"))
+
+# Scan history, kept across restarts; every change is also pushed as an event
+scan_store = ScanStore(Config().get("scan_db_path"), on_change=scan_events.publish_status)
+
+# Scans run in-process on a fixed number of workers; further requests wait in the queue
+scan_workers = ScanWorkerPool(Config().get("api_workers"))
+
 # Create FastAPI app
 app = FastAPI(
     title="Scansible API",
@@ -50,14 +89,33 @@ class ScanRequest(BaseModel):
     tags: List[str] = []
     generate_report: bool = True
     ai_enhanced_report: bool = False
+    executor: str = "auto"
+    incremental: bool = False
+    refresh: bool = False
+    auto_timing: bool = False
+    report_format: str = "json"
+    gzip: bool = False
 
     @validator('scan_type')
     def validate_scan_type(cls, v):
-        allowed_types = ["basic", "web", "infrastructure", "passive", "rustscan", "trivy", "light"]
+        allowed_types = ["basic", "web", "infrastructure", "passive", "rustscan", "trivy", "light", "pipeline"]
         if v not in allowed_types:
             raise ValueError(f"Scan type must be one of {allowed_types}")
         return v
     
+    @validator('executor')
+    def validate_executor(cls, v):
+        allowed_executors = ["auto", "direct", "parallel", "ansible"]
+        if v not in allowed_executors:
+            raise ValueError(f"Executor must be one of {allowed_executors}")
+        return v
+    
+    @validator('report_format')
+    def validate_report_format(cls, v):
+        if v not in REPORT_FORMATS:
+            raise ValueError(f"Report format must be one of {list(REPORT_FORMATS)}")
+        return v
+    
     @validator('target')
     def validate_target(cls, v):
         if not v or len(v.strip()) == 0:
@@ -73,8 +131,10 @@ class ScanStatus(BaseModel):
     end_time: Optional[str] = None
     percent: int = 0
     current_task: Optional[str] = None
+    eta: Optional[int] = None
     error: Optional[str] = None
     report_url: Optional[str] = None
+    summary: Dict[str, Any] = Field(default_factory=dict)
 
 class ScanSummary(BaseModel):
     id: str
@@ -84,186 +144,105 @@ class ScanSummary(BaseModel):
     start_time: str
     end_time: Optional[str] = None
     vulnerabilities_count: Dict[str, int] = Field(default_factory=dict)
+    summary: Dict[str, Any] = Field(default_factory=dict)
 
-# In-memory store for active scans (in production, use a database)
-active_scans = {}
-
-# Function to run scan in background
-async def run_scan(scan_id: str, scan_request: ScanRequest):
-    scan_dir = SCANS_DIR / scan_id
-    scan_dir.mkdir(exist_ok=True)
-    
-    report_path = REPORTS_DIR / f"{scan_id}.json"
-    
+# Function run by a scan worker
+def run_scan(scan_id: str, scan_request: ScanRequest, scanner: Scanner):
     try:
-        # Update scan status
-        active_scans[scan_id]["status"] = "running"
-        active_scans[scan_id]["percent"] = 10
-        active_scans[scan_id]["current_task"] = "Preparing scan"
-        
-        # Build command arguments
-        cmd = ["python", str(BASE_DIR / "main.py")]
-        cmd.append(scan_request.target)
-        cmd.extend(["--type", scan_request.scan_type])
-        
-        if scan_request.tags:
-            for tag in scan_request.tags:
-                cmd.extend(["--tags", tag])
+        # Update scan status; a scan deleted while it was queued is not run
+        if not scan_store.update(scan_id, status="running", percent=10, current_task="Preparing scan"):
+            logger.info(f"Scan {scan_id} was deleted before it started")
+            return
         
-        if not scan_request.generate_report:
-            cmd.append("--no-report")
+        # Scan-specific options; anything left unset falls back to the configuration
+        scan_config = {
+            "target": scan_request.target,
+            "scan_type": scan_request.scan_type,
+            "tags": scan_request.tags,
+            "generate_report": scan_request.generate_report,
+            "executor": scan_request.executor,
+            "incremental": scan_request.incremental,
+            "refresh": scan_request.refresh,
+            "auto_timing": scan_request.auto_timing,
+            "report_format": scan_request.report_format,
+            "compress": scan_request.gzip,
+            # The scanner works and writes in directories of this scan only
+            "scan_id": scan_id,
+            "work_dir": SCANS_DIR / scan_id,
+            "output_dir": scan_output_dir(scan_id),
+            "progress_callback": partial(update_scan_progress, scan_id),
+            "host_callback": partial(scan_events.publish_host, scan_id)
+        }
         
-        # Log the command
-        logger.info(f"Running scan command: {' '.join(cmd)}")
+        # Log the scan
+        logger.info(f"Running {scan_request.scan_type} scan {scan_id} on {scan_request.target}")
         
         # Update status
-        active_scans[scan_id]["current_task"] = "Running security scan"
-        active_scans[scan_id]["percent"] = 20
-        
-        # Run the scan process
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+        scan_store.update(scan_id, current_task="Running security scan", percent=SCAN_PERCENT_START)
         
-        stdout, stderr = await process.communicate()
+        result = scanner.run_scan(scan_config)
         
-        # Check if the process was successful
-        if process.returncode != 0:
-            logger.error(f"Scan failed with error: {stderr.decode()}")
-            active_scans[scan_id]["status"] = "failed"
-            active_scans[scan_id]["error"] = stderr.decode()
+        # Check if the scan was successful
+        if not result["success"]:
+            error = result.get("error", "Unknown error")
+            logger.error(f"Scan failed with error: {error}")
+            scan_store.update(scan_id, status="failed", error=error)
             return
         
-        # Process completed successfully
-        active_scans[scan_id]["percent"] = 80
-        active_scans[scan_id]["current_task"] = "Processing results"
+        # Scan completed successfully
+        scan_store.update(scan_id, percent=SCAN_PERCENT_END, eta=None, current_task="Processing results")
         
-        # Find the JSON report file
-        json_reports = list(REPORTS_DIR.glob("*.json"))
-        if json_reports:
-            # Use the most recent report
-            latest_report = max(json_reports, key=lambda p: p.stat().st_mtime)
-            
-            # Copy to reports directory with scan_id as name
-            shutil.copy(latest_report, report_path)
-            
-            # Parse vulnerabilities count if report exists
-            try:
-                vuln_count = count_vulnerabilities(report_path)
-                active_scans[scan_id]["vulnerabilities_count"] = vuln_count
-            except Exception as e:
-                logger.error(f"Error counting vulnerabilities: {str(e)}")
+        # The scanner returns the exact path of the report of this scan
+        report_path = Path(result["report_path"]) if result.get("report_path") else None
+        if report_path and report_path.exists():
+            # Summary statistics were gathered while the report was written
+            summary = result["summary"]
+            scan_store.update(scan_id, summary=summary, vulnerabilities_count=summary["severities"])
             
             # Generate AI-enhanced report if requested
             if scan_request.ai_enhanced_report and scan_request.generate_report:
-                active_scans[scan_id]["current_task"] = "Generating AI-enhanced report"
-                active_scans[scan_id]["percent"] = 90
+                scan_store.update(scan_id, current_task="Generating AI-enhanced report", percent=90)
                 
                 try:
-                    ai_report_path = REPORTS_DIR / f"{scan_id}_ai_report.pdf"
+                    ai_report_path = scan_output_dir(scan_id) / AI_REPORT_NAME
                     # Here you would call your AI report generation function
                     # Example: generate_ai_report(report_path, ai_report_path)
                     # For now, we'll simulate it
-                    await asyncio.sleep(2)  # Simulate AI processing
+                    time.sleep(2)  # Simulate AI processing
                     
                     # Create a dummy PDF report
                     with open(ai_report_path, "w") as f:
                         f.write("This is a placeholder for the AI report")
                         
-                    active_scans[scan_id]["report_url"] = f"/api/reports/{scan_id}/ai"
+                    scan_store.update(scan_id, report_url=f"/api/reports/{scan_id}/ai")
                 except Exception as e:
                     logger.error(f"Error generating AI report: {str(e)}")
         
         # Mark as completed
-        active_scans[scan_id]["status"] = "completed"
-        active_scans[scan_id]["percent"] = 100
-        active_scans[scan_id]["end_time"] = datetime.now().isoformat()
-        active_scans[scan_id]["report_url"] = f"/api/reports/{scan_id}"
+        scan_store.update(scan_id, status="completed", percent=100, end_time=datetime.now().isoformat(),
+                          report_url=f"/api/reports/{scan_id}")
         
     except Exception as e:
         logger.error(f"Error during scan: {str(e)}")
-        active_scans[scan_id]["status"] = "failed"
-        active_scans[scan_id]["error"] = str(e)
-        active_scans[scan_id]["percent"] = 0
+        scan_store.update(scan_id, status="failed", error=str(e), percent=0)
 
-def count_vulnerabilities(report_path):
-    """Count vulnerabilities by severity from a scan report"""
-    try:
-        with open(report_path, "r") as f:
-            report_data = json.load(f)
-        
-        # Initialize counters
-        counts = {
-            "CRITICAL": 0,
-            "HIGH": 0,
-            "MEDIUM": 0,
-            "LOW": 0,
-            "INFO": 0,
-            "UNKNOWN": 0
-        }
-        
-        # For Nmap reports
-        if "nmaprun" in report_data:
-            hosts = report_data.get("nmaprun", {}).get("host", [])
-            if not isinstance(hosts, list):
-                hosts = [hosts]
-            
-            for host in hosts:
-                ports = host.get("ports", {}).get("port", [])
-                if not isinstance(ports, list):
-                    ports = [ports]
-                
-                for port in ports:
-                    scripts = port.get("script", [])
-                    if not isinstance(scripts, list):
-                        scripts = [scripts]
-                    
-                    for script in scripts:
-                        if "@id" in script and script["@id"] == "vulners":
-                            # Process vulners script output for vulnerabilities
-                            if "table" in script:
-                                tables = script["table"]
-                                if not isinstance(tables, list):
-                                    tables = [tables]
-                                
-                                for table in tables:
-                                    if "elem" in table:
-                                        elems = table["elem"]
-                                        if not isinstance(elems, list):
-                                            elems = [elems]
-                                        
-                                        for elem in elems:
-                                            if "@key" in elem and elem["@key"] == "cvss":
-                                                cvss = float(elem.get("#text", "0"))
-                                                if cvss >= 9.0:
-                                                    counts["CRITICAL"] += 1
-                                                elif cvss >= 7.0:
-                                                    counts["HIGH"] += 1
-                                                elif cvss >= 4.0:
-                                                    counts["MEDIUM"] += 1
-                                                elif cvss > 0:
-                                                    counts["LOW"] += 1
-        
-        # For Trivy reports
-        elif "Results" in report_data:
-            results = report_data.get("Results", [])
-            
-            for result in results:
-                vulns = result.get("Vulnerabilities", [])
-                
-                for vuln in vulns:
-                    severity = vuln.get("Severity", "UNKNOWN").upper()
-                    if severity in counts:
-                        counts[severity] += 1
-                    else:
-                        counts["UNKNOWN"] += 1
-        
-        return counts
-    except Exception as e:
-        logger.error(f"Error counting vulnerabilities: {str(e)}")
-        return {"ERROR": str(e)}
+def update_scan_progress(scan_id: str, progress: Dict):
+    """Apply a progress snapshot of the scanner to the scan status"""
+    # Command execution is mapped onto the scanning part of the overall progress
+    span = SCAN_PERCENT_END - SCAN_PERCENT_START
+    fields = {
+        "percent": SCAN_PERCENT_START + int(span * progress.get("percent", 0) / 100),
+        "eta": progress.get("eta")
+    }
+    if progress.get("current_task"):
+        fields["current_task"] = progress["current_task"]
+    scan_store.update(scan_id, **fields)
+
+@app.on_event("shutdown")
+def close_scan_store():
+    # Queued scans are dropped; progress updates still waiting to be batched are written before exiting
+    scan_workers.shutdown(wait=False)
+    scan_store.close()
 
 # Routes
 @app.get("/")
@@ -271,7 +250,7 @@ async def root():
     return {"message": "Scansible API - Security Scanning Tool"}
 
 @app.post("/api/scans", status_code=status.HTTP_201_CREATED, response_model=ScanStatus)
-async def create_scan(scan_request: ScanRequest, background_tasks: BackgroundTasks):
+async def create_scan(scan_request: ScanRequest):
     # Generate a unique ID for this scan
     scan_id = str(uuid.uuid4())
     
@@ -284,39 +263,88 @@ async def create_scan(scan_request: ScanRequest, background_tasks: BackgroundTas
         "start_time": datetime.now().isoformat(),
         "end_time": None,
         "percent": 0,
-        "current_task": "Initializing",
+        "current_task": "Waiting for a worker",
+        "eta": None,
         "error": None,
         "report_url": None,
-        "vulnerabilities_count": {}
+        "vulnerabilities_count": {},
+        "summary": {}
     }
     
     # Store scan status
-    active_scans[scan_id] = scan_status
+    scan_store.create(scan_status)
     
-    # Run the scan in background
-    background_tasks.add_task(run_scan, scan_id, scan_request)
+    # Queue the scan for the next free worker
+    scan_workers.submit(partial(run_scan, scan_id, scan_request))
     
     return scan_status
 
 @app.get("/api/scans/{scan_id}", response_model=ScanStatus)
 async def get_scan_status(scan_id: str):
-    if scan_id not in active_scans:
+    scan = scan_store.get(scan_id)
+    if scan is None:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    return active_scans[scan_id]
+    return scan
 
-@app.get("/api/scans", response_model=List[ScanSummary])
-async def list_scans(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
-    # Convert active_scans to list and sort by start_time (newest first)
-    scans = list(active_scans.values())
-    scans.sort(key=lambda x: x["start_time"], reverse=True)
+def stream_events(request: Request, scan_id: Optional[str] = None) -> StreamingResponse:
+    """Stream the events of one scan, or of all scans, as server-sent events"""
+    async def events():
+        # Subscribed once the response starts, so that a client gone before then leaves no subscriber behind;
+        # the current state is read after subscribing, so that no change falls in between
+        subscription = scan_events.subscribe(scan_id)
+        try:
+            if scan_id:
+                scan = scan_store.get(scan_id)
+                if scan is None:
+                    # Deleted since the route checked it
+                    return
+                yield format_sse(STATUS_EVENT, scan)
+                if scan["status"] in FINISHED_STATUSES:
+                    return
+            while not await request.is_disconnected():
+                batch = await subscription.get(KEEPALIVE_INTERVAL)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                for kind, data in batch:
+                    yield format_sse(kind, data)
+                    # The stream of a single scan ends with it
+                    if scan_id and kind == STATUS_EVENT and data.get("status") in FINISHED_STATUSES:
+                        return
+        finally:
+            scan_events.unsubscribe(subscription)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/events")
+async def stream_all_scan_events(request: Request):
+    return stream_events(request)
+
+@app.get("/api/scans/{scan_id}/events")
+async def stream_scan_events(request: Request, scan_id: str):
+    if scan_store.get(scan_id) is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
     
-    # Apply pagination
-    paginated_scans = scans[offset:offset+limit]
+    return stream_events(request, scan_id)
+
+@app.get("/api/scans", response_model=List[ScanSummary])
+async def list_scans(response: Response, limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0),
+                     cursor: Optional[str] = None, status: Optional[str] = None, target: Optional[str] = None,
+                     scan_type: Optional[str] = None):
+    # Newest first; the cursor of the next page is returned in the X-Next-Cursor header
+    try:
+        scans, next_cursor = scan_store.list_scans(limit, cursor=cursor, offset=offset, status=status,
+                                                   target=target, scan_type=scan_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     # Convert to ScanSummary objects
     summaries = []
-    for scan in paginated_scans:
+    for scan in scans:
         summary = ScanSummary(
             id=scan["id"],
             target=scan["target"],
@@ -324,37 +352,94 @@ async def list_scans(limit: int = Query(10, ge=1, le=100), offset: int = Query(0
             status=scan["status"],
             start_time=scan["start_time"],
             end_time=scan.get("end_time"),
-            vulnerabilities_count=scan.get("vulnerabilities_count", {})
+            vulnerabilities_count=scan.get("vulnerabilities_count", {}),
+            summary=scan.get("summary") or {}
         )
         summaries.append(summary)
     
     return summaries
 
+def scan_output_dir(scan_id: str) -> Path:
+    """Return the directory holding the reports of a scan"""
+    return REPORTS_DIR / scan_id
+
+def find_scan_file(scan_id: str, name: str) -> Optional[Path]:
+    """Return a file of a scan, or None if it does not exist"""
+    # Scans run before per-scan directories have their files in REPORTS_DIR, prefixed with their ID
+    for path in (scan_output_dir(scan_id) / name, REPORTS_DIR / name.replace(REPORT_NAME, scan_id, 1)):
+        if path.is_file():
+            return path
+    return None
+
+def find_scan_report(scan_id: str) -> Optional[Path]:
+    """Return the report of a scan, whatever its format"""
+    for suffix in REPORT_MEDIA_TYPES:
+        report_path = find_scan_file(scan_id, f"{REPORT_NAME}{suffix}")
+        if report_path:
+            return report_path
+    return None
+
 @app.get("/api/reports/{scan_id}")
 async def get_scan_report(scan_id: str):
-    report_path = REPORTS_DIR / f"{scan_id}.json"
+    report_path = find_scan_report(scan_id)
+    
+    if not report_path:
+        raise HTTPException(status_code=404, detail="Report not found")
     
-    if not report_path.exists():
+    media_type = next(media_type for suffix, media_type in REPORT_MEDIA_TYPES.items()
+                      if report_path.name.endswith(suffix))
+    return FileResponse(report_path, media_type=media_type)
+
+def open_report_hosts(scan_id: str) -> Optional[HostIndex]:
+    """Return the host index of a scan report, or None if the report cannot be indexed (gzip, Trivy)"""
+    report_path = find_scan_report(scan_id)
+    if not report_path:
         raise HTTPException(status_code=404, detail="Report not found")
+    # Indexes are shared between requests instead of loaded again for each page
+    return get_host_index(report_path)
+
+@app.get("/api/reports/{scan_id}/hosts")
+async def list_report_hosts(scan_id: str, limit: int = Query(50, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    index = open_report_hosts(scan_id)
+    if index is None:
+        # Unindexed reports are read whole
+        hosts = load_scan_result(find_scan_report(scan_id)).hosts
+        summaries = [host_summary(host) for host in hosts[offset:offset+limit]]
+        return {"total": len(hosts), "offset": offset, "limit": limit, "hosts": summaries}
     
-    return FileResponse(report_path, media_type="application/json")
+    return {"total": len(index), "offset": offset, "limit": limit, "hosts": index.summaries(offset, limit)}
+
+@app.get("/api/reports/{scan_id}/hosts/{address}")
+async def get_report_host(scan_id: str, address: str):
+    index = open_report_hosts(scan_id)
+    if index is None:
+        host = next((host for host in load_scan_result(find_scan_report(scan_id)).hosts
+                     if address == host.address or address in host.hostnames), None)
+    else:
+        host = index.read_host(address)
+    
+    if host is None:
+        raise HTTPException(status_code=404, detail="Host not found in report")
+    
+    return to_record(host)
 
 @app.get("/api/reports/{scan_id}/ai")
 async def get_ai_report(scan_id: str):
-    report_path = REPORTS_DIR / f"{scan_id}_ai_report.pdf"
+    report_path = find_scan_file(scan_id, AI_REPORT_NAME)
     
-    if not report_path.exists():
+    if not report_path:
         raise HTTPException(status_code=404, detail="AI report not found")
     
     return FileResponse(report_path, media_type="application/pdf")
 
 @app.delete("/api/scans/{scan_id}")
 async def delete_scan(scan_id: str):
-    if scan_id not in active_scans:
+    scan = scan_store.get(scan_id)
+    if scan is None:
         raise HTTPException(status_code=404, detail="Scan not found")
     
     # Check if scan is running
-    if active_scans[scan_id]["status"] == "running":
+    if scan["status"] == "running":
         raise HTTPException(status_code=400, detail="Cannot delete a running scan")
     
     # Remove scan data
@@ -363,30 +448,56 @@ async def delete_scan(scan_id: str):
         shutil.rmtree(scan_dir)
     
     # Remove reports
-    report_path = REPORTS_DIR / f"{scan_id}.json"
-    if report_path.exists():
+    report_path = find_scan_report(scan_id)
+    if report_path:
+        forget_host_index(report_path)
+    
+    output_dir = scan_output_dir(scan_id)
+    if output_dir.is_dir():
+        shutil.rmtree(output_dir)
+    
+    # Reports written before per-scan directories
+    report_path = find_scan_report(scan_id)
+    if report_path:
         report_path.unlink()
+        
+        for sidecar in (model_path(report_path), index_path(report_path), summary_path(report_path)):
+            if sidecar.exists():
+                sidecar.unlink()
     
-    ai_report_path = REPORTS_DIR / f"{scan_id}_ai_report.pdf"
-    if ai_report_path.exists():
+    ai_report_path = find_scan_file(scan_id, AI_REPORT_NAME)
+    if ai_report_path:
         ai_report_path.unlink()
     
-    # Remove from active scans
-    del active_scans[scan_id]
+    # Remove from the scan history
+    scan_store.delete(scan_id)
     
     return {"message": "Scan deleted successfully"}
 
 @app.get("/api/tags")
 async def get_available_tags():
-    # In a real implementation, we would parse markdown files to get tags
-    # For now, return a static list of common tags
     return {
-        "tags": [
-            "http", "ssl", "ssh", "ftp", "database", "smb", "dns", "docker", "web", 
-            "vulners", "quick", "default", "scripts", "network", "firewall"
-        ]
+        "tags": sorted(template_parser.get_all_available_tags()),
+        "tools": sorted(tool_registry.available_tools())
     }
 
+@app.get("/api/tools")
+async def get_available_tools():
+    tools = {}
+    for name, record in tool_registry.available_tools().items():
+        capabilities = dict(record.get("capabilities", {}))
+        # The full script list is large; expose its size and the scripts reports depend on
+        scripts = capabilities.pop("nse_scripts", None)
+        if scripts is not None:
+            capabilities["nse_script_count"] = len(scripts)
+            capabilities["vulners"] = "vulners" in scripts
+        tools[name] = {
+            "path": record["path"],
+            "version": record.get("version"),
+            "capabilities": capabilities
+        }
+    return {"tools": tools}
+
 # Main entry point
 if __name__ == "__main__":
     import uvicorn
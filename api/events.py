@@ -0,0 +1,140 @@
+"""
+Scan events module for Scansible
+-------------------------------
+Pushes scan status changes and per-host results to the clients following
+scans, as server-sent events. Each subscriber has a bounded buffer: status
+updates of a scan are merged into the one still pending, and when the buffer
+is full the oldest host results are dropped and reported as a count, so a slow
+client costs a fixed amount of memory.
+"""
+
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from scansible.core.hostindex import host_summary
+from scansible.core.model import Host
+
+# Events kept per subscriber before host results are dropped
+QUEUE_SIZE = 100
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+
+# Event kinds; status events of a scan are merged while pending
+STATUS_EVENT = 'status'
+HOST_EVENT = 'host'
+DROPPED_EVENT = 'dropped'
+
+Event = Tuple[str, Dict]
+
+
+def format_sse(kind: str, data: Dict) -> str:
+    """Return an event in the server-sent events wire format."""
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """Bounded buffer of the events a client has not received yet."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, scan_id: Optional[str] = None, size: int = QUEUE_SIZE):
+        """Initialize the buffer of a client following one scan, or all of them without scan_id."""
+        self.scan_id = scan_id
+        self.size = max(1, size)
+        self.dropped = 0
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._lock = threading.Lock()
+        # Status events are keyed by scan, host events by arrival order
+        self._pending: "OrderedDict[Tuple[str, object], Dict]" = OrderedDict()
+        self._sequence = 0
+
+    def put(self, kind: str, scan_id: str, data: Dict):
+        """Buffer an event; may be called from any thread."""
+        if self.scan_id is not None and scan_id != self.scan_id:
+            return
+        with self._lock:
+            if kind == STATUS_EVENT:
+                key = (kind, scan_id)
+                if key in self._pending:
+                    self._pending[key].update(data)
+                    self._pending.move_to_end(key)
+                else:
+                    self._pending[key] = dict(data)
+            else:
+                self._sequence += 1
+                self._pending[(kind, self._sequence)] = data
+            while len(self._pending) > self.size:
+                self._drop_locked()
+        try:
+            # The consumer waits on the event loop thread
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The loop is closed: the client is gone
+            pass
+
+    def _drop_locked(self):
+        # Host results go first: they can be read back from the report, a missed status cannot
+        victim = next((key for key in self._pending if key[0] != STATUS_EVENT), None)
+        if victim is None:
+            victim = next(iter(self._pending))
+        del self._pending[victim]
+        self.dropped += 1
+
+    async def get(self, timeout: Optional[float] = None) -> List[Event]:
+        """Wait for events and return all of them, or an empty list after timeout seconds."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        with self._lock:
+            events = [(key[0], data) for key, data in self._pending.items()]
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            events.insert(0, (DROPPED_EVENT, {'count': dropped}))
+        return events
+
+
+class ScanEventBus:
+    """Fan-out of scan events to the subscribed clients."""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        """Initialize the bus; queue_size bounds the buffer of each subscriber."""
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, scan_id: Optional[str] = None) -> Subscription:
+        """Add a subscriber, from a coroutine running on the loop that will consume its events."""
+        subscription = Subscription(asyncio.get_running_loop(), scan_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, kind: str, scan_id: str, data: Dict):
+        """Send an event to the subscribers of a scan; may be called from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(kind, scan_id, data)
+
+    def publish_status(self, scan_id: str, fields: Dict):
+        """Send the changed status fields of a scan."""
+        self.publish(STATUS_EVENT, scan_id, {**fields, 'id': scan_id})
+
+    def publish_host(self, scan_id: str, host: Host):
+        """Send the summary of a host result of a scan."""
+        self.publish(HOST_EVENT, scan_id, {'scan_id': scan_id, **host_summary(host)})
@@ -0,0 +1,233 @@
+"""
+Scan store module for Scansible
+------------------------------
+Keeps the status of API scans in SQLite so that the history survives a
+restart. Progress updates of running scans are kept in memory and written in
+batches; listing uses keyset pagination over indexed columns. Every change is
+also passed to an optional listener, which the API uses to push events.
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Columns of a scan record, in table order
+SCAN_FIELDS = ('id', 'status', 'target', 'scan_type', 'start_time', 'end_time', 'percent', 'current_task', 'eta',
+               'error', 'report_url', 'vulnerabilities_count', 'summary')
+
+# Fields stored as JSON text
+JSON_FIELDS = ('vulnerabilities_count', 'summary')
+
+# Scans in these states are not updated anymore
+FINISHED_STATUSES = ('completed', 'failed')
+
+# Scans in these states when the store is opened were cut short by a restart
+UNFINISHED_STATUSES = ('starting', 'running')
+
+# Seconds progress updates may wait in memory before being written
+FLUSH_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    target TEXT NOT NULL,
+    scan_type TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    percent INTEGER NOT NULL DEFAULT 0,
+    current_task TEXT,
+    eta INTEGER,
+    error TEXT,
+    report_url TEXT,
+    vulnerabilities_count TEXT NOT NULL DEFAULT '{}',
+    summary TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS scans_start_time ON scans (start_time, id);
+CREATE INDEX IF NOT EXISTS scans_status ON scans (status, start_time, id);
+CREATE INDEX IF NOT EXISTS scans_target ON scans (target, start_time, id);
+CREATE INDEX IF NOT EXISTS scans_scan_type ON scans (scan_type, start_time, id);
+"""
+
+
+def encode_cursor(record: Dict) -> str:
+    """Return the opaque cursor of the page that follows a scan record."""
+    return base64.urlsafe_b64encode(json.dumps([record['start_time'], record['id']]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Return the (start_time, id) key of a cursor, raising ValueError when it is malformed."""
+    try:
+        start_time, scan_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return str(start_time), str(scan_id)
+
+
+class ScanStore:
+    """SQLite-backed store of scan records, with batched progress updates."""
+
+    def __init__(self, db_path: Path, flush_interval: float = FLUSH_INTERVAL,
+                 on_change: Optional[Callable[[str, Dict], None]] = None):
+        """Open (and create if needed) the database, failing scans a restart interrupted.
+
+        on_change is called with the scan ID and the new or updated fields of
+        every created or updated scan, outside of the store lock.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._migrate()
+        # Records of the scans updated since they were last read or written
+        self._live: Dict[str, Dict] = {}
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._fail_interrupted()
+
+    def _migrate(self):
+        # Columns added since the first version of the table
+        columns = {row['name'] for row in self._connection.execute("PRAGMA table_info(scans)")}
+        if 'summary' not in columns:
+            with self._connection:
+                self._connection.execute("ALTER TABLE scans ADD COLUMN summary TEXT NOT NULL DEFAULT '{}'")
+
+    def _fail_interrupted(self):
+        placeholders = ', '.join('?' for _ in UNFINISHED_STATUSES)
+        with self._connection:
+            self._connection.execute(
+                f"UPDATE scans SET status = 'failed', error = ?, end_time = ?, eta = NULL "
+                f"WHERE status IN ({placeholders})",
+                ("Interrupted by an API restart", datetime.now().isoformat(), *UNFINISHED_STATUSES))
+
+    @staticmethod
+    def _to_row(record: Dict) -> Tuple:
+        return tuple(json.dumps(record.get(field) or {}) if field in JSON_FIELDS else record.get(field)
+                     for field in SCAN_FIELDS)
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        for field in JSON_FIELDS:
+            record[field] = json.loads(record[field] or '{}')
+        return record
+
+    def _flush_locked(self):
+        if self._dirty:
+            rows = [self._to_row(self._live[scan_id]) for scan_id in self._dirty if scan_id in self._live]
+            assignments = ', '.join(f"{field} = ?" for field in SCAN_FIELDS[1:])
+            with self._connection:
+                self._connection.executemany(f"UPDATE scans SET {assignments} WHERE id = ?",
+                                             [row[1:] + row[:1] for row in rows])
+            self._dirty.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Write the pending progress updates."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Write the pending updates and close the database."""
+        with self._lock:
+            self._flush_locked()
+            self._connection.close()
+
+    def create(self, record: Dict):
+        """Add a new scan record."""
+        record = {field: record.get(field) for field in SCAN_FIELDS}
+        placeholders = ', '.join('?' for _ in SCAN_FIELDS)
+        with self._lock:
+            with self._connection:
+                self._connection.execute(f"INSERT INTO scans ({', '.join(SCAN_FIELDS)}) VALUES ({placeholders})",
+                                         self._to_row(record))
+            self._live[record['id']] = record
+        if self.on_change:
+            self.on_change(record['id'], dict(record))
+
+    def _load_locked(self, scan_id: str) -> Optional[Dict]:
+        record = self._live.get(scan_id)
+        if record is None:
+            row = self._connection.execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+            record = self._from_row(row) if row else None
+        return record
+
+    def get(self, scan_id: str) -> Optional[Dict]:
+        """Return a copy of a scan record, or None if there is no such scan."""
+        with self._lock:
+            record = self._load_locked(scan_id)
+        return dict(record) if record else None
+
+    def update(self, scan_id: str, **fields) -> bool:
+        """Update fields of a scan record; returns False if there is no such scan.
+
+        Progress updates are written at most every flush_interval seconds, while
+        status changes and updates of finished scans are written at once.
+        """
+        with self._lock:
+            record = self._load_locked(scan_id)
+            if record is None:
+                return False
+            status_changed = 'status' in fields and fields['status'] != record['status']
+            record.update(fields)
+            self._live[scan_id] = record
+            self._dirty.add(scan_id)
+
+            finished = record['status'] in FINISHED_STATUSES
+            if status_changed or finished or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+            # Finished scans are not kept in memory
+            if finished:
+                del self._live[scan_id]
+        if self.on_change:
+            self.on_change(scan_id, dict(fields))
+        return True
+
+    def delete(self, scan_id: str) -> bool:
+        """Remove a scan record; returns False if there was no such scan."""
+        with self._lock:
+            self._live.pop(scan_id, None)
+            self._dirty.discard(scan_id)
+            with self._connection:
+                cursor = self._connection.execute("DELETE FROM scans WHERE id = ?", (scan_id,))
+        return cursor.rowcount > 0
+
+    def list_scans(self, limit: int, cursor: Optional[str] = None, offset: int = 0, status: Optional[str] = None,
+             target: Optional[str] = None, scan_type: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Return a page of scan records, newest first, and the cursor of the next page (None on the last one).
+
+        A cursor from a previous page continues after its last record, whatever
+        was added since; offset is kept for clients that page by position.
+        """
+        conditions = []
+        params = []
+        for field, value in (('status', status), ('target', target), ('scan_type', scan_type)):
+            if value is not None:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+        if cursor:
+            start_time, scan_id = decode_cursor(cursor)
+            conditions.append("(start_time < ? OR (start_time = ? AND id < ?))")
+            params.extend((start_time, start_time, scan_id))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT * FROM scans {where} ORDER BY start_time DESC, id DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            # Listing shows the latest progress of running scans
+            self._flush_locked()
+            rows = self._connection.execute(query, (*params, limit + 1, offset)).fetchall()
+
+        records = [self._from_row(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(records[-1]) if len(rows) > limit else None
+        return records, next_cursor
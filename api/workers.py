@@ -0,0 +1,91 @@
+"""
+Scan workers module for Scansible
+--------------------------------
+A fixed pool of worker threads fed from a job queue. Each worker keeps its own
+Scanner for its whole life, so API scans run in-process without the startup
+cost of a new interpreter, and at most `size` of them run at once.
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, Optional
+
+from scansible.core.scanner import Scanner
+
+logger = logging.getLogger("scansible.workers")
+
+# A job receives the Scanner of the worker running it
+Job = Callable[[Scanner], None]
+
+
+class ScanWorkerPool:
+    """Worker threads running queued scan jobs, each with a warm Scanner."""
+
+    def __init__(self, size: int, scanner_factory: Callable[[], Scanner] = Scanner):
+        """Initialize the pool; workers are started on the first submitted job."""
+        self.size = max(1, size)
+        self.scanner_factory = scanner_factory
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._busy = 0
+
+    def start(self):
+        """Start the worker threads, if not running yet."""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.size):
+                thread = threading.Thread(target=self._work, name=f"scansible-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        # Scanner holds per-scan state (progress, timing profile), so each worker owns one
+        scanner = self.scanner_factory()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._busy += 1
+            try:
+                job(scanner)
+            except Exception:
+                logger.exception("Scan job failed")
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                self._queue.task_done()
+
+    def submit(self, job: Job):
+        """Queue a job for the next free worker."""
+        self.start()
+        self._queue.put(job)
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting for a free worker."""
+        return self._queue.qsize()
+
+    @property
+    def busy(self) -> int:
+        """Number of jobs being run."""
+        with self._lock:
+            return self._busy
+
+    def join(self):
+        """Wait until every queued job has run."""
+        self._queue.join()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the workers once the jobs queued before this call have run."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
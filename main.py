@@ -51,7 +51,7 @@ def parse_arguments():
                       help="Target IP, domain, or range to scan")
     
     # Scan options
-    parser.add_argument('--type', '-t', choices=['basic', 'web', 'passive', 'infrastructure', 'rustscan', 'trivy', 'light'],
+    parser.add_argument('--type', '-t', choices=['basic', 'web', 'passive', 'infrastructure', 'rustscan', 'trivy', 'light', 'pipeline'],
                       default='basic', help="Type of scan to perform")
     parser.add_argument('--tags', '-T', nargs='+',
                       help="Tags to filter commands (e.g., ssl http)")
@@ -59,6 +59,33 @@ def parse_arguments():
                       help="Skip report generation")
     parser.add_argument('--ai-report', '-a', action='store_true',
                       help="Generate an AI-enhanced report")
+    parser.add_argument('--format', choices=['json', 'ndjson'], dest='report_format',
+                      help="Report format: json (single document) or ndjson (one host per line) "
+                           "(default: SCANSIBLE_REPORT_FORMAT or json)")
+    parser.add_argument('--gzip', action='store_true',
+                      help="Compress NDJSON reports with gzip")
+    
+    # Execution options
+    parser.add_argument('--executor', '-e', choices=['auto', 'direct', 'parallel', 'ansible'],
+                      help="How to run the scan commands: auto uses direct execution for local scans "
+                           "and Ansible with --inventory (default: SCANSIBLE_EXECUTOR or auto)")
+    parser.add_argument('--workers', '-w', type=int,
+                      help="Number of concurrent commands for the parallel executor")
+    parser.add_argument('--shard-size', '-s', type=int,
+                      help="Split ranges and host lists into shards of this many addresses")
+    parser.add_argument('--auto-timing', action='store_true',
+                      help="Measure target latency and tune nmap/rustscan rates and timeouts")
+    parser.add_argument('--refresh', action='store_true',
+                      help="Ignore cached results of identical recent scans")
+    parser.add_argument('--incremental', action='store_true',
+                      help="Only rescan hosts and ports that changed since the last scan of this target")
+    parser.add_argument('--inventory', '-i',
+                      help="Ansible inventory of scanner nodes to distribute the scan across")
+    parser.add_argument('--inventory-group', default='all',
+                      help="Inventory group containing the scanner nodes (default: all)")
+    
+    parser.add_argument('--progress-json', action='store_true',
+                      help="Print machine-readable progress lines, for scripts wrapping the CLI")
     
     # GUI mode
     parser.add_argument('--gui', '-g', action='store_true',
@@ -67,6 +94,12 @@ def parse_arguments():
     # Utility options
     parser.add_argument('--list-tags', '-L', action='store_true',
                       help="List all available tags")
+    parser.add_argument('--list-tools', action='store_true',
+                      help="List installed scanning tools with their versions")
+    parser.add_argument('--import-feed', nargs='+', metavar='FEED',
+                      help="Import NVD JSON feeds (.json or .json.gz) into the local vulnerability database")
+    parser.add_argument('--match-report', metavar='REPORT',
+                      help="Match the services of an existing report against the local vulnerability database")
     parser.add_argument('--version', '-v', action='store_true',
                       help="Show version information")
     
@@ -141,6 +174,7 @@ def start_cli_mode(args):
     """Start Scansible in CLI mode."""
     from scansible.core.scanner import Scanner
     from scansible.core.parser import TemplateParser
+    from scansible.core.progress import print_progress_json
     
     # Display logo
     print(SCANSIBLE_LOGO)
@@ -154,6 +188,44 @@ def start_cli_mode(args):
             print(f"  #{tag}")
         sys.exit(0)
     
+    # Check if we just want to list tools
+    if args.list_tools:
+        scanner = Scanner()
+        tools = scanner.tools.available_tools()
+        print("\nInstalled tools:")
+        for name, record in tools.items():
+            print(f"  {name:<18} {record.get('version') or 'unknown version':<12} {record['path']}")
+            capabilities = record.get('capabilities', {})
+            if 'nse_scripts' in capabilities:
+                vulners = 'yes' if 'vulners' in capabilities['nse_scripts'] else 'no'
+                print(f"  {'':<18} {len(capabilities['nse_scripts'])} NSE scripts (vulners: {vulners})")
+            if 'vulnerability_db' in capabilities:
+                db = capabilities['vulnerability_db']
+                print(f"  {'':<18} vulnerability DB v{db.get('version', '?')} (updated {db.get('updatedat', '?')})")
+        sys.exit(0)
+    
+    # Update the local vulnerability database
+    if args.import_feed:
+        from scansible.core.vulndb import VulnDB
+        from scansible.utils.config import Config
+        db = VulnDB(Config().get('vulndb_path'))
+        for feed in args.import_feed:
+            print(f"Importing {feed}...")
+            print(f"  {db.import_feed(feed)} CVEs imported")
+        print(f"\nVulnerability database: {db.db_path}")
+        sys.exit(0)
+    
+    # Re-run the matching on a report after a feed update, without rescanning
+    if args.match_report:
+        from scansible.core.vulndb import get_vulndb, match_report
+        from scansible.utils.config import Config
+        db = get_vulndb(Config().get('vulndb_path'))
+        if db is None:
+            print("Error: No vulnerability database - import a feed with --import-feed first")
+            sys.exit(1)
+        print(f"\n{match_report(args.match_report, db)} vulnerabilities matched in {args.match_report}")
+        sys.exit(0)
+    
     # Make sure we have a target unless we're just listing tags
     if not args.target:
         print("Error: Target is required in CLI mode")
@@ -175,7 +247,18 @@ def start_cli_mode(args):
         'target': args.target,
         'scan_type': args.type,
         'tags': args.tags,
-        'generate_report': not args.no_report
+        'generate_report': not args.no_report,
+        'executor': args.executor,
+        'max_workers': args.workers,
+        'shard_size': args.shard_size,
+        'inventory': args.inventory,
+        'inventory_group': args.inventory_group,
+        'incremental': args.incremental,
+        'refresh': args.refresh,
+        'auto_timing': args.auto_timing,
+        'report_format': args.report_format,
+        'compress': args.gzip,
+        'progress_callback': print_progress_json if args.progress_json else None
     }
     
     # Show scanning animation
@@ -188,6 +271,8 @@ def start_cli_mode(args):
     
     if result['success']:
         print(f"\n[+] Scan completed successfully in {duration:.2f} seconds!")
+        if result.get('cached'):
+            print("[+] Result served from cache (use --refresh to rescan)")
         
         if result.get('report_path') and os.path.exists(result['report_path']):
             print(f"[+] Report saved to: {result['report_path']}")
@@ -203,8 +288,8 @@ def start_cli_mode(args):
                 print("[*] Auto-generating AI report based on configuration...")
             elif args.ai_report:
                 generate_ai = True
-            elif not args.no_report:
-                # Check if user wants an AI report
+            elif not args.no_report and sys.stdin.isatty():
+                # Check if user wants an AI report (never blocks when run without a terminal)
                 print("\n[?] Would you like to generate an AI-enhanced security report? (y/n)")
                 choice = input("> ").lower().strip()
                 generate_ai = choice.startswith('y')
@@ -0,0 +1,160 @@
+"""
+Result cache module for Scansible
+--------------------------------
+Reuses the JSON report of an identical scan run within a configurable TTL.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from scansible.core.targets import split_target_list
+
+
+class ResultCache:
+    """Disk cache of JSON reports keyed on target, commands and template content."""
+
+    def __init__(self, cache_dir: Path, ttl: int = 3600, max_bytes: int = 512 * 1024 * 1024):
+        """Initialize the cache directory, entry lifetime (seconds) and total size bound."""
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether caching is enabled (a TTL of 0 disables it)."""
+        return self.ttl > 0
+
+    def make_key(self, target: str, commands: List[Dict], template_content: str, variant: str = '') -> str:
+        """Build the cache key of a scan; variant distinguishes output formats of the same scan."""
+        key_data = {
+            'target': sorted(spec.lower() for spec in split_target_list(target)),
+            'commands': [cmd['command'] for cmd in commands],
+            'template': hashlib.sha256(template_content.encode()).hexdigest(),
+            'variant': variant,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        """Return the path of a cached report."""
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached report for a key, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        entry_path = self._entry_path(key)
+        with self._lock:
+            try:
+                created = float(entry_path.with_suffix('.created').read_text())
+            except (OSError, ValueError):
+                return None
+
+            if time.time() - created > self.ttl:
+                self._remove(key)
+                return None
+
+            # The modification time records the last use, for LRU eviction
+            try:
+                os.utime(entry_path)
+            except FileNotFoundError:
+                # Evicted or removed by another process since the .created marker was read
+                return None
+            return entry_path
+
+    def get_into(self, key: str, dest_path: Path) -> bool:
+        """Copy the cached report for a key to dest_path; False if missing or expired.
+
+        The copy is made under the cache lock, so that an eviction by another
+        worker cannot remove the entry between the lookup and the copy.
+        """
+        if not self.enabled:
+            return False
+
+        entry_path = self._entry_path(key)
+        with self._lock:
+            try:
+                created = float(entry_path.with_suffix('.created').read_text())
+            except (OSError, ValueError):
+                return False
+
+            if time.time() - created > self.ttl:
+                self._remove(key)
+                return False
+
+            try:
+                shutil.copy(entry_path, dest_path)
+                os.utime(entry_path)
+            except FileNotFoundError:
+                # Evicted or removed by another process since the .created marker was read
+                return False
+            return True
+
+    def put(self, key: str, report_path: Path):
+        """Store a report under a key, evicting old entries past the size bound."""
+        if not self.enabled or not Path(report_path).exists():
+            return
+
+        entry_path = self._entry_path(key)
+        with self._lock:
+            # Other processes may share the directory: the temporary name is per thread
+            tmp_path = entry_path.with_name(f"{entry_path.stem}.{threading.get_ident()}.tmp")
+            shutil.copy(report_path, tmp_path)
+            tmp_path.replace(entry_path)
+            entry_path.with_suffix('.created').write_text(str(time.time()))
+            self._evict()
+
+    def _remove(self, key: str):
+        """Delete a cache entry; the caller holds the lock."""
+        for suffix in ('.json', '.created'):
+            try:
+                self._entry_path(key).with_suffix(suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        entries = []
+        now = time.time()
+        for entry_path in self.cache_dir.glob('*.json'):
+            try:
+                created = float(entry_path.with_suffix('.created').read_text())
+                stat = entry_path.stat()
+            except (OSError, ValueError):
+                continue
+            if now - created > self.ttl:
+                self._remove(entry_path.stem)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry_path.stem))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+
+_caches: Dict[Path, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(cache_dir: Path, ttl: int = 3600, max_bytes: int = 512 * 1024 * 1024) -> ResultCache:
+    """Return the process-wide cache for a directory, shared by the scanners of all workers."""
+    cache_dir = Path(cache_dir)
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = ResultCache(cache_dir, ttl=ttl, max_bytes=max_bytes)
+        cache = _caches[cache_dir]
+        # The settings follow the configuration of the latest scanner
+        cache.ttl = ttl
+        cache.max_bytes = max_bytes
+        return cache
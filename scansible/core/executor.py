@@ -0,0 +1,124 @@
+"""
+Command executor module for Scansible
+------------------------------------
+Runs independent scan commands directly through a bounded worker pool.
+"""
+
+import shlex
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from scansible.core.progress import ProgressTracker
+
+
+# Lines of output kept to report why a command failed
+ERROR_TAIL_LINES = 40
+
+
+class CommandExecutor:
+    """Execute scan tasks concurrently with a fixed number of workers."""
+
+    def __init__(self, max_workers: int = 4, progress: Optional[ProgressTracker] = None):
+        """Initialize the executor with the size of the worker pool and an optional progress tracker."""
+        self.max_workers = max(1, int(max_workers))
+        self.progress = progress
+
+    def _build_argv(self, command: str) -> List[str]:
+        """Split a command like Ansible's command module, asking nmap for periodic stats."""
+        argv = shlex.split(command)
+        if self.progress and argv and argv[0] == 'nmap' and '--stats-every' not in argv:
+            argv[1:1] = ['--stats-every', '5s']
+        return argv
+
+    def run_task(self, task: Dict) -> Dict:
+        """Run a single task and return its result."""
+        result = {
+            'name': task['name'],
+            'command': task['command'],
+            'output_file': task.get('output_file'),
+            'stdout_file': task.get('stdout_file'),
+            'success': False,
+            'returncode': None,
+            'error': None,
+        }
+
+        key = id(task)
+        if self.progress:
+            self.progress.start_command(key, task['name'])
+
+        start_time = time.time()
+        stdout_file = None
+        try:
+            # Same argv splitting as Ansible's command module: no shell involved
+            process = subprocess.Popen(
+                self._build_argv(task['command']),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True
+            )
+
+            # Stream output line by line; only a bounded tail is kept unless asked for
+            captured = [] if task.get('capture_output') else None
+            if task.get('stdout_file'):
+                # Tools without a report option (e.g. rustscan) get their output saved instead
+                stdout_file = open(task['stdout_file'], 'w')
+            tail = deque(maxlen=ERROR_TAIL_LINES)
+            for line in process.stdout:
+                tail.append(line)
+                if stdout_file:
+                    stdout_file.write(line)
+                if captured is not None:
+                    captured.append(line)
+                if self.progress:
+                    self.progress.feed_line(key, line)
+            process.wait()
+
+            if captured is not None:
+                result['stdout'] = ''.join(captured)
+            result['returncode'] = process.returncode
+            result['success'] = process.returncode == 0
+            if not result['success']:
+                result['error'] = ''.join(tail).strip()
+        except (OSError, ValueError) as e:
+            result['error'] = str(e)
+        finally:
+            if stdout_file:
+                stdout_file.close()
+            if self.progress:
+                self.progress.finish_command(key)
+
+        result['duration'] = time.time() - start_time
+
+        status = "ok" if result['success'] else "failed"
+        print(f"[{status}] {task['name']} ({result['duration']:.1f}s)")
+        return result
+
+    def run_serial(self, tasks: List[Dict]) -> List[Dict]:
+        """Run tasks one after another, stopping at the first failure like an Ansible play."""
+        if self.progress:
+            self.progress.add_commands(len(tasks))
+
+        results = []
+        for task in tasks:
+            result = self.run_task(task)
+            results.append(result)
+            if not result['success']:
+                break
+        return results
+
+    def run(self, tasks: List[Dict]) -> List[Dict]:
+        """Run all tasks through the worker pool and return results in task order."""
+        if not tasks:
+            return []
+
+        if self.progress:
+            self.progress.add_commands(len(tasks))
+
+        workers = min(self.max_workers, len(tasks))
+        print(f"\nRunning {len(tasks)} command(s) with {workers} worker(s)")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.run_task, tasks))
@@ -0,0 +1,288 @@
+"""
+Host index module for Scansible
+------------------------------
+Keeps a sidecar index of the hosts of a report (address -> byte offset and
+length, plus summary fields) so that a single host or a page of hosts can be
+decoded from a memory-mapped report without parsing the whole file. NDJSON
+host records refer to the report's vulnerability catalogue, which the index
+keeps a copy of.
+"""
+
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scansible.core.model import (
+    SEVERITIES, Host, VulnCatalogue, Vulnerability, from_record, load_scan_result, parse_nmap_host
+)
+
+# Bump when the layout of the index changes
+INDEX_VERSION = 2
+
+# Suffix of the index, kept off '*.json' so report globs do not pick it up
+INDEX_SUFFIX = '.hosts'
+
+# Report layouts the index can point into
+NMAP_JSON_LAYOUT = 'nmap-json'
+NDJSON_LAYOUT = 'ndjson'
+
+# Summary fields stored after the offset and length of each entry
+SUMMARY_FIELDS = ('address', 'status', 'hostnames', 'open_ports', 'vulnerabilities', 'severity')
+
+# Opened indexes kept by get_host_index, least recently used dropped first
+OPEN_INDEX_CACHE_SIZE = 32
+
+_SINGLE_HOST_PREFIX = b'"host": {'
+_HOST_ARRAY_START = b'"host": ['
+
+
+def index_path(report_path: Path) -> Path:
+    """Return the path of the host index of a report."""
+    return Path(report_path).with_suffix(INDEX_SUFFIX)
+
+
+def host_summary(host: Host) -> Dict:
+    """Return the summary fields of a host."""
+    severities = [vulnerability.severity for port in host.ports for vulnerability in port.vulnerabilities]
+    ranked = [severity for severity in SEVERITIES if severity in severities]
+    return {
+        'address': host.address,
+        'status': host.status,
+        'hostnames': host.hostnames,
+        'open_ports': [f"{port.portid}/{port.protocol}" for port in host.open_ports],
+        'vulnerabilities': len(severities),
+        'severity': ranked[0] if ranked else None,
+    }
+
+
+def index_entry(host: Host, offset: int, length: int) -> List:
+    """Return the index entry of a host record: offset, length, then the SUMMARY_FIELDS."""
+    summary = host_summary(host)
+    return [offset, length] + [summary[field] for field in SUMMARY_FIELDS]
+
+
+def save_host_index(report_path: Path, layout: str, entries: List[List],
+                    catalogue: Optional[VulnCatalogue] = None):
+    """Write the index of a report, to be called once the report itself is in place."""
+    path = index_path(report_path)
+    tmp_path = path.with_suffix(INDEX_SUFFIX + '.tmp')
+    with open(tmp_path, 'w') as index_file:
+        json.dump({'version': INDEX_VERSION, 'layout': layout, 'fields': SUMMARY_FIELDS,
+                   'catalogue': catalogue.to_list() if catalogue else [], 'hosts': entries},
+                  index_file, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _iter_host_spans(report_path: Path,
+                     catalogue: VulnCatalogue) -> Tuple[Optional[str], Iterator[Tuple[int, bytes]]]:
+    """Find the host records of a report by scanning its lines once.
+
+    Both JSON and NDJSON reports are written with one host record per line. The
+    catalogue lines of an NDJSON report are loaded into catalogue on the way.
+    """
+    with open(report_path, 'rb') as report:
+        first = report.readline()
+    if first.startswith(b'{"nmaprun"'):
+        layout = NMAP_JSON_LAYOUT
+    elif first.startswith(b'{"format"'):
+        layout = NDJSON_LAYOUT
+    else:
+        return None, iter(())
+
+    def spans():
+        with open(report_path, 'rb') as report:
+            offset = 0
+            in_hosts = False
+            for index, line in enumerate(report):
+                start = offset
+                offset += len(line)
+                content = line.rstrip(b'\r\n')
+                if layout == NDJSON_LAYOUT:
+                    # Skip the header and the package findings
+                    if content.startswith(b'{"vulns"'):
+                        for values in json.loads(content)['vulns']:
+                            catalogue.ref(Vulnerability.from_list(values))
+                    elif index and not content.startswith(b'{"finding"'):
+                        yield start, content
+                elif in_hosts:
+                    if content.startswith(b']'):
+                        in_hosts = False
+                    else:
+                        yield start, content.rstrip(b',')
+                elif content.startswith(_HOST_ARRAY_START):
+                    in_hosts = True
+                elif content.startswith(_SINGLE_HOST_PREFIX):
+                    prefix = len(_SINGLE_HOST_PREFIX) - 1
+                    yield start + prefix, content[prefix:].rstrip(b',')
+
+    return layout, spans()
+
+
+def _decode_host(layout: str, data: bytes, catalogue: VulnCatalogue) -> Host:
+    """Decode the record of a host in the given layout."""
+    record = json.loads(data)
+    if layout == NDJSON_LAYOUT:
+        return from_record(Host, record, catalogue)
+    return parse_nmap_host(record)
+
+
+def build_host_index(report_path: Path) -> bool:
+    """Index an existing report; returns False if it holds no indexable hosts (Trivy, gzip)."""
+    report_path = Path(report_path)
+    if report_path.suffix == '.gz':
+        return False
+
+    catalogue = VulnCatalogue()
+    layout, spans = _iter_host_spans(report_path, catalogue)
+    if layout is None:
+        return False
+
+    entries = [index_entry(_decode_host(layout, data, catalogue), offset, len(data)) for offset, data in spans]
+    save_host_index(report_path, layout, entries, catalogue)
+    return True
+
+
+class HostIndex:
+    """Random access to the hosts of a report through its index."""
+
+    def __init__(self, report_path: Path, layout: str, entries: List[List], catalogue: List[List] = ()):
+        """Wrap an index loaded from disk; use HostIndex.open to get one."""
+        self.report_path = Path(report_path)
+        self.layout = layout
+        self.entries = entries
+        self.catalogue = VulnCatalogue.from_list(catalogue)
+        self._by_address = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, report_path: Path) -> Optional['HostIndex']:
+        """Load the index of a report, rebuilding it when missing or older than the report.
+
+        Returns None for reports without an indexable host layout.
+        """
+        report_path = Path(report_path)
+        path = index_path(report_path)
+        for attempt in range(2):
+            try:
+                if path.stat().st_mtime >= report_path.stat().st_mtime:
+                    with open(path) as index_file:
+                        data = json.load(index_file)
+                    if data.get('version') == INDEX_VERSION and tuple(data.get('fields', ())) == SUMMARY_FIELDS:
+                        return cls(report_path, data['layout'], data['hosts'], data['catalogue'])
+            except (OSError, ValueError, KeyError):
+                pass
+            if attempt or not report_path.exists() or not build_host_index(report_path):
+                return None
+        return None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _summary(entry: List) -> Dict:
+        return dict(zip(SUMMARY_FIELDS, entry[2:]))
+
+    def summaries(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Return the summaries of a page of hosts, in report order."""
+        end = None if limit is None else offset + limit
+        return [self._summary(entry) for entry in self.entries[offset:end]]
+
+    def find(self, address: str) -> Optional[List]:
+        """Return the index entry of a host by address or hostname."""
+        if self._by_address is None:
+            by_address = {}
+            for entry in self.entries:
+                for name in [entry[2]] + list(entry[4] or []):
+                    if name:
+                        by_address.setdefault(name, entry)
+            self._by_address = by_address
+        return self._by_address.get(address)
+
+    def _read(self, entry: List) -> Host:
+        """Decode one host record from the memory-mapped report."""
+        with self._lock:
+            if self._map is None:
+                with open(self.report_path, 'rb') as report:
+                    self._map = mmap.mmap(report.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._map[entry[0]:entry[0] + entry[1]]
+        return _decode_host(self.layout, data, self.catalogue)
+
+    def read_host(self, address: str) -> Optional[Host]:
+        """Decode a single host, or None if the report does not list it."""
+        entry = self.find(address)
+        return self._read(entry) if entry else None
+
+    def iter_hosts(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[Host]:
+        """Decode a page of hosts one at a time."""
+        end = None if limit is None else offset + limit
+        for entry in self.entries[offset:end]:
+            yield self._read(entry)
+
+    def close(self):
+        """Release the memory map of the report."""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+
+_open_indexes: "OrderedDict[Path, Tuple[Tuple[float, float], HostIndex]]" = OrderedDict()
+_open_indexes_lock = threading.Lock()
+
+
+def _index_stamp(report_path: Path) -> Optional[Tuple[float, float]]:
+    try:
+        return report_path.stat().st_mtime, index_path(report_path).stat().st_mtime
+    except OSError:
+        return None
+
+
+def get_host_index(report_path: Path) -> Optional[HostIndex]:
+    """Return the process-wide index of a report, opened again only when the report or its index changes.
+
+    The returned index is shared: callers must not close it.
+    """
+    report_path = Path(report_path)
+    stamp = _index_stamp(report_path)
+    with _open_indexes_lock:
+        cached = _open_indexes.get(report_path)
+        if cached and stamp and cached[0] == stamp:
+            _open_indexes.move_to_end(report_path)
+            return cached[1]
+
+    index = HostIndex.open(report_path)
+    # Opening may have rebuilt the index
+    stamp = _index_stamp(report_path)
+    with _open_indexes_lock:
+        if index is None or stamp is None:
+            _open_indexes.pop(report_path, None)
+            return index
+        # Replaced indexes are not closed: a request may still be reading them, the map goes with the last reference
+        _open_indexes[report_path] = (stamp, index)
+        _open_indexes.move_to_end(report_path)
+        while len(_open_indexes) > OPEN_INDEX_CACHE_SIZE:
+            _open_indexes.popitem(last=False)
+    return index
+
+
+def forget_host_index(report_path: Path):
+    """Drop the shared index of a report, before the report is deleted."""
+    with _open_indexes_lock:
+        _open_indexes.pop(Path(report_path), None)
+
+
+def iter_report_hosts(report_path: Path) -> Iterator[Host]:
+    """Yield the hosts of a report one at a time, through its index when it has one."""
+    index = HostIndex.open(report_path)
+    if index is None:
+        yield from load_scan_result(report_path).hosts
+        return
+    try:
+        yield from index.iter_hosts()
+    finally:
+        index.close()
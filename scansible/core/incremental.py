@@ -0,0 +1,343 @@
+"""
+Incremental scanning module for Scansible
+----------------------------------------
+Keeps the last result of each target and limits rescans to what changed.
+"""
+
+import copy
+import hashlib
+import shlex
+import shutil
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from scansible.core.targets import split_target_list
+
+# Cheap sweep used to detect opened and closed ports: a plain SYN (or connect) scan, without version detection
+CHANGE_DETECTION_COMMAND = "nmap -T4"
+
+# Ports nmap scans when a command selects none, and with -F
+DEFAULT_TOP_PORTS = 1000
+FAST_TOP_PORTS = 100
+
+# Used when nmap-services cannot be found to resolve --top-ports
+_FALLBACK_PORTS = range(1, 1025)
+
+# Port selection options replaced by the list of changed ports
+_PORT_OPTIONS_WITH_VALUE = {'-p', '--top-ports', '--port-ratio'}
+_PORT_OPTIONS = {'-F', '-p-'}
+
+PortKey = Tuple[str, str]
+
+
+class ScanHistory:
+    """Store of the last merged nmap report for each target and scan profile."""
+
+    def __init__(self, history_dir: Path):
+        """Initialize the history with the directory holding the snapshots."""
+        self.history_dir = Path(history_dir)
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+
+    def _snapshot_path(self, target: str, scan_type: str, tags: Optional[List[str]] = None) -> Path:
+        """Return the snapshot path for a target, scan type and tag selection."""
+        normalized_target = ' '.join(sorted(split_target_list(target)))
+        key = f"{scan_type}|{normalized_target}|{','.join(sorted(tags or []))}"
+        return self.history_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.xml"
+
+    def load(self, target: str, scan_type: str, tags: Optional[List[str]] = None) -> Optional[ET.Element]:
+        """Load the previous report of a target, if any."""
+        snapshot_path = self._snapshot_path(target, scan_type, tags)
+        if not snapshot_path.exists():
+            return None
+        try:
+            return ET.parse(snapshot_path).getroot()
+        except ET.ParseError:
+            return None
+
+    def save(self, target: str, scan_type: str, tags: Optional[List[str]], xml_path: Path):
+        """Record a report as the latest result of a target."""
+        xml_path = Path(xml_path)
+        if xml_path.exists():
+            # Concurrent scans of one target replace the snapshot whole, never a half-written one
+            snapshot_path = self._snapshot_path(target, scan_type, tags)
+            tmp_path = snapshot_path.with_name(f"{snapshot_path.stem}.{threading.get_ident()}.tmp")
+            shutil.copy(xml_path, tmp_path)
+            tmp_path.replace(snapshot_path)
+
+
+def _parse_port_list(spec: str) -> Optional[Set[int]]:
+    """Expand an nmap -p value into TCP port numbers; None for every port."""
+    ports = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if part.upper().startswith('T:'):
+            part = part[2:]
+        elif part[:2].upper() in ('U:', 'S:'):
+            # UDP and SCTP ports are not swept
+            continue
+        if part in ('-', '1-65535', '0-65535'):
+            return None
+        start, _, end = part.partition('-')
+        try:
+            if end or part.endswith('-'):
+                ports.update(range(int(start or 1), int(end or 65535) + 1))
+            else:
+                ports.add(int(start))
+        except ValueError:
+            # Service names are resolved by nmap itself
+            continue
+    return ports
+
+
+def template_port_selection(commands: List[Dict]) -> Tuple[Optional[Set[int]], int]:
+    """Return the explicit TCP ports and the top ports count selected by the nmap commands of a template.
+
+    The explicit ports are None when a command scans every port.
+    """
+    explicit = set()
+    top_ports = 0
+    for cmd in commands:
+        if not cmd['command'].startswith('nmap'):
+            continue
+        try:
+            args = shlex.split(cmd['command'])
+        except ValueError:
+            continue
+        selected = False
+        for index, arg in enumerate(args):
+            value = args[index + 1] if index + 1 < len(args) else ''
+            if arg == '-p-':
+                return None, 0
+            if arg == '-F':
+                top_ports, selected = max(top_ports, FAST_TOP_PORTS), True
+            elif arg == '--top-ports' and value.isdigit():
+                top_ports, selected = max(top_ports, int(value)), True
+            elif arg == '-p' or (arg.startswith('-p') and len(arg) > 2):
+                spec = value if arg == '-p' else arg[2:]
+                if spec == '[ports]':
+                    continue
+                ports = _parse_port_list(spec)
+                if ports is None:
+                    return None, 0
+                explicit.update(ports)
+                selected = True
+        if not selected:
+            top_ports = max(top_ports, DEFAULT_TOP_PORTS)
+    return explicit, top_ports
+
+
+def load_top_ports(count: int, services_path: Optional[Path]) -> List[int]:
+    """Return the count most frequently open TCP ports according to nmap-services."""
+    frequencies = []
+    try:
+        with open(services_path) as services:
+            for line in services:
+                fields = line.split()
+                if len(fields) >= 3 and not line.startswith('#') and fields[1].endswith('/tcp'):
+                    try:
+                        frequencies.append((float(fields[2]), int(fields[1][:-4])))
+                    except ValueError:
+                        continue
+    except (OSError, TypeError):
+        return list(_FALLBACK_PORTS)
+    return [port for _, port in sorted(frequencies, key=lambda entry: (-entry[0], entry[1]))[:count]]
+
+
+def previous_open_ports(previous: ET.Element) -> Set[int]:
+    """Return the TCP ports open on any host of a previous report."""
+    return {int(port) for host in _hosts_by_address(previous).values()
+            for protocol, port in _port_fingerprints(host) if protocol == 'tcp'}
+
+
+def sweep_ports(commands: List[Dict], previous: ET.Element, services_path: Optional[Path] = None) -> str:
+    """Build the -p list of the change-detection sweep.
+
+    It covers the ports the template scans and every TCP port found open
+    before, so that ports found by a wider earlier scan are checked too.
+    """
+    explicit, top_ports = template_port_selection(commands)
+    if explicit is None:
+        return '1-65535'
+    ports = explicit | previous_open_ports(previous)
+    if top_ports:
+        ports.update(load_top_ports(top_ports, services_path))
+    return _format_port_list(sorted(ports))
+
+
+def _format_port_list(ports: List[int]) -> str:
+    """Write sorted port numbers as an nmap port list, folding runs into ranges."""
+    ranges = []
+    for port in ports:
+        if ranges and port == ranges[-1][1] + 1:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return ','.join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def _host_address(host: ET.Element) -> Optional[str]:
+    """Return the IP address of a host element."""
+    for address in host.findall('address'):
+        if address.get('addrtype') in ('ipv4', 'ipv6'):
+            return address.get('addr')
+    return None
+
+
+def _port_fingerprints(host: ET.Element) -> Dict[PortKey, Optional[Tuple]]:
+    """Return (service, product, version) for each open port of a host.
+
+    Ports whose service was only guessed from the port number have no
+    fingerprint (None): only their state can be compared.
+    """
+    fingerprints = {}
+    for port in host.findall('ports/port'):
+        state = port.find('state')
+        if state is None or state.get('state') != 'open':
+            continue
+        service = port.find('service')
+        key = (port.get('protocol'), port.get('portid'))
+        if service is None or service.get('method') == 'table' or not (service.get('product') or service.get('version')):
+            fingerprints[key] = None
+        else:
+            fingerprints[key] = (service.get('name'), service.get('product'), service.get('version'))
+    return fingerprints
+
+
+def _hosts_by_address(root: Optional[ET.Element]) -> Dict[str, ET.Element]:
+    """Index the host elements of a report by IP address."""
+    hosts = {}
+    if root is None:
+        return hosts
+    for host in root.findall('host'):
+        address = _host_address(host)
+        if address:
+            hosts[address] = host
+    return hosts
+
+
+def detect_changes(previous: ET.Element, sweep: ET.Element) -> Tuple[Dict[str, List[str]], Dict[str, List[PortKey]]]:
+    """Compare a change-detection sweep with the previous report.
+
+    Returns the TCP ports to rescan per host (newly open, or with a
+    different service) and the ports whose findings can be carried forward
+    unchanged.
+    """
+    previous_hosts = _hosts_by_address(previous)
+    changed = {}
+    unchanged = {}
+
+    for address, host in _hosts_by_address(sweep).items():
+        current = _port_fingerprints(host)
+        before = _port_fingerprints(previous_hosts[address]) if address in previous_hosts else {}
+
+        for key, fingerprint in current.items():
+            # The plain sweep only sees that a port is open; a probed service must also match what was found before
+            previous_fingerprint = before.get(key)
+            same_service = key in before and (fingerprint is None or previous_fingerprint is None or all(
+                new is None or new == old for new, old in zip(fingerprint, previous_fingerprint)))
+            if same_service:
+                unchanged.setdefault(address, []).append(key)
+            elif key[0] == 'tcp':
+                changed.setdefault(address, []).append(key[1])
+
+        # The sweep only covers TCP, so other protocols are kept as they were
+        for key in before:
+            if key[0] != 'tcp' and key not in current:
+                unchanged.setdefault(address, []).append(key)
+
+    return changed, unchanged
+
+
+def restrict_ports(command: str, ports: str) -> str:
+    """Replace the port selection of an nmap command with an explicit port list."""
+    args = shlex.split(command)
+    restricted = []
+    skip_next = False
+
+    for arg in args:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg in _PORT_OPTIONS_WITH_VALUE:
+            skip_next = True
+            continue
+        if arg in _PORT_OPTIONS or (arg.startswith('-p') and len(arg) > 2):
+            continue
+        restricted.append(arg)
+
+    # Keep the [target] placeholder at the end, where the scanner expects it
+    target_placeholder = '[target]' in restricted
+    restricted = [arg for arg in restricted if arg != '[target]']
+    restricted.extend(['-p', ports])
+    if target_placeholder:
+        restricted.append('[target]')
+
+    return shlex.join(restricted).replace("'[target]'", '[target]')
+
+
+def build_incremental_report(sweep: ET.Element, deep: Optional[ET.Element], previous: ET.Element,
+                             unchanged: Dict[str, List[PortKey]]) -> ET.Element:
+    """Combine rescanned hosts with the findings carried forward from the previous report."""
+    report = copy.deepcopy(sweep)
+    for host in report.findall('host'):
+        report.remove(host)
+
+    runstats = report.find('runstats')
+    insert_at = list(report).index(runstats) if runstats is not None else len(report)
+
+    deep_hosts = _hosts_by_address(deep)
+    previous_hosts = _hosts_by_address(previous)
+    hosts_up = 0
+
+    for address, sweep_host in _hosts_by_address(sweep).items():
+        carried_keys = set(unchanged.get(address, []))
+        previous_host = previous_hosts.get(address)
+
+        if address in deep_hosts:
+            host = copy.deepcopy(deep_hosts[address])
+        elif previous_host is not None and carried_keys and set(_port_fingerprints(sweep_host)) <= carried_keys:
+            # Nothing changed on this host: keep its previous element and timestamps
+            host = copy.deepcopy(previous_host)
+            ports = host.find('ports')
+            for port in list(ports.findall('port')) if ports is not None else []:
+                if (port.get('protocol'), port.get('portid')) not in carried_keys:
+                    ports.remove(port)
+            host.set('scansible_carried_from', previous_host.get('starttime', ''))
+            carried_keys = set()
+        else:
+            host = copy.deepcopy(sweep_host)
+
+        # Carry unchanged ports into rescanned hosts, marking when they were last scanned
+        if carried_keys and previous_host is not None:
+            ports = host.find('ports')
+            if ports is None:
+                ports = ET.SubElement(host, 'ports')
+            # The sweep's own element of a carried port only knows it is open: the previous findings replace it
+            present = {(port.get('protocol'), port.get('portid')): port for port in ports.findall('port')}
+            for port in previous_host.findall('ports/port'):
+                key = (port.get('protocol'), port.get('portid'))
+                if key in carried_keys:
+                    carried = copy.deepcopy(port)
+                    carried.set('scansible_carried_from', previous_host.get('starttime', ''))
+                    if key in present:
+                        ports.insert(list(ports).index(present[key]), carried)
+                        ports.remove(present[key])
+                    else:
+                        ports.append(carried)
+
+        status = host.find('status')
+        if status is not None and status.get('state') == 'up':
+            hosts_up += 1
+
+        report.insert(insert_at, host)
+        insert_at += 1
+
+    if runstats is not None and runstats.find('hosts') is not None:
+        counts = runstats.find('hosts')
+        total = int(counts.get('total', hosts_up))
+        counts.set('up', str(hosts_up))
+        counts.set('down', str(max(total - hosts_up, 0)))
+
+    return report
@@ -0,0 +1,210 @@
+"""
+Ingestion module for Scansible
+-----------------------------
+Streams nmap XML reports one <host> at a time into the JSON layout produced
+by xmltodict, so that memory use does not grow with the size of the report.
+"""
+
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+HostCallback = Callable[[Dict], None]
+RootCallback = Callable[[Dict], None]
+
+
+def element_to_dict(element: ET.Element) -> Union[Dict, str, None]:
+    """Convert an element to the value xmltodict would produce for it."""
+    result = {f"@{name}": value for name, value in element.attrib.items()}
+
+    for child in element:
+        value = element_to_dict(child)
+        if child.tag in result:
+            if not isinstance(result[child.tag], list):
+                result[child.tag] = [result[child.tag]]
+            result[child.tag].append(value)
+        else:
+            result[child.tag] = value
+
+    text = (element.text or '').strip()
+    if not result:
+        return text or None
+    if text:
+        result['#text'] = text
+    return result
+
+
+def _iterparse_root_children(xml_path: Path) -> Iterator[tuple]:
+    """Yield the root element, then each completed child of the root, freeing it afterwards."""
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(str(xml_path), events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = element
+                yield 'root', element
+            continue
+
+        depth -= 1
+        if depth == 1:
+            yield 'child', element
+            # Drop the processed subtree so memory stays flat
+            element.clear()
+            root.remove(element)
+
+
+def iter_nmap_records(xml_path: Path) -> Iterator[Tuple[str, Dict]]:
+    """Yield ('root', attributes) and then ('host', record) for each host of an nmap XML report."""
+    for event, element in _iterparse_root_children(Path(xml_path)):
+        if event == 'root':
+            yield 'root', {f"@{name}": value for name, value in element.attrib.items()}
+        elif element.tag == 'host':
+            yield 'host', element_to_dict(element)
+
+
+def iter_nmap_hosts(xml_path: Path) -> Iterator[Dict]:
+    """Yield the host records of an nmap XML report one at a time."""
+    for kind, record in iter_nmap_records(xml_path):
+        if kind == 'host':
+            yield record
+
+
+def ingest_nmap_xml(xml_path: Path, json_path: Path, on_host: Optional[HostCallback] = None,
+                    on_root: Optional[RootCallback] = None, extra: Optional[Dict] = None,
+                    spans: Optional[List[Tuple[int, int]]] = None) -> int:
+    """Convert an nmap XML report to JSON host by host and return the number of hosts.
+
+    on_root receives the attributes of the root element and on_host each
+    host record, both in the xmltodict layout; on_host is called before the
+    record is written and may add to it. extra holds top-level keys
+    written after the nmaprun document, e.g. findings of other tools.
+    spans, if given, receives the byte offset and length of each host record.
+
+    Hosts are spilled to a temporary file as they are parsed; the other
+    (small) sections of the report are kept in memory until the end.
+    """
+    xml_path = Path(xml_path)
+    json_path = Path(json_path)
+
+    root_tag = None
+    root_attributes = {}
+    sections = {}
+    host_count = 0
+
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spill:
+        for event, element in _iterparse_root_children(xml_path):
+            if event == 'root':
+                root_tag = element.tag
+                root_attributes = {f"@{name}": value for name, value in element.attrib.items()}
+                if on_root:
+                    on_root(root_attributes)
+                continue
+
+            value = element_to_dict(element)
+            if element.tag == 'host':
+                # The callback may annotate the record before it is written
+                if on_host:
+                    on_host(value)
+                spill.write(json.dumps(value) + '\n')
+                host_count += 1
+                sections.setdefault('host', None)
+            elif element.tag in sections:
+                if not isinstance(sections[element.tag], list):
+                    sections[element.tag] = [sections[element.tag]]
+                sections[element.tag].append(value)
+            else:
+                sections[element.tag] = value
+
+        spill.seek(0)
+        tmp_path = json_path.with_suffix(json_path.suffix + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as output:
+                host_spans = _write_document(output, root_tag, root_attributes, sections, spill, host_count, extra)
+            os.replace(tmp_path, json_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    if spans is not None:
+        spans.extend(host_spans)
+    return host_count
+
+
+def write_nmap_json(json_path: Path, document: Dict, spans: Optional[List[Tuple[int, int]]] = None) -> int:
+    """Write a parsed nmap JSON document back in the layout of ingest_nmap_xml, one host per line."""
+    json_path = Path(json_path)
+    root_tag = next(iter(document))
+    root = document[root_tag] or {}
+    root_attributes = {key: value for key, value in root.items() if key.startswith('@')}
+    sections = {key: value for key, value in root.items() if not key.startswith('@')}
+    hosts = sections.get('host')
+    hosts = [] if hosts is None else hosts if isinstance(hosts, list) else [hosts]
+    extra = {key: value for key, value in document.items() if key != root_tag}
+
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spill:
+        for host in hosts:
+            spill.write(json.dumps(host) + '\n')
+        spill.seek(0)
+        tmp_path = json_path.with_suffix(json_path.suffix + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as output:
+                host_spans = _write_document(output, root_tag, root_attributes, sections, spill, len(hosts), extra)
+            os.replace(tmp_path, json_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    if spans is not None:
+        spans.extend(host_spans)
+    return len(hosts)
+
+
+def _write_document(output, root_tag: str, root_attributes: Dict, sections: Dict, spill, host_count: int,
+                    extra: Optional[Dict] = None) -> List[Tuple[int, int]]:
+    """Write the JSON document, copying the spilled hosts in at their original position.
+
+    Returns the byte offset and length of each host record.
+    """
+    # json.dumps escapes non-ASCII characters, so character counts are byte counts
+    position = 0
+    spans = []
+
+    def write(text: str):
+        nonlocal position
+        output.write(text)
+        position += len(text)
+
+    def write_host(line: str):
+        record = line.rstrip('\n')
+        spans.append((position, len(record)))
+        write(record)
+
+    entries = list(root_attributes.items()) + list(sections.items())
+    write('{' + json.dumps(root_tag) + ': {\n')
+
+    for index, (key, value) in enumerate(entries):
+        write(json.dumps(key) + ': ')
+        if key == 'host':
+            # A single host is an object, as with xmltodict
+            if host_count == 1:
+                write_host(spill.readline())
+            else:
+                write('[\n')
+                for host_index, line in enumerate(spill):
+                    if host_index:
+                        write(',\n')
+                    write_host(line)
+                write('\n]')
+        else:
+            write(json.dumps(value))
+        write(',\n' if index < len(entries) - 1 else '\n')
+
+    write('}')
+    for key, value in (extra or {}).items():
+        write(',\n' + json.dumps(key) + ': ' + json.dumps(value))
+    write('}\n')
+    return spans
@@ -0,0 +1,86 @@
+"""
+Inventory utilities for Scansible
+--------------------------------
+Loads scanner nodes from an Ansible inventory and splits targets across them.
+"""
+
+import json
+import math
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+from scansible.core.targets import count_addresses, shard_targets
+
+
+def _walk_group(inventory: Dict, group: str, seen: set) -> List[str]:
+    """Collect the hosts of a group and its children from ansible-inventory output."""
+    if group in seen:
+        return []
+    seen.add(group)
+
+    data = inventory.get(group, {})
+    hosts = list(data.get('hosts', []))
+    for child in data.get('children', []):
+        hosts.extend(_walk_group(inventory, child, seen))
+    return hosts
+
+
+def _parse_ini_inventory(inventory_path: Path, group: str) -> List[str]:
+    """Read host names from a simple INI inventory when ansible-inventory is unavailable."""
+    hosts = []
+    current_group = 'ungrouped'
+
+    for line in inventory_path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            current_group = line[1:-1]
+            continue
+        if ':' in current_group:
+            # [group:vars] and [group:children] sections do not list hosts
+            continue
+        if group in ('all', current_group):
+            hosts.append(line.split()[0])
+
+    return hosts
+
+
+def load_inventory_hosts(inventory_path: str, group: str = 'all') -> List[str]:
+    """Return the scanner nodes of an inventory group, in inventory order."""
+    inventory_path = Path(inventory_path)
+    if not inventory_path.exists():
+        raise FileNotFoundError(f"Inventory not found: {inventory_path}")
+
+    try:
+        result = subprocess.run(
+            ['ansible-inventory', '-i', str(inventory_path), '--list'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True
+        )
+        hosts = _walk_group(json.loads(result.stdout), group, set())
+    except (OSError, subprocess.CalledProcessError, json.JSONDecodeError):
+        hosts = _parse_ini_inventory(inventory_path, group)
+
+    # Keep the first occurrence of hosts listed in several groups
+    return list(dict.fromkeys(hosts))
+
+
+def assign_targets(target: str, nodes: List[str]) -> Dict[str, str]:
+    """Split a target across scanner nodes, returning node -> target string."""
+    if not nodes:
+        return {}
+
+    shard_size = max(1, math.ceil(count_addresses(target) / len(nodes)))
+    shards = shard_targets(target, shard_size)
+
+    # Shards are power-of-two sized, so there may be more shards than nodes
+    assignments = {}
+    for index, shard in enumerate(shards):
+        node = nodes[index % len(nodes)]
+        assignments[node] = f"{assignments[node]} {shard}" if node in assignments else shard
+
+    return assignments
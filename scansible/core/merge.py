@@ -0,0 +1,357 @@
+"""
+Report merging module for Scansible
+----------------------------------
+Combines the output files of several scan commands into a single report,
+deduplicating hosts, ports, services and script findings seen more than once.
+"""
+
+import copy
+import ipaddress
+import json
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scansible.core.trivy import iter_json_items
+
+# Suffix of the merged Trivy findings kept next to a scan's XML report
+TRIVY_COMPANION_SUFFIX = '_trivy.json'
+
+# Top-level entries of Trivy reports: image/filesystem results and Kubernetes resources
+TRIVY_ENTRY_PATHS = (('Results', '[]'), ('Resources', '[]'))
+
+# Port states ranked from most to least informative
+_STATE_RANK = {'open': 0, 'open|filtered': 1, 'filtered': 2, 'unfiltered': 3, 'closed|filtered': 4, 'closed': 5}
+
+
+def trivy_companion_path(xml_path) -> Path:
+    """Return the path of the merged Trivy findings of a scan, next to its XML report."""
+    xml_path = Path(xml_path)
+    return xml_path.with_name(xml_path.stem + TRIVY_COMPANION_SUFFIX)
+
+
+def _load_nmap_root(xml_path: Path) -> Optional[ET.Element]:
+    """Parse an nmap XML file, returning None if it is missing or truncated."""
+    try:
+        return ET.parse(xml_path).getroot()
+    except (ET.ParseError, OSError) as e:
+        print(f"Skipping unreadable nmap report {xml_path}: {e}")
+        return None
+
+
+def _host_key(host: ET.Element) -> Optional[str]:
+    """Return the identity of a host element: its IP, else its MAC address or first hostname."""
+    addresses = {address.get('addrtype'): address.get('addr') for address in host.findall('address')}
+    for addrtype in ('ipv4', 'ipv6', 'mac'):
+        if addresses.get(addrtype):
+            return addresses[addrtype]
+    hostname = host.find('hostnames/hostname')
+    return hostname.get('name') if hostname is not None else None
+
+
+def _service_detail(port: ET.Element) -> int:
+    """Score how much a port's service element tells, to keep the most detailed one."""
+    service = port.find('service')
+    if service is None:
+        return -1
+    return len(service.attrib) + len(service.findall('cpe'))
+
+
+def _merge_scripts(base: ET.Element, other: ET.Element):
+    """Add the scripts of another element, keeping the longest output of each script id."""
+    scripts = {script.get('id'): script for script in base.findall('script')}
+    for script in other.findall('script'):
+        existing = scripts.get(script.get('id'))
+        if existing is None:
+            added = copy.deepcopy(script)
+            base.append(added)
+            scripts[script.get('id')] = added
+        elif len(script.get('output', '')) > len(existing.get('output', '')):
+            added = copy.deepcopy(script)
+            base.insert(list(base).index(existing), added)
+            base.remove(existing)
+            scripts[script.get('id')] = added
+
+
+def _merge_port(base: ET.Element, other: ET.Element):
+    """Merge another observation of the same port into the base one."""
+    base_state = base.find('state')
+    other_state = other.find('state')
+    if other_state is not None and (base_state is None or
+                                    _STATE_RANK.get(other_state.get('state'), 9) <
+                                    _STATE_RANK.get(base_state.get('state'), 9)):
+        if base_state is not None:
+            base.remove(base_state)
+        base.insert(0, copy.deepcopy(other_state))
+
+    if _service_detail(other) > _service_detail(base):
+        base_service = base.find('service')
+        position = list(base).index(base_service) if base_service is not None else len(base)
+        if base_service is not None:
+            base.remove(base_service)
+        base.insert(position, copy.deepcopy(other.find('service')))
+
+    _merge_scripts(base, other)
+
+
+def _merge_host(base: ET.Element, other: ET.Element):
+    """Merge another report's element for the same host into the base one."""
+    base_status = base.find('status')
+    other_status = other.find('status')
+    if other_status is not None and other_status.get('state') == 'up':
+        if base_status is None:
+            base.insert(0, copy.deepcopy(other_status))
+        elif base_status.get('state') != 'up':
+            base_status.attrib.update(other_status.attrib)
+
+    # Hostnames, OS detection and host scripts are added when missing
+    other_hostnames = other.find('hostnames')
+    if other_hostnames is not None:
+        base_hostnames = base.find('hostnames')
+        if base_hostnames is None:
+            base_hostnames = ET.SubElement(base, 'hostnames')
+        known = {hostname.get('name') for hostname in base_hostnames.findall('hostname')}
+        for hostname in other_hostnames.findall('hostname'):
+            if hostname.get('name') not in known:
+                base_hostnames.append(copy.deepcopy(hostname))
+                known.add(hostname.get('name'))
+
+    for tag in ('os', 'uptime', 'distance', 'trace'):
+        if base.find(tag) is None and other.find(tag) is not None:
+            base.append(copy.deepcopy(other.find(tag)))
+
+    other_hostscript = other.find('hostscript')
+    if other_hostscript is not None:
+        base_hostscript = base.find('hostscript')
+        if base_hostscript is None:
+            base.append(copy.deepcopy(other_hostscript))
+        else:
+            _merge_scripts(base_hostscript, other_hostscript)
+
+    other_ports = other.find('ports')
+    if other_ports is None:
+        return
+    base_ports = base.find('ports')
+    if base_ports is None:
+        base_ports = ET.SubElement(base, 'ports')
+    ports = {(port.get('protocol'), port.get('portid')): port for port in base_ports.findall('port')}
+    for port in other_ports.findall('port'):
+        key = (port.get('protocol'), port.get('portid'))
+        if key in ports:
+            _merge_port(ports[key], port)
+        else:
+            ports[key] = copy.deepcopy(port)
+            base_ports.append(ports[key])
+
+
+def _port_host_element(address: str, ports: List[int], reason: str) -> ET.Element:
+    """Build a host element for open ports found by a tool without XML output."""
+    try:
+        addrtype = 'ipv6' if ipaddress.ip_address(address).version == 6 else 'ipv4'
+    except ValueError:
+        addrtype = None
+
+    host = ET.Element('host')
+    ET.SubElement(host, 'status', state='up', reason=reason)
+    if addrtype:
+        ET.SubElement(host, 'address', addr=address, addrtype=addrtype)
+    else:
+        ET.SubElement(ET.SubElement(host, 'hostnames'), 'hostname', name=address, type='user')
+    ports_element = ET.SubElement(host, 'ports')
+    for portid in ports:
+        port = ET.SubElement(ports_element, 'port', protocol='tcp', portid=str(portid))
+        ET.SubElement(port, 'state', state='open', reason=reason)
+    return host
+
+
+def _runstats_totals(reports: List[ET.Element], hosts_up: int) -> int:
+    """Estimate the number of scanned addresses.
+
+    Reports that found the same hosts scanned the same targets and count once;
+    reports covering disjoint hosts (shards, scanner nodes) add up.
+    """
+    groups = []
+    for root in reports:
+        stats = root.find('runstats/hosts')
+        total = int(stats.get('total', 0)) if stats is not None else 0
+        up_hosts = {_host_key(host) for host in root.findall('host')
+                    if host.find('status') is None or host.find('status').get('state') == 'up'}
+        for group in groups:
+            if group['hosts'] & up_hosts:
+                group['hosts'] |= up_hosts
+                group['total'] = max(group['total'], total)
+                break
+        else:
+            groups.append({'hosts': up_hosts, 'total': total})
+    return max(sum(group['total'] for group in groups), hosts_up)
+
+
+def _merge_finished(base: ET.Element, reports: List[ET.Element]):
+    """Keep the latest finish time and the longest elapsed time of all reports."""
+    base_finished = base.find('runstats/finished')
+    if base_finished is None:
+        return
+    for root in reports:
+        finished = root.find('runstats/finished')
+        if finished is None or finished is base_finished:
+            continue
+        if int(finished.get('time', 0)) > int(base_finished.get('time', 0)):
+            for key in ('time', 'timestr'):
+                if finished.get(key) is not None:
+                    base_finished.set(key, finished.get(key))
+        elapsed = max(float(base_finished.get('elapsed', 0)), float(finished.get('elapsed', 0)))
+        base_finished.set('elapsed', f"{elapsed:.2f}")
+
+
+def merge_nmap_xml(xml_paths: List, output_path, extra_ports: Optional[Dict[str, List[int]]] = None,
+                   extra_reason: str = 'rustscan') -> Optional[Path]:
+    """Merge several nmap XML reports into a single nmaprun document.
+
+    Hosts found by more than one command are combined: ports are merged
+    by protocol and number, keeping the most detailed service and the
+    longest output of each script. extra_ports adds open ports found by
+    tools without XML output (e.g. rustscan).
+    """
+    output_path = Path(output_path)
+    existing = [Path(p) for p in xml_paths if Path(p).exists()]
+
+    if not existing and not extra_ports:
+        return None
+
+    if len(existing) == 1 and not extra_ports:
+        if existing[0] != output_path:
+            shutil.copy(existing[0], output_path)
+        return output_path
+
+    reports = [root for root in (_load_nmap_root(xml_path) for xml_path in existing) if root is not None]
+    if reports:
+        base = reports[0]
+    elif extra_ports:
+        base = ET.Element('nmaprun', scanner=extra_reason)
+        runstats = ET.SubElement(base, 'runstats')
+        ET.SubElement(runstats, 'hosts', up='0', down='0', total='0')
+    else:
+        return None
+
+    # Combine every observation of each host, in order of first appearance
+    merged = {}
+    for root in reports:
+        for host in root.findall('host'):
+            key = _host_key(host) or f"unidentified-{len(merged)}"
+            if key in merged:
+                _merge_host(merged[key], host)
+            else:
+                merged[key] = copy.deepcopy(host)
+
+    for address, ports in (extra_ports or {}).items():
+        host = _port_host_element(address, ports, extra_reason)
+        if address in merged:
+            _merge_host(merged[address], host)
+        else:
+            merged[address] = host
+
+    for host in base.findall('host'):
+        base.remove(host)
+
+    # Hosts go before the trailing runstats element, as nmap writes them
+    runstats = base.find('runstats')
+    insert_at = list(base).index(runstats) if runstats is not None else len(base)
+    for host in merged.values():
+        base.insert(insert_at, host)
+        insert_at += 1
+
+    hosts_up = sum(1 for host in merged.values()
+                   if host.find('status') is not None and host.find('status').get('state') == 'up')
+    counts = base.find('runstats/hosts')
+    if counts is not None:
+        total = _runstats_totals(reports, hosts_up)
+        counts.set('up', str(hosts_up))
+        counts.set('down', str(max(total - hosts_up, 0)))
+        counts.set('total', str(total))
+    _merge_finished(base, reports)
+
+    ET.ElementTree(base).write(output_path, encoding='utf-8', xml_declaration=True)
+    return output_path
+
+
+def _iter_trivy_entries(json_path: Path) -> Iterator[Tuple[str, Dict]]:
+    """Yield the image/filesystem results and the Kubernetes resources of a Trivy report, one at a time."""
+    with open(json_path, encoding='utf-8') as report:
+        for path, entry in iter_json_items(report, TRIVY_ENTRY_PATHS):
+            if isinstance(entry, dict):
+                yield path[0], entry
+
+
+def _dedup_results(results: List[Dict], seen: set, scope: str = '') -> List[Dict]:
+    """Drop the vulnerabilities of Trivy results that an earlier report already listed."""
+    kept = []
+    for result in results or []:
+        vulnerabilities = []
+        for vuln in result.get('Vulnerabilities') or []:
+            key = (scope, result.get('Target'), vuln.get('PkgName'), vuln.get('InstalledVersion'),
+                   vuln.get('VulnerabilityID'))
+            if key not in seen:
+                seen.add(key)
+                vulnerabilities.append(vuln)
+        if vulnerabilities or not result.get('Vulnerabilities'):
+            kept.append(dict(result, Vulnerabilities=vulnerabilities or result.get('Vulnerabilities')))
+    return kept
+
+
+def merge_trivy_json(json_paths: List, output_path) -> Optional[Path]:
+    """Merge several Trivy JSON reports, listing each package vulnerability once per target.
+
+    Reports are streamed one entry at a time, in a single pass each; only the
+    keys of the vulnerabilities already written are kept in memory. The
+    entries of a truncated report read before the error are kept.
+    """
+    output_path = Path(output_path)
+    existing = [Path(p) for p in json_paths if Path(p).exists()]
+
+    if not existing:
+        return None
+
+    if len(existing) == 1:
+        if existing[0] != output_path:
+            shutil.copy(existing[0], output_path)
+        return output_path
+
+    seen = set()
+    written = 0
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    # Kubernetes resources come after all results in the output: they wait in a side file
+    resources_path = output_path.with_name(output_path.name + '.resources.tmp')
+    try:
+        with open(tmp_path, 'w') as output, open(resources_path, 'w+') as resources:
+            output.write('{"SchemaVersion": 2,\n"Results": [')
+            first = {'Results': True, 'Resources': True}
+            for json_path in existing:
+                try:
+                    for section, entry in _iter_trivy_entries(json_path):
+                        if section == 'Results':
+                            entries, section_file = _dedup_results([entry], seen), output
+                        else:
+                            scope = '/'.join(str(entry.get(key, '')) for key in ('Namespace', 'Kind', 'Name'))
+                            entries = [dict(entry, Results=_dedup_results(entry.get('Results'), seen, scope))]
+                            section_file = resources
+                        for merged_entry in entries:
+                            section_file.write(('\n' if first[section] else ',\n') + json.dumps(merged_entry))
+                            first[section] = False
+                    written += 1
+                except (OSError, ValueError) as e:
+                    print(f"Skipping unreadable Trivy report {json_path}: {e}")
+            output.write('\n],\n"Resources": [')
+            resources.seek(0)
+            shutil.copyfileobj(resources, output)
+            output.write('\n]}\n')
+        if not written:
+            return None
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, resources_path):
+            if path.exists():
+                path.unlink()
+
+    return output_path
@@ -0,0 +1,561 @@
+"""
+Result model for Scansible
+-------------------------
+Normalized hosts, ports, services, scripts and vulnerabilities, built in a
+single pass over a report and cached next to it for every consumer.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Bump when the layout of the cached model changes
+MODEL_VERSION = 2
+
+# Suffix of the cached model, kept off '*.json' so report globs do not pick it up
+MODEL_SUFFIX = '.model'
+
+SEVERITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO', 'UNKNOWN')
+
+TRIVY_METADATA = {'scan_type': 'Container security scan'}
+
+# Scripts whose output tables list vulnerabilities the way the vulners NSE script does
+VULNERS_LAYOUT_SCRIPTS = ('vulners', 'vulndb')
+
+
+def as_list(value) -> List:
+    """Return an xmltodict value as a list (a single child is not wrapped in one)."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def severity_from_cvss(cvss: float) -> Optional[str]:
+    """Map a CVSS score to a severity, or None when there is no score."""
+    if cvss >= 9.0:
+        return 'CRITICAL'
+    if cvss >= 7.0:
+        return 'HIGH'
+    if cvss >= 4.0:
+        return 'MEDIUM'
+    if cvss > 0:
+        return 'LOW'
+    return None
+
+
+class Vulnerability:
+    """A vulnerability reported for a service (vulners) or a package (Trivy)."""
+
+    __slots__ = ('id', 'cvss', 'severity', 'type', 'is_exploit')
+
+    def __init__(self, id: str, cvss: float = 0.0, severity: Optional[str] = None,
+                 type: Optional[str] = None, is_exploit: bool = False):
+        self.id = id
+        self.cvss = cvss
+        self.severity = severity or severity_from_cvss(cvss)
+        self.type = type
+        self.is_exploit = is_exploit
+
+    def key(self) -> Tuple:
+        """Return the fields that identify a catalogue entry."""
+        return (self.id, self.cvss, self.severity, self.type, self.is_exploit)
+
+    def to_list(self) -> List:
+        return list(self.key())
+
+    @classmethod
+    def from_list(cls, values: List) -> 'Vulnerability':
+        return cls(*values)
+
+
+class VulnCatalogue:
+    """Unique vulnerabilities, each stored once and referred to by its index.
+
+    The same CVE is usually reported with the same score on every host running
+    a given version, so hosts and packages share the interned instance and
+    serialized reports store the index instead of the whole entry.
+    """
+
+    def __init__(self, entries: Iterable[Vulnerability] = ()):
+        self.entries: List[Vulnerability] = []
+        self._refs: Dict[Tuple, int] = {}
+        self._lock = threading.Lock()
+        for vulnerability in entries:
+            self.ref(vulnerability)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def ref(self, vulnerability: Vulnerability) -> int:
+        """Return the index of a vulnerability, adding it to the catalogue if it is new."""
+        key = vulnerability.key()
+        with self._lock:
+            ref = self._refs.get(key)
+            if ref is None:
+                ref = len(self.entries)
+                self.entries.append(vulnerability)
+                self._refs[key] = ref
+        return ref
+
+    def intern(self, vulnerability: Vulnerability) -> Vulnerability:
+        """Return the catalogue instance equal to a vulnerability."""
+        return self.entries[self.ref(vulnerability)]
+
+    def get(self, ref: int) -> Vulnerability:
+        return self.entries[ref]
+
+    def to_list(self) -> List[List]:
+        return [vulnerability.to_list() for vulnerability in self.entries]
+
+    @classmethod
+    def from_list(cls, values: List[List]) -> 'VulnCatalogue':
+        return cls(Vulnerability.from_list(vulnerability) for vulnerability in values)
+
+
+def _intern(vulnerability: Vulnerability, catalogue: Optional[VulnCatalogue]) -> Vulnerability:
+    """Return the instance of a vulnerability shared within a report, when its catalogue is given."""
+    return catalogue.intern(vulnerability) if catalogue is not None else vulnerability
+
+
+class Script:
+    """Output of an NSE script run against a port."""
+
+    __slots__ = ('id', 'output', 'vulnerabilities')
+
+    def __init__(self, id: str, output: str = '', vulnerabilities: Optional[List[Vulnerability]] = None):
+        self.id = id
+        self.output = output
+        self.vulnerabilities = vulnerabilities or []
+
+    def to_list(self, catalogue: VulnCatalogue) -> List:
+        return [self.id, self.output, [catalogue.ref(vuln) for vuln in self.vulnerabilities]]
+
+    @classmethod
+    def from_list(cls, values: List, catalogue: VulnCatalogue) -> 'Script':
+        return cls(values[0], values[1], [catalogue.get(ref) for ref in values[2]])
+
+
+class Service:
+    """Service detected on a port."""
+
+    __slots__ = ('name', 'product', 'version', 'extrainfo', 'cpes')
+
+    def __init__(self, name: str = 'unknown', product: Optional[str] = None, version: Optional[str] = None,
+                 extrainfo: Optional[str] = None, cpes: Optional[List[str]] = None):
+        self.name = name
+        self.product = product
+        self.version = version
+        self.extrainfo = extrainfo
+        self.cpes = cpes or []
+
+    def to_list(self) -> List:
+        return [self.name, self.product, self.version, self.extrainfo, self.cpes]
+
+    @classmethod
+    def from_list(cls, values: List) -> 'Service':
+        return cls(*values)
+
+
+class Port:
+    """A scanned port with its state, service and script results."""
+
+    __slots__ = ('protocol', 'portid', 'state', 'service', 'scripts')
+
+    def __init__(self, protocol: str, portid: str, state: Optional[str] = None,
+                 service: Optional[Service] = None, scripts: Optional[List[Script]] = None):
+        self.protocol = protocol
+        self.portid = portid
+        self.state = state
+        self.service = service or Service()
+        self.scripts = scripts or []
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == 'open'
+
+    @property
+    def vulnerabilities(self) -> Iterator[Vulnerability]:
+        for script in self.scripts:
+            yield from script.vulnerabilities
+
+    def to_list(self, catalogue: VulnCatalogue) -> List:
+        return [self.protocol, self.portid, self.state, self.service.to_list(),
+                [script.to_list(catalogue) for script in self.scripts]]
+
+    @classmethod
+    def from_list(cls, values: List, catalogue: VulnCatalogue) -> 'Port':
+        return cls(values[0], values[1], values[2], Service.from_list(values[3]),
+                   [Script.from_list(script, catalogue) for script in values[4]])
+
+
+class Host:
+    """A scanned host with its addresses, ports and OS matches."""
+
+    __slots__ = ('address', 'addrtype', 'hostnames', 'status', 'ports', 'os_matches')
+
+    def __init__(self, address: Optional[str], addrtype: Optional[str] = None, hostnames: Optional[List[str]] = None,
+                 status: Optional[str] = None, ports: Optional[List[Port]] = None,
+                 os_matches: Optional[List[Tuple[str, str]]] = None):
+        self.address = address
+        self.addrtype = addrtype
+        self.hostnames = hostnames or []
+        self.status = status
+        self.ports = ports or []
+        self.os_matches = os_matches or []
+
+    @property
+    def open_ports(self) -> List[Port]:
+        return [port for port in self.ports if port.is_open]
+
+    def to_list(self, catalogue: VulnCatalogue) -> List:
+        return [self.address, self.addrtype, self.hostnames, self.status,
+                [port.to_list(catalogue) for port in self.ports], [list(match) for match in self.os_matches]]
+
+    @classmethod
+    def from_list(cls, values: List, catalogue: VulnCatalogue) -> 'Host':
+        return cls(values[0], values[1], values[2], values[3],
+                   [Port.from_list(port, catalogue) for port in values[4]], [tuple(match) for match in values[5]])
+
+
+class PackageFinding:
+    """A vulnerable package found by Trivy in an artifact."""
+
+    __slots__ = ('target', 'package', 'installed_version', 'fixed_version', 'title', 'vulnerability')
+
+    def __init__(self, target: str, package: str, installed_version: Optional[str], fixed_version: Optional[str],
+                 title: Optional[str], vulnerability: Vulnerability):
+        self.target = target
+        self.package = package
+        self.installed_version = installed_version
+        self.fixed_version = fixed_version
+        self.title = title
+        self.vulnerability = vulnerability
+
+    def to_list(self, catalogue: VulnCatalogue) -> List:
+        return [self.target, self.package, self.installed_version, self.fixed_version, self.title,
+                catalogue.ref(self.vulnerability)]
+
+    @classmethod
+    def from_list(cls, values: List, catalogue: VulnCatalogue) -> 'PackageFinding':
+        return cls(*values[:5], catalogue.get(values[5]))
+
+
+class ScanResult:
+    """Normalized content of a scan report."""
+
+    __slots__ = ('scanner', 'metadata', 'hosts', 'packages')
+
+    def __init__(self, scanner: str = 'unknown', metadata: Optional[Dict] = None,
+                 hosts: Optional[List[Host]] = None, packages: Optional[List[PackageFinding]] = None):
+        self.scanner = scanner
+        self.metadata = metadata or {}
+        self.hosts = hosts or []
+        self.packages = packages or []
+
+    def iter_vulnerabilities(self) -> Iterator[Tuple[Optional[Host], Optional[Port], Vulnerability]]:
+        """Yield every vulnerability with the host and port it was found on (None for packages)."""
+        for host in self.hosts:
+            for port in host.ports:
+                for vulnerability in port.vulnerabilities:
+                    yield host, port, vulnerability
+        for finding in self.packages:
+            yield None, None, finding.vulnerability
+
+    def severity_counts(self) -> Dict[str, int]:
+        """Count vulnerabilities by severity."""
+        counts = dict.fromkeys(SEVERITIES, 0)
+        # Every occurrence counts, including those of one interned vulnerability on several ports
+        for _, _, vulnerability in self.iter_vulnerabilities():
+            if vulnerability.severity in counts:
+                counts[vulnerability.severity] += 1
+            elif vulnerability.severity is not None:
+                counts['UNKNOWN'] += 1
+        return counts
+
+    def to_dict(self) -> Dict:
+        catalogue = VulnCatalogue()
+        hosts = [host.to_list(catalogue) for host in self.hosts]
+        packages = [finding.to_list(catalogue) for finding in self.packages]
+        return {
+            'version': MODEL_VERSION,
+            'scanner': self.scanner,
+            'metadata': self.metadata,
+            'catalogue': catalogue.to_list(),
+            'hosts': hosts,
+            'packages': packages,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScanResult':
+        catalogue = VulnCatalogue.from_list(data['catalogue'])
+        return cls(data['scanner'], data['metadata'], [Host.from_list(host, catalogue) for host in data['hosts']],
+                   [PackageFinding.from_list(finding, catalogue) for finding in data['packages']])
+
+
+# Model fields holding other model records, used to rebuild objects from plain records
+_NESTED_FIELDS = {
+    Script: {'vulnerabilities': Vulnerability},
+    Port: {'service': Service, 'scripts': Script},
+    Host: {'ports': Port},
+    PackageFinding: {'vulnerability': Vulnerability},
+}
+
+
+def to_record(value, catalogue: Optional[VulnCatalogue] = None):
+    """Convert a model object to plain dicts and lists, keyed by field name.
+
+    With a catalogue, vulnerabilities are replaced by their index in it.
+    """
+    if catalogue is not None and isinstance(value, Vulnerability):
+        return catalogue.ref(value)
+    if isinstance(value, (Vulnerability, Script, Service, Port, Host, PackageFinding)):
+        return {name: to_record(getattr(value, name), catalogue) for name in value.__slots__}
+    if isinstance(value, (list, tuple)):
+        return [to_record(item, catalogue) for item in value]
+    return value
+
+
+def from_record(cls, record, catalogue: Optional[VulnCatalogue] = None):
+    """Rebuild a model object of the given class from a record made by to_record.
+
+    Vulnerabilities given in full are interned in the catalogue, if any.
+    """
+    if cls is Vulnerability:
+        if isinstance(record, int):
+            return catalogue.get(record)
+        return _intern(cls(**{name: record.get(name) for name in cls.__slots__}), catalogue)
+    values = {}
+    for name in cls.__slots__:
+        value = record.get(name)
+        nested = _NESTED_FIELDS.get(cls, {}).get(name)
+        if nested and isinstance(value, list):
+            value = [from_record(nested, item, catalogue) for item in value]
+        elif nested and value is not None:
+            value = from_record(nested, value, catalogue)
+        values[name] = value
+    return cls(**values)
+
+
+def _parse_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _collect_vulners_entries(table, vulnerabilities: List[Vulnerability], catalogue: Optional[VulnCatalogue]):
+    """Walk the nested tables of a vulners script output, collecting the entries that carry an id."""
+    for entry in as_list(table):
+        if not isinstance(entry, dict):
+            continue
+        fields = {elem.get('@key'): elem.get('#text') for elem in as_list(entry.get('elem')) if isinstance(elem, dict)}
+        if fields.get('id'):
+            vulnerabilities.append(_intern(Vulnerability(
+                fields['id'],
+                cvss=_parse_float(fields.get('cvss')),
+                type=fields.get('type'),
+                is_exploit=fields.get('is_exploit') == 'true',
+            ), catalogue))
+        _collect_vulners_entries(entry.get('table'), vulnerabilities, catalogue)
+
+
+def parse_nmap_service(service_data: Dict) -> Service:
+    """Build a Service from the xmltodict service record of a port."""
+    return Service(
+        service_data.get('@name', 'unknown'),
+        service_data.get('@product'),
+        service_data.get('@version'),
+        service_data.get('@extrainfo'),
+        [cpe if isinstance(cpe, str) else cpe.get('#text', '') for cpe in as_list(service_data.get('cpe'))],
+    )
+
+
+def parse_nmap_host(host: Dict, catalogue: Optional[VulnCatalogue] = None) -> Host:
+    """Build a Host from an xmltodict host record.
+
+    The hosts of one report share their vulnerability instances through its catalogue.
+    """
+    address = None
+    addrtype = None
+    for entry in as_list(host.get('address')):
+        # Prefer IP addresses over MAC addresses
+        if entry.get('@addrtype') in ('ipv4', 'ipv6') or address is None:
+            address, addrtype = entry.get('@addr'), entry.get('@addrtype')
+            if addrtype in ('ipv4', 'ipv6'):
+                break
+
+    hostnames = [entry.get('@name') for entry in as_list((host.get('hostnames') or {}).get('hostname'))
+                 if isinstance(entry, dict) and entry.get('@name')]
+
+    ports = []
+    for entry in as_list((host.get('ports') or {}).get('port')):
+        if not entry:
+            continue
+        service = parse_nmap_service(entry.get('service') or {})
+
+        scripts = []
+        # A CVE reported by several scripts (or twice in nested tables) is counted once per port
+        seen_ids = set()
+        for script_data in as_list(entry.get('script')):
+            if not isinstance(script_data, dict):
+                continue
+            vulnerabilities = []
+            if script_data.get('@id') in VULNERS_LAYOUT_SCRIPTS:
+                _collect_vulners_entries(script_data.get('table'), vulnerabilities, catalogue)
+            unique = []
+            for vulnerability in vulnerabilities:
+                if vulnerability.id not in seen_ids:
+                    seen_ids.add(vulnerability.id)
+                    unique.append(vulnerability)
+            scripts.append(Script(script_data.get('@id', ''), script_data.get('@output', ''), unique))
+
+        ports.append(Port(entry.get('@protocol', 'tcp'), entry.get('@portid'),
+                          (entry.get('state') or {}).get('@state'), service, scripts))
+
+    os_matches = [(match.get('@name'), match.get('@accuracy'))
+                  for match in as_list((host.get('os') or {}).get('osmatch'))
+                  if isinstance(match, dict) and '@name' in match]
+
+    return Host(address, addrtype, hostnames, (host.get('status') or {}).get('@state'), ports, os_matches)
+
+
+def parse_trivy_vulnerability(target: str, vuln: Dict, catalogue: Optional[VulnCatalogue] = None) -> PackageFinding:
+    """Build a PackageFinding from a Trivy vulnerability record."""
+    cvss_scores = [_parse_float(score.get('V3Score') or score.get('V2Score'))
+                   for score in (vuln.get('CVSS') or {}).values() if isinstance(score, dict)]
+    return PackageFinding(
+        target,
+        vuln.get('PkgName', ''),
+        vuln.get('InstalledVersion'),
+        vuln.get('FixedVersion'),
+        vuln.get('Title'),
+        _intern(Vulnerability(vuln.get('VulnerabilityID', ''), max(cvss_scores, default=0.0),
+                              severity=(vuln.get('Severity') or 'UNKNOWN').upper()), catalogue),
+    )
+
+
+def nmap_metadata(nmaprun: Dict) -> Dict:
+    """Return the run metadata from the attributes of an xmltodict nmaprun record."""
+    return {
+        'scan_type': nmaprun.get('@scanner', 'Nmap scan'),
+        'nmap_version': nmaprun.get('@version', 'Unknown'),
+        'start_time': nmaprun.get('@startstr', 'Unknown'),
+        'arguments': nmaprun.get('@args', 'Unknown'),
+    }
+
+
+def build_scan_result(data: Dict) -> ScanResult:
+    """Build the normalized model from a parsed nmap (xmltodict) or Trivy JSON report."""
+    # Scoped to this report: nothing outlives the result
+    catalogue = VulnCatalogue()
+    if 'nmaprun' in data:
+        nmaprun = data.get('nmaprun') or {}
+        hosts = [parse_nmap_host(host, catalogue) for host in as_list(nmaprun.get('host')) if host]
+        # Package findings of the scan's Trivy commands, merged in by the scanner
+        packages = [from_record(PackageFinding, record, catalogue) for record in data.get('findings') or []]
+        return ScanResult('nmap', nmap_metadata(nmaprun), hosts, packages)
+
+    if 'Results' in data:
+        packages = [parse_trivy_vulnerability(result.get('Target', ''), vuln, catalogue)
+                    for result in data.get('Results') or []
+                    for vuln in result.get('Vulnerabilities') or []]
+        return ScanResult('trivy', dict(TRIVY_METADATA), packages=packages)
+
+    return ScanResult()
+
+
+def model_path(report_path: Path) -> Path:
+    """Return the path of the cached model of a report."""
+    return Path(report_path).with_suffix(MODEL_SUFFIX)
+
+
+def save_scan_result(result: ScanResult, report_path: Path):
+    """Cache the model of a report next to it."""
+    path = model_path(report_path)
+    tmp_path = path.with_suffix(MODEL_SUFFIX + '.tmp')
+    with open(tmp_path, 'w') as model_file:
+        json.dump(result.to_dict(), model_file, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+class ScanResultWriter:
+    """Writes the cached model of a report one host at a time, so that no host list is held in memory.
+
+    finish() must be called once the report itself is in place, so that the
+    model is not older than the report.
+    """
+
+    def __init__(self, report_path: Path, scanner: str):
+        """Start the model of a report produced by scanner."""
+        self.path = model_path(report_path)
+        self.scanner = scanner
+        self._tmp_path = self.path.with_suffix(MODEL_SUFFIX + '.tmp')
+        self._catalogue = VulnCatalogue()
+        self._count = 0
+        self._file = open(self._tmp_path, 'w')
+        # Hosts come first: the catalogue is only complete once they are all written
+        self._file.write('{"hosts":[')
+
+    def add_host(self, host: Host):
+        """Append a host to the model."""
+        if self._count:
+            self._file.write(',')
+        self._file.write(json.dumps(host.to_list(self._catalogue), separators=(',', ':')))
+        self._count += 1
+
+    def finish(self, metadata: Dict, packages: Iterable[PackageFinding] = ()):
+        """Write the rest of the model and put it in place."""
+        tail = {
+            'version': MODEL_VERSION,
+            'scanner': self.scanner,
+            'metadata': metadata,
+            'packages': [finding.to_list(self._catalogue) for finding in packages],
+        }
+        tail['catalogue'] = self._catalogue.to_list()
+        self._file.write('],' + json.dumps(tail, separators=(',', ':'))[1:])
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Drop the partly written model."""
+        self._file.close()
+        try:
+            self._tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def load_scan_result(report_path: Path) -> ScanResult:
+    """Load the model of a report, from its cache when it is up to date, else by parsing the report once."""
+    report_path = Path(report_path)
+
+    # Line-delimited reports are already normalized and can be read directly
+    from scansible.core.ndjson import is_ndjson_report, load_ndjson_report
+    if is_ndjson_report(report_path):
+        return load_ndjson_report(report_path)
+
+    path = model_path(report_path)
+    try:
+        if path.stat().st_mtime >= report_path.stat().st_mtime:
+            with open(path) as model_file:
+                data = json.load(model_file)
+            if data.get('version') == MODEL_VERSION:
+                return ScanResult.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        pass
+
+    # Trivy reports can be huge (whole clusters) and are streamed instead of loaded
+    from scansible.core.trivy import is_trivy_report, iter_trivy_findings
+    if is_trivy_report(report_path):
+        result = ScanResult('trivy', dict(TRIVY_METADATA), packages=list(iter_trivy_findings(report_path)))
+    else:
+        with open(report_path) as report_file:
+            result = build_scan_result(json.load(report_file))
+
+    try:
+        save_scan_result(result, report_path)
+    except OSError:
+        pass
+    return result
@@ -0,0 +1,182 @@
+"""
+NDJSON report module for Scansible
+---------------------------------
+Line-delimited reports: a header record followed by one normalized host per
+line, optionally gzip-compressed, so readers can stream hosts one at a time.
+Vulnerabilities are written once, on a catalogue line placed before the first
+record using them, and records refer to them by index.
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Union
+
+from scansible.core.hostindex import NDJSON_LAYOUT, index_entry, save_host_index
+from scansible.core.ingest import iter_nmap_records
+from scansible.core.model import (
+    Host, PackageFinding, ScanResult, VulnCatalogue, Vulnerability, from_record, nmap_metadata, parse_nmap_host, to_record
+)
+
+NDJSON_FORMAT = 'scansible-ndjson'
+NDJSON_VERSION = 2
+
+REPORT_FORMATS = ('json', 'ndjson')
+
+
+def report_suffix(report_format: str, compress: bool = False) -> str:
+    """Return the file suffix of a report format."""
+    if report_format == 'ndjson':
+        return '.ndjson.gz' if compress else '.ndjson'
+    return '.json'
+
+
+def is_ndjson_report(path: Path) -> bool:
+    """Whether a report path is a line-delimited report."""
+    return Path(path).name.endswith(('.ndjson', '.ndjson.gz'))
+
+
+def open_report(path: Path, mode: str = 'rt'):
+    """Open a report as text, transparently handling gzip compression."""
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def write_ndjson_report(output_path: Path, scanner: str, metadata: Dict, hosts: Iterable[Host],
+                        findings: Iterable[PackageFinding] = (),
+                        on_host: Optional[Callable[[Host], None]] = None) -> int:
+    """Write an NDJSON report from host and package finding streams and return the number of hosts."""
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    host_count = 0
+    entries = []
+    catalogue = VulnCatalogue()
+
+    try:
+        # Compression follows the final name, not the temporary one
+        if output_path.suffix == '.gz':
+            stream = gzip.open(tmp_path, 'wt', encoding='utf-8')
+        else:
+            stream = open(tmp_path, 'w', encoding='utf-8')
+        with stream:
+            header = {
+                'format': NDJSON_FORMAT,
+                'version': NDJSON_VERSION,
+                'scanner': scanner,
+                'metadata': metadata,
+            }
+            line = json.dumps(header, separators=(',', ':')) + '\n'
+            stream.write(line)
+            # json.dumps escapes non-ASCII characters, so character counts are byte counts
+            position = len(line)
+
+            def write_record(value, key: Optional[str] = None) -> str:
+                nonlocal position
+                known = len(catalogue)
+                record = to_record(value, catalogue)
+                data = json.dumps({key: record} if key else record, separators=(',', ':'))
+                # Entries first seen in this record are defined just before it
+                if len(catalogue) > known:
+                    vulns = [vuln.to_list() for vuln in catalogue.entries[known:]]
+                    vulns_line = json.dumps({'vulns': vulns}, separators=(',', ':')) + '\n'
+                    stream.write(vulns_line)
+                    position += len(vulns_line)
+                stream.write(data + '\n')
+                return data
+
+            for host in hosts:
+                record = write_record(host)
+                entries.append(index_entry(host, position, len(record)))
+                position += len(record) + 1
+                host_count += 1
+                if on_host:
+                    on_host(host)
+
+            # Package findings are wrapped so readers can tell them from hosts
+            for finding in findings:
+                write_record(finding, 'finding')
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    # Compressed reports cannot be memory-mapped, so only plain ones are indexed
+    if output_path.suffix != '.gz':
+        save_host_index(output_path, NDJSON_LAYOUT, entries, catalogue)
+    return host_count
+
+
+def convert_nmap_xml_to_ndjson(xml_path: Path, output_path: Path, findings: Iterable[PackageFinding] = (),
+                               on_host: Optional[Callable[[Host], None]] = None,
+                               on_record: Optional[Callable[[Dict], None]] = None) -> int:
+    """Stream an nmap XML report into an NDJSON report and return the number of hosts.
+
+    on_record may annotate each xmltodict host record before it is parsed.
+    """
+    records = iter_nmap_records(xml_path)
+    # The root element always comes first and carries the run metadata
+    _, root = next(records)
+    catalogue = VulnCatalogue()
+
+    def hosts():
+        for kind, record in records:
+            if kind == 'host':
+                if on_record:
+                    on_record(record)
+                yield parse_nmap_host(record, catalogue)
+
+    return write_ndjson_report(output_path, 'nmap', nmap_metadata(root), hosts(), findings, on_host)
+
+
+def read_ndjson_header(path: Path) -> Dict:
+    """Read the header record of an NDJSON report."""
+    with open_report(path) as report:
+        header = json.loads(report.readline() or '{}')
+    if header.get('format') != NDJSON_FORMAT:
+        raise ValueError(f"Not a Scansible NDJSON report: {path}")
+    return header
+
+
+def add_catalogue_line(catalogue: VulnCatalogue, record: Dict):
+    """Append the entries of a catalogue line to the catalogue of the report being read."""
+    for values in record['vulns']:
+        catalogue.ref(Vulnerability.from_list(values))
+
+
+def iter_ndjson_records(path: Path) -> Iterator[Union[Host, PackageFinding]]:
+    """Yield the hosts and package findings of an NDJSON report one at a time."""
+    catalogue = VulnCatalogue()
+    with open_report(path) as report:
+        report.readline()
+        for line in report:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'vulns' in record:
+                add_catalogue_line(catalogue, record)
+            elif 'finding' in record:
+                yield from_record(PackageFinding, record['finding'], catalogue)
+            else:
+                yield from_record(Host, record, catalogue)
+
+
+def iter_ndjson_hosts(path: Path) -> Iterator[Host]:
+    """Yield the hosts of an NDJSON report one at a time."""
+    for record in iter_ndjson_records(path):
+        if isinstance(record, Host):
+            yield record
+
+
+def load_ndjson_report(path: Path) -> ScanResult:
+    """Load a whole NDJSON report into the normalized model."""
+    header = read_ndjson_header(path)
+    result = ScanResult(header.get('scanner', 'nmap'), header.get('metadata', {}))
+    for record in iter_ndjson_records(path):
+        if isinstance(record, Host):
+            result.hosts.append(record)
+        else:
+            result.packages.append(record)
+    return result
@@ -4,51 +4,176 @@ Template Parser module for Scansible
 Parses markdown template files to extract scan commands.
 """
 
+import hashlib
+import json
+import threading
 from pathlib import Path
 from typing import List, Dict, Set, Optional
 
+from scansible.utils.config import Config
+
+# Bump when the layout of the persisted index changes
+TEMPLATE_INDEX_VERSION = 1
+
+
+class TemplateIndex:
+    """Compiled templates with a tag -> commands index, persisted on disk."""
+    
+    def __init__(self, templates_dir: Path, cache_path: Optional[Path] = None):
+        """Initialize the index for a templates directory and an optional cache file."""
+        self.templates_dir = Path(templates_dir)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._lock = threading.Lock()
+        self._templates = self._load()
+    
+    def _load(self) -> Dict[str, Dict]:
+        """Load the persisted index if it was built for the same templates directory."""
+        if not self.cache_path:
+            return {}
+        try:
+            data = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != TEMPLATE_INDEX_VERSION or data.get('templates_dir') != str(self.templates_dir):
+            return {}
+        return data.get('templates', {})
+    
+    def _save(self):
+        """Persist the compiled templates."""
+        if not self.cache_path:
+            return
+        data = {
+            'version': TEMPLATE_INDEX_VERSION,
+            'templates_dir': str(self.templates_dir),
+            'templates': self._templates,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data))
+            tmp_path.replace(self.cache_path)
+        except OSError as e:
+            print(f"Could not write template index {self.cache_path}: {e}")
+    
+    def _compile(self, content: str) -> Dict:
+        """Parse a template into its commands and per-tag command positions."""
+        commands = TemplateParser.parse_commands_from_template(content)
+        tag_index = {}
+        for position, command in enumerate(commands):
+            for tag in command.get('tags', []):
+                positions = tag_index.setdefault(tag, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+        return {
+            'sha256': hashlib.sha256(content.encode()).hexdigest(),
+            'content': content,
+            'commands': commands,
+            'tags': tag_index,
+        }
+    
+    def refresh(self):
+        """Recompile the templates whose modification time or content changed."""
+        with self._lock:
+            changed = False
+            present = set()
+            
+            for template_path in self.templates_dir.glob("*.md"):
+                present.add(template_path.name)
+                entry = self._templates.get(template_path.name)
+                try:
+                    stat = template_path.stat()
+                    if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                        continue
+                    content = template_path.read_text()
+                except OSError as e:
+                    print(f"Error reading template {template_path}: {e}")
+                    continue
+                
+                # A touched but unchanged file only needs its stat refreshed
+                if not entry or entry['sha256'] != hashlib.sha256(content.encode()).hexdigest():
+                    entry = self._compile(content)
+                entry['mtime'] = stat.st_mtime
+                entry['size'] = stat.st_size
+                self._templates[template_path.name] = entry
+                changed = True
+            
+            for name in set(self._templates) - present:
+                del self._templates[name]
+                changed = True
+            
+            if changed:
+                self._save()
+    
+    def _entry_for_scan_type(self, scan_type: str) -> Optional[Dict]:
+        """Return the compiled template of a scan type."""
+        self.refresh()
+        for name in (f"{scan_type}_scan.md", f"{scan_type}.md"):
+            if name in self._templates:
+                return self._templates[name]
+        return None
+    
+    def get_content(self, scan_type: str) -> Optional[str]:
+        """Return the raw content of the template of a scan type."""
+        entry = self._entry_for_scan_type(scan_type)
+        return entry['content'] if entry else None
+    
+    def get_commands(self, scan_type: str, filter_tags: List[str] = None) -> List[Dict]:
+        """Return the commands of a scan type, optionally keeping those with any of the tags."""
+        entry = self._entry_for_scan_type(scan_type)
+        if not entry:
+            return []
+        
+        if not filter_tags:
+            positions = range(len(entry['commands']))
+        else:
+            positions = sorted({position for tag in filter_tags for position in entry['tags'].get(tag, [])})
+        
+        # Callers get copies so the compiled commands are never modified
+        return [dict(entry['commands'][position], tags=list(entry['commands'][position].get('tags', [])))
+                for position in positions]
+    
+    def all_tags(self) -> Set[str]:
+        """Return the tags used by any template."""
+        self.refresh()
+        return {tag for entry in self._templates.values() for tag in entry['tags']}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_template_index(templates_dir: Path, cache_path: Optional[Path] = None) -> TemplateIndex:
+    """Return the process-wide index of a templates directory."""
+    templates_dir = Path(templates_dir)
+    with _indexes_lock:
+        if templates_dir not in _indexes:
+            _indexes[templates_dir] = TemplateIndex(templates_dir, cache_path)
+        return _indexes[templates_dir]
+
+
 class TemplateParser:
     """Parser for scan template files in markdown format."""
     
-    def __init__(self):
-        """Initialize the parser."""
-        self.templates_dir = Path(__file__).parent.parent / "templates"
+    def __init__(self, templates_dir: Optional[Path] = None, cache_path: Optional[Path] = None):
+        """Initialize the parser with its compiled template index."""
+        config = Config()
+        self.templates_dir = Path(templates_dir or config.get_templates_dir())
+        self.index = get_template_index(self.templates_dir, cache_path or config.get_cache_dir() / "templates.json")
         
     def get_template_for_scan_type(self, scan_type: str) -> Optional[str]:
         """Get the template content for a specific scan type."""
-        template_path = self.templates_dir / f"{scan_type}_scan.md"
-        
-        if template_path.exists():
-            return template_path.read_text()
-        
-        # Try alternative file naming
-        template_path = self.templates_dir / f"{scan_type}.md"
-        if template_path.exists():
-            return template_path.read_text()
-            
-        return None
+        return self.index.get_content(scan_type)
+    
+    def get_commands_for_scan_type(self, scan_type: str, filter_tags: List[str] = None) -> List[Dict]:
+        """Get the commands of a scan type, filtered by tags through the index."""
+        return self.index.get_commands(scan_type, filter_tags)
     
     def get_all_available_tags(self) -> Set[str]:
         """Get all available tags from all template files."""
-        all_tags = set()
-        
-        # Find all markdown files
-        md_files = list(self.templates_dir.glob("*.md"))
-        
-        for md_file in md_files:
-            try:
-                content = md_file.read_text()
-                
-                for line in content.splitlines():
-                    if line.strip().startswith("* Tags:"):
-                        tags = self._extract_tags_from_line(line)
-                        all_tags.update(tags)
-            except Exception as e:
-                print(f"Error reading template {md_file}: {e}")
-        
-        return all_tags
+        return self.index.all_tags()
     
-    def _extract_tags_from_line(self, line: str) -> List[str]:
+    @staticmethod
+    def _extract_tags_from_line(line: str) -> List[str]:
         """Extract tags from a line in the markdown file."""
         if "Tags:" not in line:
             return []
@@ -56,7 +181,8 @@ class TemplateParser:
         tags_part = line.split("Tags:")[1].strip()
         return [tag.lower().strip() for tag in tags_part.split("#") if tag.strip()]
     
-    def parse_commands_from_template(self, template_content: str, filter_tags: List[str] = None) -> List[Dict]:
+    @staticmethod
+    def parse_commands_from_template(template_content: str, filter_tags: List[str] = None) -> List[Dict]:
         """Parse commands from template content."""
         if not template_content:
             return []
@@ -90,7 +216,7 @@ class TemplateParser:
                 
             # Tags
             elif line.startswith('* Tags:') and current_command:
-                current_command['tags'] = self._extract_tags_from_line(line)
+                current_command['tags'] = TemplateParser._extract_tags_from_line(line)
         
         # Add the last command if it exists
         if current_command and 'command' in current_command:
@@ -0,0 +1,63 @@
+"""
+Pipeline module for Scansible
+----------------------------
+Parses port discovery output so that deep scans only probe open ports.
+"""
+
+import re
+from typing import Dict, List
+
+_RUSTSCAN_LINE = re.compile(r"^\s*(\S+)\s+->\s+\[([\d,\s]*)\]")
+_RUSTSCAN_OPEN_LINE = re.compile(r"^Open\s+\[?([^\s\]]+?)\]?:(\d+)\s*$")
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+_NMAP_HOST_LINE = re.compile(r"^Host:\s+(\S+)\s+\([^)]*\)\s+Ports:\s+(.*)$")
+
+
+def parse_rustscan_greppable(output: str) -> Dict[str, List[int]]:
+    """Parse rustscan output into host -> open ports.
+
+    Both the greppable form ('10.0.0.1 -> [22,80]') and the 'Open 10.0.0.1:22'
+    lines of a regular run are understood.
+    """
+    hosts = {}
+    for line in output.splitlines():
+        match = _RUSTSCAN_LINE.match(line)
+        if match:
+            ports = [int(port) for port in match.group(2).split(',') if port.strip()]
+            if ports:
+                hosts.setdefault(match.group(1), set()).update(ports)
+            continue
+        # Regular runs colour the address unless --accessible is given
+        match = _RUSTSCAN_OPEN_LINE.match(_ANSI_ESCAPE.sub('', line))
+        if match:
+            hosts.setdefault(match.group(1), set()).add(int(match.group(2)))
+    return {host: sorted(ports) for host, ports in hosts.items()}
+
+
+def parse_nmap_greppable(output: str) -> Dict[str, List[int]]:
+    """Parse 'nmap -oG -' output into host -> open TCP ports."""
+    hosts = {}
+    for line in output.splitlines():
+        match = _NMAP_HOST_LINE.match(line.split('\tIgnored State:')[0])
+        if not match:
+            continue
+        for entry in match.group(2).split(','):
+            fields = entry.strip().split('/')
+            if len(fields) >= 3 and fields[1] == 'open' and fields[2] == 'tcp':
+                hosts.setdefault(match.group(1), set()).add(int(fields[0]))
+    return {host: sorted(ports) for host, ports in hosts.items()}
+
+
+def parse_discovery_output(tool_name: str, output: str) -> Dict[str, List[int]]:
+    """Parse the output of a discovery command according to the tool that produced it."""
+    if tool_name == 'rustscan':
+        return parse_rustscan_greppable(output)
+    return parse_nmap_greppable(output)
+
+
+def group_hosts_by_ports(open_ports: Dict[str, List[int]]) -> Dict[str, List[str]]:
+    """Group hosts sharing the same open ports so one deep scan covers them all."""
+    groups = {}
+    for host, ports in open_ports.items():
+        groups.setdefault(','.join(str(port) for port in ports), []).append(host)
+    return groups
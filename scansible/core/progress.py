@@ -0,0 +1,143 @@
+"""
+Progress tracking module for Scansible
+-------------------------------------
+Turns nmap and Ansible output lines into percent complete, current task and ETA.
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Prefix of the machine-readable progress lines printed with --progress-json
+PROGRESS_PREFIX = "[progress] "
+
+# e.g. "SYN Stealth Scan Timing: About 45.20% done; ETC: 12:34 (0:01:23 remaining)"
+_NMAP_STATS = re.compile(r"Timing: About (\d+(?:\.\d+)?)% done(?:; ETC: \S+ \((\d+):(\d+):(\d+) remaining\))?")
+_ANSIBLE_TASK = re.compile(r"^TASK \[(.+?)\]")
+
+
+def parse_nmap_stats(line: str) -> Optional[Dict]:
+    """Parse an nmap --stats-every line into a fraction and remaining seconds."""
+    match = _NMAP_STATS.search(line)
+    if not match:
+        return None
+
+    remaining = None
+    if match.group(2) is not None:
+        hours, minutes, seconds = (int(value) for value in match.group(2, 3, 4))
+        remaining = hours * 3600 + minutes * 60 + seconds
+
+    return {'fraction': float(match.group(1)) / 100, 'remaining': remaining}
+
+
+def parse_ansible_task(line: str) -> Optional[str]:
+    """Return the task name of an Ansible 'TASK [...]' banner line."""
+    match = _ANSIBLE_TASK.match(line)
+    return match.group(1) if match else None
+
+
+class ProgressTracker:
+    """Aggregate progress over all the commands of a scan."""
+
+    def __init__(self, callback: Optional[Callable[[Dict], None]] = None, min_interval: float = 1.0):
+        """Initialize the tracker with a callback receiving progress snapshots."""
+        self.callback = callback
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._fractions = {}
+        self._names = {}
+        self._total = 0
+        self._completed = 0
+        self._percent = 0
+        self._remaining = None
+        self._current_task = None
+        self._start_time = time.time()
+        self._last_emit = 0.0
+
+    def add_commands(self, count: int):
+        """Register commands that are about to run."""
+        with self._lock:
+            self._total += count
+        self._emit()
+
+    def start_command(self, key, name: str):
+        """Mark a command as running."""
+        with self._lock:
+            self._fractions[key] = 0.0
+            self._names[key] = name
+            self._current_task = name
+            if len(self._fractions) + self._completed > self._total:
+                self._total = len(self._fractions) + self._completed
+        self._emit(force=True)
+
+    def update_command(self, key, fraction: float, remaining: Optional[int] = None):
+        """Record the completed fraction of a running command."""
+        with self._lock:
+            if key in self._fractions:
+                self._fractions[key] = min(max(fraction, 0.0), 1.0)
+                self._remaining = remaining
+        self._emit()
+
+    def finish_command(self, key):
+        """Mark a command as finished."""
+        with self._lock:
+            if key in self._fractions:
+                del self._fractions[key]
+                self._completed += 1
+                self._remaining = None
+                # Show another running command, if any
+                self._current_task = next(iter(self._names[k] for k in self._fractions), self._current_task)
+            self._names.pop(key, None)
+        self._emit(force=True)
+
+    def feed_line(self, key, line: str):
+        """Update progress from one output line of a command."""
+        stats = parse_nmap_stats(line)
+        if stats:
+            self.update_command(key, stats['fraction'], stats['remaining'])
+
+    def snapshot(self) -> Dict:
+        """Return the current percent complete, task and ETA."""
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict:
+        """Compute a snapshot; the caller holds the lock."""
+        if self._total:
+            done = self._completed + sum(self._fractions.values())
+            # Progress never moves backwards, even when more commands get registered
+            self._percent = max(self._percent, min(int(done * 100 / self._total), 100))
+
+        eta = None
+        elapsed = time.time() - self._start_time
+        if self._remaining is not None and self._total == 1:
+            eta = self._remaining
+        elif 0 < self._percent < 100:
+            eta = int(elapsed * (100 - self._percent) / self._percent)
+
+        return {
+            'percent': self._percent,
+            'current_task': self._current_task,
+            'eta': eta,
+            'completed': self._completed,
+            'total': self._total,
+        }
+
+    def _emit(self, force: bool = False):
+        """Send a snapshot to the callback, at most once per min_interval unless forced."""
+        if not self.callback:
+            return
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now
+            snapshot = self._snapshot()
+        self.callback(snapshot)
+
+
+def print_progress_json(snapshot: Dict):
+    """Print a progress snapshot as a machine-readable line."""
+    print(f"{PROGRESS_PREFIX}{json.dumps(snapshot)}", flush=True)
@@ -0,0 +1,291 @@
+"""
+Rule engine module for Scansible
+-------------------------------
+Loads recommendation rules from YAML files and compiles them into indexes by
+CVE, service, product and port, so each open port of a scan is only checked
+against the rules that can apply to it.
+"""
+
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+from scansible.core.model import SEVERITIES, Host, Port, as_list
+from scansible.core.vulndb import version_key
+
+# Rule files of a rules directory (.yml and .yaml)
+RULE_FILES = '*.y*ml'
+
+# Fields a rule can match on, all of which must hold for the rule to apply
+MATCH_FIELDS = ('service', 'product', 'version', 'port', 'cve', 'min_cvss')
+
+_VERSION_CONSTRAINT = re.compile(r"^(<=|>=|==|<|>|=)?\s*(\S+)$")
+
+_COMPARATORS = {
+    '<': lambda key, bound: key < bound,
+    '<=': lambda key, bound: key <= bound,
+    '>': lambda key, bound: key > bound,
+    '>=': lambda key, bound: key >= bound,
+    '==': lambda key, bound: key == bound,
+}
+
+
+def parse_version_spec(spec: str) -> List[Tuple[str, Tuple]]:
+    """Parse a version range such as '>=7.0,<9.3p2' into (operator, version key) constraints."""
+    constraints = []
+    for part in str(spec).split(','):
+        match = _VERSION_CONSTRAINT.match(part.strip())
+        if not match:
+            raise ValueError(f"invalid version constraint '{part.strip()}'")
+        operator = match.group(1) or '=='
+        constraints.append(('==' if operator == '=' else operator, version_key(match.group(2))))
+    return constraints
+
+
+def product_words(product: Optional[str]) -> List[str]:
+    """Split a product name into the lowercased words rules match on."""
+    return (product or '').lower().split()
+
+
+def _contains_words(words: List[str], name: List[str]) -> bool:
+    """Whether the words of a rule product appear in a product name, in order and side by side."""
+    return any(words[start:start + len(name)] == name for start in range(len(words) - len(name) + 1))
+
+
+def _parse_port(value) -> Tuple[str, Optional[str]]:
+    """Parse a rule port ('22', 22 or '53/udp') into the port id and an optional protocol."""
+    portid, _, protocol = str(value).partition('/')
+    if not portid.isdigit():
+        raise ValueError(f"invalid port '{value}'")
+    return portid, protocol.lower() or None
+
+
+class Rule:
+    """A recommendation and the conditions of the findings it applies to."""
+
+    __slots__ = ('id', 'recommendation', 'severity', 'position', 'services', 'products', 'versions', 'ports',
+                 'cves', 'min_cvss')
+
+    def __init__(self, id: str, recommendation: str, severity: Optional[str] = None, position: int = 0,
+                 services: Iterable[str] = (), products: Iterable[str] = (),
+                 versions: Iterable[Tuple[str, Tuple]] = (), ports: Iterable[Tuple[str, Optional[str]]] = (),
+                 cves: Iterable[str] = (), min_cvss: Optional[float] = None):
+        self.id = id
+        self.recommendation = recommendation
+        self.severity = severity
+        self.position = position
+        self.services = {service.lower() for service in services}
+        # Products match on whole words: 'Apache httpd' matches the product 'Apache httpd', not 'httpd-tools'
+        self.products = [words for words in map(product_words, products) if words]
+        self.versions = list(versions)
+        self.ports = set(ports)
+        self.cves = {cve.upper() for cve in cves}
+        self.min_cvss = min_cvss
+
+    @classmethod
+    def from_dict(cls, data: Dict, position: int = 0) -> 'Rule':
+        """Build a rule from its YAML record, raising ValueError when it is malformed."""
+        if not isinstance(data, dict) or not data.get('id') or not data.get('recommendation'):
+            raise ValueError("a rule needs an id and a recommendation")
+        unknown = set(data) - set(MATCH_FIELDS) - {'id', 'recommendation', 'severity'}
+        if unknown:
+            raise ValueError(f"unknown fields {', '.join(sorted(unknown))}")
+        severity = data.get('severity')
+        if severity is not None and str(severity).upper() not in SEVERITIES:
+            raise ValueError(f"unknown severity '{severity}'")
+        min_cvss = data.get('min_cvss')
+        return cls(
+            str(data['id']),
+            str(data['recommendation']),
+            str(severity).upper() if severity is not None else None,
+            position,
+            [str(service) for service in as_list(data.get('service'))],
+            [str(product) for product in as_list(data.get('product'))],
+            parse_version_spec(data['version']) if data.get('version') else (),
+            [_parse_port(port) for port in as_list(data.get('port'))],
+            [str(cve) for cve in as_list(data.get('cve'))],
+            float(min_cvss) if min_cvss is not None else None,
+        )
+
+    @property
+    def is_general(self) -> bool:
+        """Whether the rule has no conditions and applies to every scan."""
+        return not (self.services or self.products or self.versions or self.ports or self.cves
+                    or self.min_cvss is not None)
+
+    def matches(self, port: Port) -> bool:
+        """Whether the rule applies to an open port, its service and its vulnerabilities."""
+        service = port.service
+        if self.services and service.name.lower() not in self.services:
+            return False
+        if self.ports and (port.portid, None) not in self.ports and (port.portid, port.protocol) not in self.ports:
+            return False
+        if self.products:
+            words = product_words(service.product)
+            if not any(_contains_words(words, name) for name in self.products):
+                return False
+        if self.versions:
+            if not service.version:
+                return False
+            key = version_key(service.version.split()[0])
+            if not all(_COMPARATORS[operator](key, bound) for operator, bound in self.versions):
+                return False
+        if self.cves or self.min_cvss is not None:
+            return any((not self.cves or vulnerability.id.upper() in self.cves)
+                       and (self.min_cvss is None or vulnerability.cvss >= self.min_cvss)
+                       for vulnerability in port.vulnerabilities)
+        return True
+
+
+class RuleMatch:
+    """A rule and the open ports it matched, as 'address:port/protocol'."""
+
+    __slots__ = ('rule', 'locations')
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.locations: List[str] = []
+
+
+class RuleSet:
+    """Compiled rules, indexed by the most selective field each rule matches on."""
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: List[Rule] = []
+        self.general: List[Rule] = []
+        self._by_cve: Dict[str, List[Rule]] = {}
+        self._by_service: Dict[str, List[Rule]] = {}
+        self._by_port: Dict[str, List[Rule]] = {}
+        # Keyed by the first word of the product
+        self._by_product: Dict[str, List[Rule]] = {}
+        # Rules on CVSS alone only concern ports with vulnerabilities
+        self._by_cvss: List[Rule] = []
+        self._unindexed: List[Rule] = []
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: Rule):
+        """Compile a rule into the index of its most selective field."""
+        self.rules.append(rule)
+        if rule.is_general:
+            self.general.append(rule)
+        elif rule.cves:
+            for cve in rule.cves:
+                self._by_cve.setdefault(cve, []).append(rule)
+        elif rule.services:
+            for service in rule.services:
+                self._by_service.setdefault(service, []).append(rule)
+        elif rule.products:
+            for key in {name[0] for name in rule.products}:
+                self._by_product.setdefault(key, []).append(rule)
+        elif rule.ports:
+            for portid in {portid for portid, _ in rule.ports}:
+                self._by_port.setdefault(portid, []).append(rule)
+        elif rule.min_cvss is not None:
+            self._by_cvss.append(rule)
+        else:
+            self._unindexed.append(rule)
+
+    def candidates(self, port: Port) -> Set[Rule]:
+        """Return the rules that may apply to a port, from the indexes it hits."""
+        candidates = set(self._by_service.get(port.service.name.lower(), ()))
+        candidates.update(self._by_port.get(port.portid, ()))
+        if self._by_product:
+            for word in product_words(port.service.product):
+                candidates.update(self._by_product.get(word, ()))
+        candidates.update(self._unindexed)
+        vulnerabilities = list(port.vulnerabilities)
+        if vulnerabilities:
+            candidates.update(self._by_cvss)
+        if self._by_cve:
+            for vulnerability in vulnerabilities:
+                candidates.update(self._by_cve.get(vulnerability.id.upper(), ()))
+        return candidates
+
+    def evaluate(self, hosts: Iterable[Host]) -> List[RuleMatch]:
+        """Match the open ports of hosts against the rules, most severe rules first, then in file order."""
+        matches: Dict[str, RuleMatch] = {}
+        for host in hosts:
+            for port in host.open_ports:
+                for rule in self.candidates(port):
+                    if rule.matches(port):
+                        matches.setdefault(rule.id, RuleMatch(rule)).locations.append(
+                            f"{host.address}:{port.portid}/{port.protocol}")
+
+        ranks = {severity: rank for rank, severity in enumerate(SEVERITIES)}
+        return sorted(matches.values(),
+                      key=lambda match: (ranks.get(match.rule.severity, len(SEVERITIES)), match.rule.position))
+
+
+def load_rules(rules_dir: Path) -> List[Rule]:
+    """Load the rules of the YAML files of a directory, skipping malformed ones."""
+    rules = []
+    seen_ids = set()
+    for rules_path in sorted(Path(rules_dir).glob(RULE_FILES)):
+        try:
+            data = yaml.safe_load(rules_path.read_text()) or []
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Error reading rules {rules_path}: {e}")
+            continue
+        if isinstance(data, dict):
+            data = data.get('rules') or []
+
+        for record in as_list(data):
+            try:
+                rule = Rule.from_dict(record, len(rules))
+            except (ValueError, TypeError) as e:
+                print(f"Invalid rule {record.get('id') if isinstance(record, dict) else record!r} "
+                      f"in {rules_path}: {e}")
+                continue
+            if rule.id in seen_ids:
+                print(f"Duplicate rule {rule.id} in {rules_path}, ignored")
+                continue
+            seen_ids.add(rule.id)
+            rules.append(rule)
+    return rules
+
+
+class RuleIndex:
+    """The compiled rule set of a directory, recompiled when its files change."""
+
+    def __init__(self, rules_dir: Path):
+        self.rules_dir = Path(rules_dir)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._rule_set = RuleSet()
+
+    def _files_signature(self) -> Tuple:
+        signature = []
+        for rules_path in sorted(self.rules_dir.glob(RULE_FILES)):
+            try:
+                stat = rules_path.stat()
+            except OSError:
+                continue
+            signature.append((rules_path.name, stat.st_mtime, stat.st_size))
+        return tuple(signature)
+
+    def get(self) -> RuleSet:
+        """Return the compiled rules, recompiling them if a file was added, changed or removed."""
+        with self._lock:
+            signature = self._files_signature()
+            if signature != self._signature:
+                self._rule_set = RuleSet(load_rules(self.rules_dir))
+                self._signature = signature
+            return self._rule_set
+
+
+_rule_indexes = {}
+_rule_indexes_lock = threading.Lock()
+
+
+def get_rule_set(rules_dir: Path) -> RuleSet:
+    """Return the compiled rules of a directory, shared by the whole process."""
+    rules_dir = Path(rules_dir)
+    with _rule_indexes_lock:
+        if rules_dir not in _rule_indexes:
+            _rule_indexes[rules_dir] = RuleIndex(rules_dir)
+        index = _rule_indexes[rules_dir]
+    return index.get()
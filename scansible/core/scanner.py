@@ -4,19 +4,49 @@ Scanner module for Scansible
 Handles the execution of security scans and report generation.
 """
 
-import json
 import os
 import subprocess
-import time
+import uuid
 import yaml
-import xmltodict
 import shutil
+import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from scansible.core.cache import get_result_cache
+from scansible.core.executor import CommandExecutor
+from scansible.core.hostindex import NMAP_JSON_LAYOUT, index_entry, save_host_index
+from scansible.core.incremental import (
+    CHANGE_DETECTION_COMMAND, ScanHistory, build_incremental_report, detect_changes, restrict_ports, sweep_ports
+)
+from scansible.core.ingest import ingest_nmap_xml
+from scansible.core.inventory import assign_targets, load_inventory_hosts
+from scansible.core.merge import merge_nmap_xml, merge_trivy_json, trivy_companion_path
+from scansible.core.model import (
+    TRIVY_METADATA, Host, PackageFinding, ScanResultWriter, VulnCatalogue, nmap_metadata, parse_nmap_host, to_record
+)
+from scansible.core.ndjson import convert_nmap_xml_to_ndjson, report_suffix, write_ndjson_report
 from scansible.core.parser import TemplateParser
+from scansible.core.pipeline import group_hosts_by_ports, parse_discovery_output, parse_rustscan_greppable
+from scansible.core.progress import ProgressTracker, parse_ansible_task
+from scansible.core.summary import SummaryBuilder, load_summary, save_summary
+from scansible.core.targets import count_addresses, shard_targets, split_target_list
+from scansible.core.timing import apply_timing, get_timing_tuner
+from scansible.core.tools import get_tool_registry
+from scansible.core.trivy import iter_trivy_findings
+from scansible.core.vulndb import annotate_host_record, get_vulndb
 from scansible.utils.config import Config
 
+# Artifacts have fixed names: every scan works and writes in its own directories
+SCAN_XML_NAME = "scan_report.xml"
+REPORT_NAME = "report"
+
+
+def report_filename(report_format: str = 'json', compress: bool = False) -> str:
+    """Return the file name of the report in a scan's output directory."""
+    return f"{REPORT_NAME}{report_suffix(report_format, compress)}"
+
+
 class Scanner:
     """Main scanner class for executing security scans."""
     
@@ -42,59 +72,89 @@ class Scanner:
         
         self.scans_dir = self.config.get_scans_dir()
         self.scans_dir.mkdir(exist_ok=True)
+        
+        self.tools = get_tool_registry(self.config.get_cache_dir() / "tools.json")
+        
+        self.history = ScanHistory(self.reports_dir / "history")
+        self.timing = get_timing_tuner(self.config.get_cache_dir() / "timing.json")
+        self.timing_profile = None
+        # Scanner nodes of the last distributed scan that did not return a report
+        self.missing_nodes = []
+        self.result_cache = get_result_cache(
+            self.config.get_cache_dir() / "results",
+            ttl=self.config.get('result_cache_ttl'),
+            max_bytes=self.config.get('result_cache_max_mb') * 1024 * 1024
+        )
+        
+        self.max_workers = self.config.get('max_workers')
+        self.shard_size = self.config.get('shard_size')
+        self.inventory = self.config.get('inventory')
+        
+        # Set per scan when a progress callback is given
+        self.progress = None
     
     def check_tool_availability(self, tool_name: str) -> bool:
         """Check if a security tool is available in the system."""
-        try:
-            result = subprocess.run(['which', tool_name], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.returncode == 0
-        except Exception:
-            return False
+        return self.tools.is_available(tool_name)
     
-    def generate_ansible_playbook(self, commands: List[Dict], target: str, scan_type: str) -> Tuple[Path, str]:
-        """Generate an Ansible playbook from scan commands."""
-        playbook_path = self.scans_dir / f"{scan_type}_{int(time.time())}_playbook.yml"
-        xml_report_filename = self.xml_dir / f"scan_report_{int(time.time())}.xml"
+    def build_scan_tasks(self, commands: List[Dict], target: str, xml_report_filename: Path,
+                         shards: Optional[List[str]] = None) -> List[Dict]:
+        """Build runnable tasks from scan commands, skipping those whose tool is missing.
         
-        # Check available tools
-        available_tools = {
-            'nmap': self.check_tool_availability('nmap'),
-            'rustscan': self.check_tool_availability('rustscan'),
-            'trivy': self.check_tool_availability('trivy')
-        }
+        Every command writes its own output file next to xml_report_filename;
+        merge_task_outputs combines them into the scan report afterwards.
+        """
+        # Tools are discovered once and cached by the registry
+        available_tools = self.tools.available_tools()
         
-        print(f"\nAvailable tools: {', '.join([tool for tool, available in available_tools.items() if available])}")
+        tool_versions = [f"{tool} ({record.get('version') or 'unknown version'})" for tool, record in available_tools.items()]
+        print(f"\nAvailable tools: {', '.join(tool_versions)}")
         
         tasks = []
         skipped_commands = []
+        stem = xml_report_filename.stem
         
-        for cmd in commands:
+        for index, cmd in enumerate(commands):
             command = cmd['command']
+            tool_name = command.split()[0]
             
             # Skip if required tool is not available
-            if command.startswith('nmap') and not available_tools['nmap']:
-                skipped_commands.append(f"{cmd['name']} (nmap not installed)")
-                continue
-            elif command.startswith('rustscan') and not available_tools['rustscan']:
-                skipped_commands.append(f"{cmd['name']} (rustscan not installed)")
-                continue
-            elif command.startswith('trivy') and not available_tools['trivy']:
-                skipped_commands.append(f"{cmd['name']} (trivy not installed)")
+            if not self.check_tool_availability(tool_name):
+                skipped_commands.append(f"{cmd['name']} ({tool_name} not installed)")
                 continue
             
+            # Skip nmap commands whose NSE scripts are not installed
+            if tool_name == 'nmap':
+                missing_scripts = self.tools.missing_nse_scripts(command)
+                if missing_scripts:
+                    skipped_commands.append(f"{cmd['name']} (NSE script not installed: {', '.join(missing_scripts)})")
+                    continue
+            
+            # Adapt rates and timeouts to the measured latency of the target
+            command = apply_timing(command, self.timing_profile)
+            
             # Build the task based on command type
             if command.startswith('nmap'):
-                task = {
-                    'name': f"Running: {cmd['name']}",
-                    'command': f"{command.replace('[target]', '')} {target} -oX {xml_report_filename}",
-                }
+                # One nmap task per shard, each with its own XML output
+                command_tasks = []
+                for shard_index, nmap_target in enumerate(shards or [target]):
+                    output_file = xml_report_filename.with_name(f"{stem}_{index}.xml")
+                    if shards:
+                        output_file = xml_report_filename.with_name(f"{stem}_{index}_{shard_index}.xml")
+                    command_tasks.append({
+                        'name': f"Running: {cmd['name']}" + (f" [shard {shard_index + 1}/{len(shards)}]" if shards else ""),
+                        'command': f"{command.replace('[target]', '')} {nmap_target} -oX {output_file}",
+                        'output_file': str(output_file),
+                    })
             elif command.startswith('rustscan'):
-                task = {
+                # rustscan has no report option: its 'Open ip:port' lines are kept instead
+                command_tasks = [{
                     'name': f"Running: {cmd['name']}",
                     'command': f"{command.replace('[target]', target)}",
-                }
+                    'stdout_file': str(xml_report_filename.with_name(f"{stem}_{index}_rustscan.txt")),
+                }]
             elif command.startswith('trivy'):
-                json_output_file = self.json_dir / f"trivy_report_{int(time.time())}.json"
+                json_output_file = xml_report_filename.with_name(f"{stem}_{index}_trivy.json")
                 
                 # Replace placeholders
                 cmd_str = command
@@ -109,27 +169,89 @@ class Scanner:
                 if '--output=' not in cmd_str and '-o=' not in cmd_str and '[output_file.json]' not in command:
                     cmd_str += f' --output {json_output_file}'
                 
-                task = {
+                command_tasks = [{
                     'name': f"Running: {cmd['name']}",
                     'command': cmd_str,
-                }
+                    'output_file': str(json_output_file),
+                }]
             else:
-                task = {
+                command_tasks = [{
                     'name': f"Running: {cmd['name']}",
                     'command': f"{command.replace('[target]', '')} {target}",
-                }
+                    'stdout_file': str(xml_report_filename.with_name(f"{stem}_{index}.txt")),
+                }]
             
-            if 'tags' in cmd:
-                task['tags'] = cmd['tags']
-                
-            tasks.append(task)
+            for task in command_tasks:
+                if 'tags' in cmd:
+                    task['tags'] = cmd['tags']
+                tasks.append(task)
         
         # Show skipped commands
         if skipped_commands:
-            print("\nSkipped commands (missing tools):")
+            print("\nSkipped commands:")
             for cmd in skipped_commands:
                 print(f"- {cmd}")
         
+        return tasks
+    
+    def merge_task_outputs(self, results: List[Dict], xml_report_filename: Path) -> bool:
+        """Merge the output files of finished tasks into the scan report.
+        
+        nmap reports and rustscan open ports are merged into xml_report_filename;
+        Trivy reports into its companion findings file. Returns whether any
+        output was found.
+        """
+        xml_outputs = []
+        trivy_outputs = []
+        open_ports = {}
+        
+        for result in results:
+            # Ansible runs only leave files behind: missing ones are skipped by the merge
+            if not result.get('success', True):
+                continue
+            output_file = result.get('output_file') or ''
+            if output_file.endswith('.xml'):
+                xml_outputs.append(output_file)
+            elif output_file.endswith('.json'):
+                trivy_outputs.append(output_file)
+            
+            stdout_file = result.get('stdout_file')
+            if stdout_file and result['command'].startswith('rustscan') and Path(stdout_file).exists():
+                for address, ports in parse_rustscan_greppable(Path(stdout_file).read_text(errors='replace')).items():
+                    open_ports.setdefault(address, set()).update(ports)
+        
+        merged_trivy = merge_trivy_json(trivy_outputs, trivy_companion_path(xml_report_filename))
+        merged_xml = merge_nmap_xml(xml_outputs, xml_report_filename,
+                                    extra_ports={address: sorted(ports) for address, ports in open_ports.items()})
+        return bool(merged_xml or merged_trivy)
+    
+    def generate_ansible_playbook(self, commands: List[Dict], target: str, scan_type: str, work_dir: Path,
+                                  tasks: Optional[List[Dict]] = None) -> Tuple[Path, str]:
+        """Generate an Ansible playbook from scan commands, or from tasks already built for them."""
+        playbook_path = work_dir / f"{scan_type}_playbook.yml"
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        
+        if tasks is None:
+            tasks = self.build_scan_tasks(commands, target, xml_report_filename)
+        
+        playbook_tasks = []
+        for index, task in enumerate(tasks):
+            # Output files are tracked by the scanner, not by Ansible
+            playbook_task = {key: value for key, value in task.items() if key not in ('output_file', 'stdout_file')}
+            playbook_tasks.append(playbook_task)
+            if task.get('stdout_file'):
+                # The command module runs without a shell: its output is saved by a follow-up task
+                register = f"scansible_output_{index}"
+                playbook_task['register'] = register
+                copy_task = {
+                    'name': f"Saving output: {task['name']}",
+                    'copy': {'content': f"{{{{ {register}.stdout }}}}", 'dest': task['stdout_file']}
+                }
+                if 'tags' in task:
+                    copy_task['tags'] = task['tags']
+                playbook_tasks.append(copy_task)
+        tasks = playbook_tasks
+        
         # Add a default task if no tools are available
         if not tasks:
             print("\nWARNING: No available commands - Adding a placeholder task")
@@ -151,37 +273,438 @@ class Scanner:
         
         return playbook_path, str(xml_report_filename)
     
-    def execute_ansible_playbook(self, playbook_path: Path) -> bool:
+    def run_direct_commands(self, commands: List[Dict], target: str, work_dir: Path) -> Tuple[bool, str]:
+        """Run scan commands as local subprocesses in template order, without ansible-playbook."""
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        
+        tasks = self.build_scan_tasks(commands, target, xml_report_filename)
+        if not tasks:
+            print("\nWARNING: No available commands - Missing tools")
+            return True, str(xml_report_filename)
+        
+        results = CommandExecutor(max_workers=1, progress=self.progress).run_serial(tasks)
+        
+        failed = results[-1] if not results[-1]['success'] else None
+        if failed:
+            print(f"Command failed: {failed['command']}")
+            if failed['error']:
+                print(f"  {failed['error']}")
+            return False, str(xml_report_filename)
+        
+        self.merge_task_outputs(results, xml_report_filename)
+        return True, str(xml_report_filename)
+    
+    def run_ansible_commands(self, commands: List[Dict], target: str, scan_type: str,
+                             work_dir: Path) -> Tuple[bool, str]:
+        """Run scan commands through a generated Ansible playbook and merge their outputs."""
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        
+        tasks = self.build_scan_tasks(commands, target, xml_report_filename)
+        playbook_path, xml_path = self.generate_ansible_playbook(
+            commands, target, scan_type, work_dir, tasks=tasks)
+        
+        if not self.execute_ansible_playbook(playbook_path):
+            return False, xml_path
+        
+        self.merge_task_outputs(tasks, xml_report_filename)
+        return True, xml_path
+    
+    def run_pipeline_scan(self, commands: List[Dict], target: str, max_workers: int,
+                          work_dir: Path) -> Tuple[bool, str]:
+        """Discover open ports first, then run the deep scan commands only against those ports."""
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        
+        discovery_commands = [cmd for cmd in commands if 'discovery' in cmd.get('tags', [])]
+        # Deep scans are nmap runs: without nmap, the pipeline has nothing to run in stage 2
+        deep_commands = [cmd for cmd in commands if '[ports]' in cmd['command']
+                         and self.check_tool_availability(cmd['command'].split()[0])]
+        
+        # Stage 1: the first discovery command whose tool is installed
+        discovery = None
+        for cmd in discovery_commands:
+            if self.check_tool_availability(cmd['command'].split()[0]):
+                discovery = cmd
+                break
+        
+        if not discovery or not deep_commands:
+            print("\nWARNING: Pipeline needs an available discovery command and a deep scan command")
+            return False, str(xml_report_filename)
+        
+        tool_name = discovery['command'].split()[0]
+        # rustscan expects a comma separated address list
+        discovery_target = ','.join(split_target_list(target)) if tool_name == 'rustscan' else target
+        
+        print(f"\n[Stage 1] {discovery['name']}")
+        result = CommandExecutor(max_workers=1, progress=self.progress).run_serial([{
+            'name': f"Running: {discovery['name']}",
+            'command': apply_timing(discovery['command'].replace('[target]', discovery_target), self.timing_profile),
+            'capture_output': True,
+        }])[0]
+        if not result['success']:
+            print(f"Discovery failed: {result['error']}")
+            return False, str(xml_report_filename)
+        
+        open_ports = parse_discovery_output(tool_name, result.get('stdout', ''))
+        if not open_ports:
+            print("\nNo open ports discovered - skipping deep scan")
+            return True, str(xml_report_filename)
+        
+        for host, ports in open_ports.items():
+            print(f"- {host}: {', '.join(str(port) for port in ports)}")
+        
+        # Stage 2: one deep scan per group of hosts sharing the same open ports
+        tasks = []
+        for index, cmd in enumerate(deep_commands):
+            missing_scripts = self.tools.missing_nse_scripts(cmd['command'])
+            if missing_scripts:
+                print(f"Skipping {cmd['name']} (NSE script not installed: {', '.join(missing_scripts)})")
+                continue
+            
+            for group_index, (ports, hosts) in enumerate(group_hosts_by_ports(open_ports).items()):
+                output_file = xml_report_filename.with_name(f"{xml_report_filename.stem}_{index}_{group_index}.xml")
+                command = cmd['command'].replace('[ports]', ports).replace('[target]', '')
+                tasks.append({
+                    'name': f"Running: {cmd['name']} [{', '.join(hosts)}]",
+                    'command': apply_timing(f"{command} {' '.join(hosts)} -oX {output_file}", self.timing_profile),
+                    'output_file': str(output_file),
+                })
+        
+        print("\n[Stage 2] Deep scan of discovered ports")
+        results = CommandExecutor(max_workers, progress=self.progress).run(tasks)
+        
+        xml_outputs = [result['output_file'] for result in results if result['success']]
+        merge_nmap_xml(xml_outputs, xml_report_filename)
+        
+        return bool(xml_outputs), str(xml_report_filename)
+    
+    def run_incremental_scan(self, commands: List[Dict], target: str, previous, max_workers: int,
+                             work_dir: Path) -> Tuple[bool, str]:
+        """Rescan only new or changed services and carry the other findings forward."""
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        sweep_filename = xml_report_filename.with_name(f"{xml_report_filename.stem}_sweep.xml")
+        
+        # The template's ports, plus those an earlier, wider scan found open
+        ports = sweep_ports(commands, previous, self.tools.nmap_data_file('nmap-services'))
+        
+        print("\n[Incremental] Change detection sweep")
+        sweep_result = CommandExecutor(max_workers=1, progress=self.progress).run_serial([{
+            'name': "Running: Change detection sweep",
+            'command': apply_timing(f"{CHANGE_DETECTION_COMMAND} -p {ports} {target} -oX {sweep_filename}",
+                                    self.timing_profile),
+        }])[0]
+        if not sweep_result['success'] or not sweep_filename.exists():
+            print(f"Change detection failed: {sweep_result['error']}")
+            return False, str(xml_report_filename)
+        
+        sweep = ET.parse(sweep_filename).getroot()
+        changed, unchanged = detect_changes(previous, sweep)
+        
+        carried = sum(len(ports) for ports in unchanged.values())
+        rescanned = sum(len(ports) for ports in changed.values())
+        print(f"\n{rescanned} new or changed port(s) to rescan, {carried} unchanged port(s) carried forward")
+        
+        # Deep scan of the changed ports only, grouping hosts with the same changes
+        tasks = []
+        if changed:
+            open_ports = {address: sorted(ports, key=int) for address, ports in changed.items()}
+            for index, cmd in enumerate(commands):
+                if not cmd['command'].startswith('nmap') or self.tools.missing_nse_scripts(cmd['command']):
+                    continue
+                for group_index, (ports, hosts) in enumerate(group_hosts_by_ports(open_ports).items()):
+                    output_file = xml_report_filename.with_name(f"{xml_report_filename.stem}_{index}_{group_index}.xml")
+                    command = restrict_ports(cmd['command'], ports).replace('[target]', '')
+                    tasks.append({
+                        'name': f"Running: {cmd['name']} [{', '.join(hosts)}]",
+                        'command': apply_timing(f"{command} {' '.join(hosts)} -oX {output_file}", self.timing_profile),
+                        'output_file': str(output_file),
+                    })
+        
+        deep = None
+        if tasks:
+            results = CommandExecutor(max_workers, progress=self.progress).run(tasks)
+            deep_filename = xml_report_filename.with_name(f"{xml_report_filename.stem}_deep.xml")
+            xml_outputs = [result['output_file'] for result in results if result['success']]
+            if merge_nmap_xml(xml_outputs, deep_filename):
+                deep = ET.parse(deep_filename).getroot()
+        
+        report = build_incremental_report(sweep, deep, previous, unchanged)
+        ET.ElementTree(report).write(xml_report_filename, encoding='utf-8', xml_declaration=True)
+        
+        return True, str(xml_report_filename)
+    
+    def resolve_executor(self, executor: Optional[str], inventory: Optional[str]) -> str:
+        """Pick the execution backend: Ansible for inventory-driven runs, direct exec for local ones."""
+        if inventory:
+            return 'ansible'
+        if not executor or executor == 'auto':
+            return 'direct'
+        return executor
+    
+    def run_parallel_commands(self, commands: List[Dict], target: str, max_workers: int, work_dir: Path,
+                              shard_size: int = 0) -> Tuple[bool, str]:
+        """Run scan commands concurrently, each with its own output file, and merge the results."""
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        
+        # Split large ranges and host lists so that each nmap process walks one shard
+        shards = None
+        if shard_size and count_addresses(target) > shard_size:
+            shards = shard_targets(target, shard_size)
+            print(f"\nSplit target into {len(shards)} shards of up to {shard_size} addresses")
+        
+        tasks = self.build_scan_tasks(commands, target, xml_report_filename, shards=shards)
+        if not tasks:
+            print("\nWARNING: No available commands - Missing tools")
+            return False, str(xml_report_filename)
+        
+        results = CommandExecutor(max_workers, progress=self.progress).run(tasks)
+        
+        failed = [result for result in results if not result['success']]
+        for result in failed:
+            print(f"Command failed: {result['command']}")
+            if result['error']:
+                print(f"  {result['error']}")
+        
+        # Merge the output of every command once all workers are done
+        self.merge_task_outputs(results, xml_report_filename)
+        
+        return len(failed) < len(results), str(xml_report_filename)
+    
+    def generate_distributed_playbook(self, commands: List[Dict], assignments: Dict[str, str],
+                                      scan_type: str, work_dir: Path) -> Tuple[Path, List[Path]]:
+        """Generate a playbook that scans each node's share of the targets and fetches the results.
+        
+        Returns the playbook and the paths the node reports are fetched to.
+        """
+        playbook_path = work_dir / f"{scan_type}_distributed_playbook.yml"
+        fetch_dir = work_dir / "fetched"
+        # Named after the scan directory so that concurrent scans from one node do not collide
+        remote_dir = f"/tmp/scansible_{work_dir.name}"
+        
+        tasks = [{
+            'name': "Create remote output directory",
+            'file': {'path': remote_dir, 'state': 'directory'}
+        }]
+        fetched_reports = []
+        skipped_commands = []
+        
+        for index, cmd in enumerate(commands):
+            command = cmd['command']
+            
+            # Only nmap produces reports that can be fetched and merged
+            if not command.startswith('nmap'):
+                skipped_commands.append(f"{cmd['name']} (not supported in distributed mode)")
+                continue
+            
+            report_name = f"scan_report_{index}.xml"
+            remote_file = f"{remote_dir}/{report_name}"
+            # A failing node must not stop the others: its missing report is reported after the merge
+            task = {
+                'name': f"Running: {cmd['name']}",
+                'command': f"{command.replace('[target]', '')} {{{{ scan_shards[inventory_hostname] }}}} -oX {remote_file}",
+                'ignore_errors': True,
+            }
+            if 'tags' in cmd:
+                task['tags'] = cmd['tags']
+            tasks.append(task)
+            
+            tasks.append({
+                'name': f"Fetching: {cmd['name']}",
+                'fetch': {
+                    'src': remote_file,
+                    'dest': f"{fetch_dir}/{{{{ inventory_hostname }}}}/",
+                    'flat': True
+                },
+                'ignore_errors': True
+            })
+            fetched_reports.extend(fetch_dir / node / report_name for node in assignments)
+        
+        tasks.append({
+            'name': "Remove remote output directory",
+            'file': {'path': remote_dir, 'state': 'absent'}
+        })
+        
+        if skipped_commands:
+            print("\nSkipped commands:")
+            for cmd in skipped_commands:
+                print(f"- {cmd}")
+        
+        playbook = [{
+            'hosts': ':'.join(assignments),
+            'gather_facts': False,
+            'strategy': 'free',
+            'ignore_unreachable': True,
+            'vars': {
+                'scan_shards': assignments
+            },
+            'tasks': tasks
+        }]
+        
+        with open(playbook_path, 'w') as file:
+            yaml.safe_dump(playbook, file, default_flow_style=False)
+        
+        return playbook_path, fetched_reports
+    
+    def run_distributed_scan(self, commands: List[Dict], target: str, scan_type: str,
+                             inventory: str, work_dir: Path, group: str = 'all') -> Tuple[bool, str]:
+        """Split targets across the scanner nodes of an inventory and merge their reports."""
+        xml_report_filename = work_dir / SCAN_XML_NAME
+        
+        nodes = load_inventory_hosts(inventory, group)
+        if not nodes:
+            print(f"\nNo scanner nodes found in group '{group}' of {inventory}")
+            return False, str(xml_report_filename)
+        
+        assignments = assign_targets(target, nodes)
+        print(f"\nDistributing scan across {len(assignments)} node(s):")
+        for node, node_targets in assignments.items():
+            print(f"- {node}: {node_targets}")
+        
+        playbook_path, fetched_reports = self.generate_distributed_playbook(commands, assignments, scan_type, work_dir)
+        
+        # ansible-playbook fails as soon as one node does: the reports of the others are merged all the same
+        completed = self.execute_ansible_playbook(playbook_path, inventory=inventory, forks=len(assignments))
+        
+        reports = [path for path in fetched_reports if path.exists()]
+        self.missing_nodes = sorted({path.parent.name for path in fetched_reports if not path.exists()})
+        if self.missing_nodes:
+            print(f"\nWARNING: No report from node(s) {', '.join(self.missing_nodes)} - their targets were not scanned")
+        
+        if not reports or not merge_nmap_xml(reports, xml_report_filename):
+            if completed:
+                print("\nWARNING: No node produced a report")
+            return False, str(xml_report_filename)
+        return True, str(xml_report_filename)
+    
+    def execute_ansible_playbook(self, playbook_path: Path, inventory: Optional[str] = None,
+                                 forks: Optional[int] = None) -> bool:
         """Execute an Ansible playbook."""
+        cmd = ['ansible-playbook', str(playbook_path)]
+        if inventory:
+            cmd.extend(['-i', str(inventory)])
+        if forks:
+            cmd.extend(['--forks', str(forks)])
+        
+        if self.progress:
+            with open(playbook_path) as file:
+                plays = yaml.safe_load(file) or []
+            self.progress.add_commands(sum(len(play.get('tasks', [])) for play in plays))
+        
         try:
-            subprocess.run(['ansible-playbook', str(playbook_path)], check=True)
+            # Stream Ansible's output so that each task banner updates the progress
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            current_task = None
+            for line in process.stdout:
+                print(line, end='')
+                task_name = parse_ansible_task(line)
+                if task_name and self.progress:
+                    if current_task:
+                        self.progress.finish_command(current_task)
+                    current_task = task_name
+                    self.progress.start_command(current_task, task_name)
+            process.wait()
+            if current_task and self.progress:
+                self.progress.finish_command(current_task)
+            
+            if process.returncode != 0:
+                print(f"Error executing Ansible playbook: exit status {process.returncode}")
+                return False
             return True
-        except subprocess.CalledProcessError as e:
+        except OSError as e:
             print(f"Error executing Ansible playbook: {e}")
             return False
     
-    def convert_xml_to_json(self, xml_file_path: str) -> Optional[Path]:
-        """Convert an XML report file to JSON."""
+    def convert_xml_to_json(self, xml_file_path: str, on_host: Optional[Callable[[Host], None]] = None,
+                            report_format: str = 'json', compress: bool = False,
+                            output_dir: Optional[Path] = None) -> Optional[Path]:
+        """Convert an XML report file to JSON or NDJSON, streaming it one host at a time.
+        
+        Trivy findings merged next to the XML report are added to the same
+        report, or make up the whole report when no nmap command ran. The
+        report is written to output_dir, next to the XML report by default,
+        along with its summary, gathered in the same pass.
+        """
         xml_path = Path(xml_file_path)
+        trivy_path = trivy_companion_path(xml_path)
         
-        if not xml_path.exists():
+        if not xml_path.exists() and not trivy_path.exists():
             print(f"XML report file not found: {xml_path}")
             return None
         
         try:
-            with open(xml_path) as xml_file:
-                xml_string = xml_file.read()
+            # Create JSON filename and save to the scan's output directory
+            json_path = Path(output_dir or xml_path.parent) / report_filename(report_format, compress)
+            json_path.parent.mkdir(parents=True, exist_ok=True)
+            summary = SummaryBuilder()
             
-            json_data = xmltodict.parse(xml_string)
+            def summarize_findings(findings: Iterable[PackageFinding]) -> Iterator[PackageFinding]:
+                for finding in findings:
+                    summary.add_finding(finding)
+                    yield finding
             
-            # Create JSON filename and save to json directory
-            json_filename = f"report_{int(time.time())}.json"
-            json_path = self.json_dir / json_filename
+            if not xml_path.exists():
+                # Container scan only: the Trivy findings are the report
+                if report_format == 'ndjson':
+                    write_ndjson_report(json_path, 'trivy', dict(TRIVY_METADATA), [],
+                                        summarize_findings(iter_trivy_findings(trivy_path)))
+                else:
+                    shutil.copy(trivy_path, json_path)
+                    for _ in summarize_findings(iter_trivy_findings(trivy_path)):
+                        pass
+                save_summary(summary.to_dict(), json_path)
+                print(f"Scan report saved to {json_path}")
+                return json_path
+            
+            # Detected service versions are matched against the local CVE database, if imported
+            vulndb = get_vulndb(self.config.get('vulndb_path'))
+            
+            def annotate(record: Dict):
+                if vulndb:
+                    annotate_host_record(record, vulndb)
+            
+            def summarize_host(host: Host):
+                summary.add_host(host)
+                if on_host:
+                    on_host(host)
+            
+            if report_format == 'ndjson':
+                findings = iter_trivy_findings(trivy_path) if trivy_path.exists() else ()
+                host_count = convert_nmap_xml_to_ndjson(xml_path, json_path, findings=summarize_findings(findings),
+                                                        on_host=summarize_host, on_record=annotate)
+                save_summary(summary.to_dict(), json_path)
+                print(f"Scan report saved to {json_path} ({host_count} hosts)")
+                return json_path
             
-            with open(json_path, 'w') as json_file:
-                json.dump(json_data, json_file, indent=4)
+            # The normalized model and the host index are written in the same pass, one host at a time
+            metadata = {}
+            entries = []
+            findings = list(summarize_findings(iter_trivy_findings(trivy_path))) if trivy_path.exists() else []
+            model = ScanResultWriter(json_path, 'nmap')
+            catalogue = VulnCatalogue()
             
-            print(f"Scan report saved to {json_path}")
+            def add_host(record: Dict):
+                annotate(record)
+                host = parse_nmap_host(record, catalogue)
+                model.add_host(host)
+                # The offset and length of the record are known once the report is written
+                entries.append(index_entry(host, 0, 0))
+                summarize_host(host)
+            
+            spans = []
+            try:
+                host_count = ingest_nmap_xml(xml_path, json_path, on_host=add_host,
+                                             on_root=lambda attributes: metadata.update(nmap_metadata(attributes)),
+                                             extra={'findings': to_record(findings)} if findings else None,
+                                             spans=spans)
+                model.finish(metadata, findings)
+            except Exception:
+                model.abort()
+                raise
+            for entry, span in zip(entries, spans):
+                entry[:2] = span
+            save_host_index(json_path, NMAP_JSON_LAYOUT, entries)
+            save_summary(summary.to_dict(), json_path)
+            
+            print(f"Scan report saved to {json_path} ({host_count} hosts)")
             return json_path
             
         except Exception as e:
@@ -195,6 +718,27 @@ class Scanner:
             scan_type = scan_config.get('scan_type', 'basic')
             tags = scan_config.get('tags', [])
             generate_report = scan_config.get('generate_report', True)
+            executor = scan_config.get('executor') or self.config.get('executor')
+            max_workers = scan_config.get('max_workers') or self.max_workers
+            shard_size = scan_config.get('shard_size') or self.shard_size
+            inventory = scan_config.get('inventory') or self.inventory
+            inventory_group = scan_config.get('inventory_group') or 'all'
+            incremental = scan_config.get('incremental', False)
+            refresh = scan_config.get('refresh', False)
+            auto_timing = scan_config.get('auto_timing') or self.config.get('auto_timing')
+            report_format = scan_config.get('report_format') or self.config.get('report_format')
+            compress = scan_config.get('compress') or self.config.get('report_gzip')
+            
+            progress_callback = scan_config.get('progress_callback')
+            # Called with each host of the report as it is written
+            host_callback = scan_config.get('host_callback')
+            self.progress = ProgressTracker(progress_callback) if progress_callback else None
+            executor = self.resolve_executor(executor, inventory)
+            
+            # Sharded targets are only useful when the shards run concurrently
+            if shard_size and not inventory and executor != 'parallel' and count_addresses(target) > shard_size:
+                print(f"\nTarget exceeds shard size ({shard_size}) - using the parallel executor")
+                executor = 'parallel'
             
             print(f"\nStarting {scan_type} scan on {target}")
             if tags:
@@ -209,7 +753,7 @@ class Scanner:
                 }
             
             # Parse commands from template
-            commands = self.parser.parse_commands_from_template(template, tags)
+            commands = self.parser.get_commands_for_scan_type(scan_type, tags)
             if not commands:
                 return {
                     'success': False,
@@ -225,43 +769,152 @@ class Scanner:
                 if 'tags' in cmd:
                     print(f"  Tags: {' '.join(['#' + tag for tag in cmd['tags']])}")
             
-            # Generate and execute Ansible playbook
-            playbook_path, report_filename = self.generate_ansible_playbook(commands, target, scan_type)
+            # Reuse the report of an identical recent scan; incremental scans always rescan
+            # A feed import changes the matched CVEs, so it invalidates cached reports
+            vulndb_path = self.config.get('vulndb_path')
+            vulndb_stamp = int(vulndb_path.stat().st_mtime) if vulndb_path.exists() else 0
+            cache_key = self.result_cache.make_key(target, commands, template,
+                                                   variant=f"{report_suffix(report_format, compress)}:{vulndb_stamp}")
+            use_cache = generate_report and not refresh and not incremental
+            
+            # Each scan gets its own working and output directories, keyed by its ID,
+            # so that concurrent scans never share a file name
+            scan_id = scan_config.get('scan_id') or uuid.uuid4().hex
+            work_dir = Path(scan_config.get('work_dir') or self.scans_dir / scan_id)
+            output_dir = Path(scan_config.get('output_dir') or self.reports_dir / scan_id)
+            work_dir.mkdir(parents=True, exist_ok=True)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            artifacts = {
+                'scan_id': scan_id,
+                'work_dir': str(work_dir),
+                'output_dir': str(output_dir)
+            }
             
-            if not self.execute_ansible_playbook(playbook_path):
+            json_path = output_dir / report_filename(report_format, compress)
+            if use_cache and self.result_cache.get_into(cache_key, json_path):
+                print(f"\nUsing cached result from a previous identical scan: {json_path}")
                 return {
-                    'success': False,
-                    'error': "Failed to execute Ansible playbook"
+                    'success': True,
+                    'target': target,
+                    'scan_type': scan_type,
+                    'report_path': str(json_path),
+                    # Cached entries hold the report only: its summary is computed once here
+                    'summary': load_summary(json_path),
+                    'cached': True,
+                    **artifacts
                 }
             
+            # Measure the target latency once; every command of the scan reuses the profile
+            self.timing_profile = None
+            if auto_timing:
+                self.timing_profile = self.timing.tune(target)
+                if self.timing_profile:
+                    profile = self.timing_profile
+                    print(f"\nAuto timing: RTT {profile['rtt_ms']} ms, loss {profile['loss']:.0%} - "
+                          f"min-rate {profile['min_rate']}, max-retries {profile['max_retries']}, "
+                          f"host-timeout {profile['host_timeout']}")
+                else:
+                    print("\nAuto timing: no sampled host answered - keeping template timings")
+            
+            # Differential rescan when this target was already scanned with the same profile
+            previous = self.history.load(target, scan_type, tags) if incremental else None
+            if incremental and previous is None:
+                print("\nNo previous result for this target - running a full scan")
+            
+            if previous is not None and self.check_tool_availability('nmap'):
+                success, xml_path = self.run_incremental_scan(commands, target, previous, max_workers, work_dir)
+                
+                if not success:
+                    return {
+                        'success': False,
+                        'error': "Incremental scan failed"
+                    }
+            elif scan_type == 'pipeline':
+                # Discovery stage feeds the open ports into the deep scan stage
+                success, xml_path = self.run_pipeline_scan(commands, target, max_workers, work_dir)
+                
+                if not success:
+                    return {
+                        'success': False,
+                        'error': "Pipeline scan failed"
+                    }
+            elif inventory:
+                # Scan from the inventory's scanner nodes instead of this host
+                success, xml_path = self.run_distributed_scan(
+                    commands, target, scan_type, inventory, work_dir, inventory_group)
+                if self.missing_nodes:
+                    # Partial result: the targets of these nodes are missing from the report
+                    artifacts['missing_nodes'] = self.missing_nodes
+                
+                if not success:
+                    return {
+                        'success': False,
+                        'error': "Failed to execute distributed scan"
+                    }
+            elif executor == 'parallel':
+                # Run every command concurrently and merge their outputs
+                success, xml_path = self.run_parallel_commands(commands, target, max_workers, work_dir, shard_size)
+                
+                if not success:
+                    return {
+                        'success': False,
+                        'error': "All scan commands failed"
+                    }
+            elif executor == 'direct':
+                # Local scan: run the commands directly, skipping ansible-playbook startup
+                success, xml_path = self.run_direct_commands(commands, target, work_dir)
+                
+                if not success:
+                    return {
+                        'success': False,
+                        'error': "Failed to execute scan commands"
+                    }
+            else:
+                # Generate and execute Ansible playbook
+                success, xml_path = self.run_ansible_commands(commands, target, scan_type, work_dir)
+                
+                if not success:
+                    return {
+                        'success': False,
+                        'error': "Failed to execute Ansible playbook"
+                    }
+            
+            # Keep this result as the baseline for later incremental scans
+            self.history.save(target, scan_type, tags, xml_path)
+            artifacts['xml_path'] = xml_path
+            
             # Process report if requested
             json_path = None
             if generate_report:
-                json_path = self.convert_xml_to_json(report_filename)
+                json_path = self.convert_xml_to_json(xml_path, on_host=host_callback, report_format=report_format,
+                                                     compress=compress, output_dir=output_dir)
                 
                 if json_path:
-                    # Move any reports that might be in the root reports directory
-                    self.organize_reports()
+                    self.result_cache.put(cache_key, json_path)
                     
                     return {
                         'success': True,
                         'target': target,
                         'scan_type': scan_type,
-                        'report_path': str(json_path)
+                        'report_path': str(json_path),
+                        'summary': load_summary(json_path),
+                        **artifacts
                     }
                 else:
                     return {
                         'success': True,
                         'target': target,
                         'scan_type': scan_type,
-                        'message': "Scan completed but report could not be generated"
+                        'message': "Scan completed but report could not be generated",
+                        **artifacts
                     }
             else:
                 return {
                     'success': True,
                     'target': target,
                     'scan_type': scan_type,
-                    'message': "Scan completed successfully (report generation skipped)"
+                    'message': "Scan completed successfully (report generation skipped)",
+                    **artifacts
                 }
             
         except Exception as e:
@@ -0,0 +1,133 @@
+"""
+Scan summary module for Scansible
+--------------------------------
+Summary statistics of a scan (severity histogram, host and open port counts,
+top services and CVEs), computed while its report is written and cached next
+to it, so that the API and the report generators never walk the report again
+to count.
+"""
+
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from scansible.core.model import SEVERITIES, Host, PackageFinding, ScanResult, load_scan_result
+
+# Bumped whenever the layout of the summary changes
+SUMMARY_VERSION = 1
+
+SUMMARY_SUFFIX = '.summary'
+
+# Entries kept in the top services and top CVEs lists
+TOP_COUNT = 10
+
+
+class SummaryBuilder:
+    """Accumulates the summary of a scan one host or package finding at a time."""
+
+    def __init__(self):
+        """Initialize an empty summary."""
+        self.hosts = 0
+        self.hosts_up = 0
+        self.open_ports = 0
+        self.services = Counter()
+        self.vulnerabilities = Counter()
+
+    def add_host(self, host: Host):
+        """Count a host with its open ports and their vulnerabilities."""
+        self.hosts += 1
+        if host.status == 'up':
+            self.hosts_up += 1
+        for port in host.open_ports:
+            self.open_ports += 1
+            self.services[port.service.name] += 1
+        for port in host.ports:
+            self.vulnerabilities.update(port.vulnerabilities)
+
+    def add_finding(self, finding: PackageFinding):
+        """Count the vulnerability of a package finding."""
+        self.vulnerabilities[finding.vulnerability] += 1
+
+    def to_dict(self) -> Dict:
+        """Return the summary record."""
+        severities = dict.fromkeys(SEVERITIES, 0)
+        # Same tally as ScanResult.severity_counts
+        for vulnerability, count in self.vulnerabilities.items():
+            if vulnerability.severity in severities:
+                severities[vulnerability.severity] += count
+            elif vulnerability.severity is not None:
+                severities['UNKNOWN'] += count
+
+        return {
+            'version': SUMMARY_VERSION,
+            'hosts': self.hosts,
+            'hosts_up': self.hosts_up,
+            'open_ports': self.open_ports,
+            'services': len(self.services),
+            'vulnerabilities': sum(self.vulnerabilities.values()),
+            'severities': severities,
+            'top_services': [{'name': name, 'count': count} for name, count in self.services.most_common(TOP_COUNT)],
+            'top_cves': _top_cves(self.vulnerabilities.items()),
+        }
+
+
+def _top_cves(occurrences: Iterable) -> List[Dict]:
+    """Return the most severe, then most widespread, CVEs."""
+    # Vulnerabilities are interned, but the same CVE may come with different scores from two sources
+    cves: Dict[str, List] = {}
+    for vulnerability, count in occurrences:
+        if not vulnerability.id.upper().startswith('CVE-'):
+            continue
+        entry = cves.setdefault(vulnerability.id, [vulnerability, 0])
+        if vulnerability.cvss > entry[0].cvss:
+            entry[0] = vulnerability
+        entry[1] += count
+
+    ranked = sorted(cves.values(), key=lambda entry: (-entry[0].cvss, -entry[1], entry[0].id))
+    return [{'id': vulnerability.id, 'cvss': vulnerability.cvss, 'severity': vulnerability.severity, 'count': count}
+            for vulnerability, count in ranked[:TOP_COUNT]]
+
+
+def summarize(result: ScanResult) -> Dict:
+    """Return the summary of a scan result already in memory."""
+    builder = SummaryBuilder()
+    for host in result.hosts:
+        builder.add_host(host)
+    for finding in result.packages:
+        builder.add_finding(finding)
+    return builder.to_dict()
+
+
+def summary_path(report_path: Path) -> Path:
+    """Return the path of the summary of a report."""
+    return Path(report_path).with_suffix(SUMMARY_SUFFIX)
+
+
+def save_summary(summary: Dict, report_path: Path):
+    """Write the summary of a report next to it."""
+    path = summary_path(report_path)
+    tmp_path = path.with_suffix(SUMMARY_SUFFIX + '.tmp')
+    with open(tmp_path, 'w') as summary_file:
+        json.dump(summary, summary_file, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def load_summary(report_path: Path) -> Dict:
+    """Load the summary of a report, computing and saving it if it is missing or out of date."""
+    report_path = Path(report_path)
+    path = summary_path(report_path)
+    try:
+        if path.stat().st_mtime >= report_path.stat().st_mtime:
+            with open(path) as summary_file:
+                summary = json.load(summary_file)
+            if summary.get('version') == SUMMARY_VERSION:
+                return summary
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    # Reports written before summaries existed, or copied from the result cache
+    summary = summarize(load_scan_result(report_path))
+    save_summary(summary, report_path)
+    return summary
@@ -0,0 +1,72 @@
+"""
+Target utilities for Scansible
+-----------------------------
+Splits large address ranges and host lists into shards for parallel scanning.
+"""
+
+import ipaddress
+import re
+from typing import List, Tuple
+
+_SEPARATORS = re.compile(r"[\s,]+")
+
+# Pieces a single network is split into at most; larger networks (IPv6) get larger pieces
+MAX_PIECES_PER_SPEC = 1024
+
+
+def split_target_list(target: str) -> List[str]:
+    """Split a target string into its individual specifications."""
+    return [spec for spec in _SEPARATORS.split(target.strip()) if spec]
+
+
+def _expand_spec(spec: str, shard_size: int) -> List[Tuple[str, int]]:
+    """Break a single target specification into pieces of at most shard_size addresses."""
+    try:
+        network = ipaddress.ip_network(spec, strict=False)
+    except ValueError:
+        # Hostnames and nmap-style octet ranges are kept whole
+        return [(spec, 1)]
+
+    if network.num_addresses <= shard_size:
+        return [(spec, network.num_addresses)]
+
+    # Largest power of two that fits in a shard
+    prefix_step = max(shard_size.bit_length() - 1, 0)
+    new_prefix = network.max_prefixlen - prefix_step
+    # A /64 would otherwise expand into 2^56 shards
+    new_prefix = min(new_prefix, network.prefixlen + MAX_PIECES_PER_SPEC.bit_length() - 1)
+    return [(str(subnet), subnet.num_addresses) for subnet in network.subnets(new_prefix=new_prefix)]
+
+
+def count_addresses(target: str) -> int:
+    """Count the addresses covered by a target string (hostnames count as one)."""
+    total = 0
+    for spec in split_target_list(target):
+        try:
+            total += ipaddress.ip_network(spec, strict=False).num_addresses
+        except ValueError:
+            total += 1
+    return total
+
+
+def shard_targets(target: str, shard_size: int) -> List[str]:
+    """Split a target string into shards covering at most shard_size addresses each."""
+    shard_size = max(1, int(shard_size))
+
+    shards = []
+    current = []
+    current_size = 0
+
+    for spec in split_target_list(target):
+        for piece, size in _expand_spec(spec, shard_size):
+            if current and current_size + size > shard_size:
+                shards.append(" ".join(current))
+                current = []
+                current_size = 0
+            current.append(piece)
+            current_size += size
+
+    if current:
+        shards.append(" ".join(current))
+
+    return shards
@@ -0,0 +1,268 @@
+"""
+Timing module for Scansible
+--------------------------
+Measures the latency and loss of a sample of targets and derives nmap and
+rustscan timing options from them instead of relying on fixed templates.
+"""
+
+import ipaddress
+import json
+import os
+import re
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from scansible.core.targets import split_target_list
+
+# Ports tried in turn by the latency probe; a refused connection still measures the round trip
+PROBE_PORTS = (443, 80, 22)
+
+# Probes sent to each sampled address that answered the first one, to measure loss
+PROBE_ATTEMPTS = 3
+
+# Measurements older than this are probed again
+HISTORY_MAX_AGE = 24 * 3600
+
+# Weight of a new measurement in the per-subnet moving average
+HISTORY_SMOOTHING = 0.5
+
+# nmap templates that ask to be slow on purpose are left untouched
+_SLOW_NMAP_TEMPLATE = re.compile(r"(?:^|\s)(?:-T[0-2]|-T\s*(?:paranoid|sneaky|polite))(?:\s|$)")
+_RUSTSCAN_BATCH = re.compile(r"(?:^|\s)(?:-b|--batch-size)(?:\s+|=)\d+")
+_RUSTSCAN_TIMEOUT = re.compile(r"(?:^|\s)(?:-t|--timeout)(?:\s+|=)\d+")
+
+
+def probe_latency(address: str, timeout: float = 1.0) -> Optional[float]:
+    """Return the TCP connect round trip to an address in seconds, or None if it never answered."""
+    for port in PROBE_PORTS:
+        start = time.monotonic()
+        try:
+            with socket.create_connection((address, port), timeout=timeout):
+                pass
+        except ConnectionRefusedError:
+            # The RST came back from the host, which is all the round trip needs
+            pass
+        except OSError:
+            continue
+        return time.monotonic() - start
+    return None
+
+
+def sample_addresses(target: str, sample_size: int = 8) -> List[str]:
+    """Pick up to sample_size addresses spread evenly over a target string."""
+    specs = split_target_list(target)
+    per_spec = max(1, sample_size // max(len(specs), 1))
+    samples = []
+
+    for spec in specs:
+        try:
+            network = ipaddress.ip_network(spec, strict=False)
+        except ValueError:
+            samples.append(spec)
+            continue
+
+        count = min(per_spec, network.num_addresses)
+        # Skip the network and broadcast addresses of IPv4 subnets
+        first = 1 if network.version == 4 and network.num_addresses > 2 else 0
+        usable = max(network.num_addresses - 2 * first, 1)
+        step = max(usable // count, 1)
+        for offset in range(count):
+            samples.append(str(network.network_address + first + offset * step))
+
+    return samples[:sample_size]
+
+
+def subnet_key(address: str) -> str:
+    """Return the history key of an address: its /24 (IPv4), /64 (IPv6) or the hostname itself."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return address.lower()
+    prefix = 24 if ip.version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def build_timing_profile(rtt: float, loss: float) -> Dict:
+    """Derive scan timing options from a round trip time (seconds) and a loss ratio."""
+    rtt_ms = rtt * 1000
+
+    if rtt_ms < 5:
+        min_rate, batch_size, host_timeout = 5000, 4500, 10
+    elif rtt_ms < 50:
+        min_rate, batch_size, host_timeout = 1000, 2500, 15
+    elif rtt_ms < 200:
+        min_rate, batch_size, host_timeout = 300, 1000, 30
+    else:
+        min_rate, batch_size, host_timeout = 100, 500, 60
+
+    # Lossy links get fewer packets in flight and more retransmissions
+    if loss > 0.1:
+        min_rate //= 2
+        batch_size //= 2
+
+    if loss == 0:
+        max_retries = 1
+    elif loss <= 0.1:
+        max_retries = 2
+    else:
+        max_retries = 4
+
+    return {
+        'rtt_ms': round(rtt_ms, 1),
+        'loss': round(loss, 2),
+        'min_rate': min_rate,
+        'max_retries': max_retries,
+        'host_timeout': f"{host_timeout}m",
+        'batch_size': batch_size,
+        # Give rustscan a few round trips before declaring a port closed
+        'timeout_ms': max(500, int(rtt_ms * 4) + 250),
+    }
+
+
+def apply_timing(command: str, profile: Optional[Dict]) -> str:
+    """Add timing options from a profile to an nmap or rustscan command."""
+    if not profile:
+        return command
+
+    tool_name = command.split()[0] if command.split() else ''
+
+    if tool_name == 'nmap':
+        if _SLOW_NMAP_TEMPLATE.search(command):
+            return command
+        options = []
+        if '--min-rate' not in command:
+            options.append(f"--min-rate {profile['min_rate']}")
+        if '--max-retries' not in command:
+            options.append(f"--max-retries {profile['max_retries']}")
+        if '--host-timeout' not in command:
+            options.append(f"--host-timeout {profile['host_timeout']}")
+        return f"{command} {' '.join(options)}" if options else command
+
+    if tool_name == 'rustscan':
+        # Arguments after '--' belong to the nmap run started by rustscan
+        head, separator, tail = command.partition(' -- ')
+        head = _RUSTSCAN_BATCH.sub('', head)
+        head = _RUSTSCAN_TIMEOUT.sub('', head)
+        head = f"{head} -b {profile['batch_size']} --timeout {profile['timeout_ms']}"
+        return f"{head}{separator}{tail}"
+
+    return command
+
+
+class TimingTuner:
+    """Measure target latency and keep a per-subnet history of the results."""
+
+    def __init__(self, history_path: Path, sample_size: int = 8, probe_timeout: float = 1.0):
+        """Initialize the tuner with the JSON file holding the per-subnet history."""
+        self.history_path = Path(history_path)
+        self.sample_size = sample_size
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._history = self._load_history()
+
+    def _load_history(self) -> Dict:
+        """Load the per-subnet history from disk."""
+        try:
+            return json.loads(self.history_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_history(self):
+        """Write the per-subnet history to disk."""
+        try:
+            self.history_path.parent.mkdir(parents=True, exist_ok=True)
+            # Replaced whole, so that another process never reads a half-written file
+            tmp_path = self.history_path.with_name(self.history_path.name + '.tmp')
+            tmp_path.write_text(json.dumps(self._history, indent=2))
+            os.replace(tmp_path, self.history_path)
+        except OSError as e:
+            print(f"Warning: could not save timing history: {e}")
+
+    def _probe(self, address: str) -> List[Optional[float]]:
+        """Return the round trips of the probes sent to an address, or an empty list if it never answered."""
+        first = probe_latency(address, self.probe_timeout)
+        if first is None:
+            # Most likely no host behind the address: it says nothing about packet loss
+            return []
+        return [first] + [probe_latency(address, self.probe_timeout) for _ in range(PROBE_ATTEMPTS - 1)]
+
+    def measure(self, addresses: List[str]) -> Dict[str, Dict]:
+        """Probe addresses concurrently and return the round trip and loss of each subnet."""
+        with ThreadPoolExecutor(max_workers=max(len(addresses), 1)) as pool:
+            probes = list(pool.map(self._probe, addresses))
+
+        by_subnet = {}
+        for address, rtts in zip(addresses, probes):
+            by_subnet.setdefault(subnet_key(address), []).extend(rtts)
+
+        measurements = {}
+        for subnet, values in by_subnet.items():
+            # Loss only counts the probes lost to hosts that answered at least once
+            answered = [rtt for rtt in values if rtt is not None]
+            measurements[subnet] = {
+                'rtt': statistics.median(answered) if answered else None,
+                'loss': 1 - len(answered) / len(values) if values else None,
+            }
+        return measurements
+
+    def _record(self, subnet: str, measurement: Dict):
+        """Fold a measurement into the moving average of a subnet."""
+        previous = self._history.get(subnet)
+        rtt = measurement['rtt']
+        loss = measurement['loss']
+        if previous:
+            if rtt is not None and previous.get('rtt') is not None:
+                rtt = HISTORY_SMOOTHING * rtt + (1 - HISTORY_SMOOTHING) * previous['rtt']
+            elif rtt is None:
+                rtt = previous.get('rtt')
+            if loss is None:
+                loss = previous.get('loss', 0)
+            else:
+                loss = HISTORY_SMOOTHING * loss + (1 - HISTORY_SMOOTHING) * previous.get('loss', 0)
+        self._history[subnet] = {'rtt': rtt, 'loss': loss or 0, 'updated': time.time()}
+
+    def tune(self, target: str, use_history: bool = True) -> Optional[Dict]:
+        """Return the timing profile for a target, probing it unless the history is fresh."""
+        addresses = sample_addresses(target, self.sample_size)
+        if not addresses:
+            return None
+        subnets = sorted({subnet_key(address) for address in addresses})
+
+        with self._lock:
+            now = time.time()
+            fresh = use_history and all(
+                now - self._history.get(subnet, {}).get('updated', 0) < HISTORY_MAX_AGE for subnet in subnets)
+
+            if not fresh:
+                for subnet, measurement in self.measure(addresses).items():
+                    self._record(subnet, measurement)
+                if use_history:
+                    self._save_history()
+
+            entries = [self._history[subnet] for subnet in subnets if subnet in self._history]
+
+        rtts = [entry['rtt'] for entry in entries if entry.get('rtt') is not None]
+        if not rtts:
+            # Nothing answered: the targets may just filter the probe ports
+            return None
+
+        # Tune for the slowest subnet so that no part of the target times out
+        return build_timing_profile(max(rtts), max(entry.get('loss', 0) for entry in entries))
+
+
+_tuners = {}
+_tuners_lock = threading.Lock()
+
+
+def get_timing_tuner(history_path: Path) -> TimingTuner:
+    """Return the process-wide tuner for a history file, shared by the scanners of all workers."""
+    history_path = Path(history_path)
+    with _tuners_lock:
+        if history_path not in _tuners:
+            _tuners[history_path] = TimingTuner(history_path)
+        return _tuners[history_path]
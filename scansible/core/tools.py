@@ -0,0 +1,222 @@
+"""
+Tool registry module for Scansible
+---------------------------------
+Discovers security tools once, probes their version and capabilities,
+and caches the result on disk until the binary changes.
+"""
+
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Tools the templates and execution backends rely on
+KNOWN_TOOLS = ['nmap', 'rustscan', 'trivy', 'ansible-playbook', 'ansible-inventory', 'kubectl', 'helm']
+
+# NSE categories accepted by --script in place of script names
+NSE_CATEGORIES = {
+    'all', 'auth', 'broadcast', 'brute', 'default', 'discovery', 'dos', 'exploit',
+    'external', 'fuzzer', 'intrusive', 'malware', 'safe', 'version', 'vuln'
+}
+
+_VERSION_PATTERN = re.compile(r"(\d+(?:\.\d+)+[\w.-]*)")
+
+
+class ToolRegistry:
+    """Registry of installed tools backed by an on-disk cache."""
+
+    def __init__(self, cache_path: Path):
+        """Initialize the registry with the path of its cache file."""
+        self.cache_path = Path(cache_path)
+        self._lock = threading.Lock()
+        self._tools = None
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load the cached tool records, once per process."""
+        if self._tools is None:
+            try:
+                self._tools = json.loads(self.cache_path.read_text())
+            except (OSError, ValueError):
+                self._tools = {}
+        return self._tools
+
+    def _save(self):
+        """Write the tool records back to the cache file."""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(self._tools, indent=2))
+            tmp_path.replace(self.cache_path)
+        except OSError as e:
+            print(f"Could not write tool cache {self.cache_path}: {e}")
+
+    def _run_version(self, path: str) -> str:
+        """Run '<tool> --version' and return its output."""
+        try:
+            result = subprocess.run([path, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, timeout=15)
+            return result.stdout
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    def _find_nse_scripts_dir(self, path: str) -> Optional[Path]:
+        """Locate the NSE scripts directory that belongs to an nmap binary."""
+        candidates = []
+        if os.getenv('NMAPDIR'):
+            candidates.append(Path(os.getenv('NMAPDIR')) / 'scripts')
+        candidates.append(Path(path).resolve().parent.parent / 'share' / 'nmap' / 'scripts')
+        candidates.append(Path('/usr/share/nmap/scripts'))
+        candidates.append(Path('/usr/local/share/nmap/scripts'))
+
+        for candidate in candidates:
+            if candidate.is_dir():
+                return candidate
+        return None
+
+    def _probe_capabilities(self, tool_name: str, path: str, version_output: str) -> Dict:
+        """Collect tool-specific capabilities."""
+        capabilities = {}
+
+        if tool_name == 'nmap':
+            scripts_dir = self._find_nse_scripts_dir(path)
+            if scripts_dir:
+                capabilities['scripts_dir'] = str(scripts_dir)
+                capabilities['scripts_mtime'] = scripts_dir.stat().st_mtime
+                capabilities['nse_scripts'] = sorted(script.stem for script in scripts_dir.glob('*.nse'))
+
+        elif tool_name == 'trivy':
+            # 'Vulnerability DB:' is followed by indented 'Key: value' lines
+            db_info = {}
+            in_db_section = False
+            for line in version_output.splitlines():
+                if line.startswith('Vulnerability DB'):
+                    in_db_section = True
+                elif in_db_section and line.startswith((' ', '\t')) and ':' in line:
+                    key, value = line.split(':', 1)
+                    db_info[key.strip().lower()] = value.strip()
+                else:
+                    in_db_section = False
+            if db_info:
+                capabilities['vulnerability_db'] = db_info
+
+        return capabilities
+
+    def _probe(self, tool_name: str, path: str, mtime: float) -> Dict:
+        """Probe a tool's version and capabilities."""
+        version_output = self._run_version(path)
+        match = _VERSION_PATTERN.search(version_output)
+
+        return {
+            'name': tool_name,
+            'path': path,
+            'mtime': mtime,
+            'version': match.group(1) if match else None,
+            'capabilities': self._probe_capabilities(tool_name, path, version_output),
+        }
+
+    def _is_fresh(self, record: Optional[Dict], path: str, mtime: float) -> bool:
+        """Check whether a cached record still describes the installed binary."""
+        if not record or record.get('path') != path or record.get('mtime') != mtime:
+            return False
+
+        scripts_dir = record.get('capabilities', {}).get('scripts_dir')
+        if scripts_dir:
+            try:
+                return Path(scripts_dir).stat().st_mtime == record['capabilities'].get('scripts_mtime')
+            except OSError:
+                return False
+        return True
+
+    def get(self, tool_name: str) -> Optional[Dict]:
+        """Return the record of an installed tool, or None if it is not installed."""
+        path = shutil.which(tool_name)
+        if not path:
+            return None
+
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        if tool_name not in KNOWN_TOOLS:
+            # Any executable a template names: it is located, never run to read a version
+            return {'name': tool_name, 'path': path, 'mtime': mtime, 'version': None, 'capabilities': {}}
+
+        with self._lock:
+            tools = self._load()
+            record = tools.get(tool_name)
+            if not self._is_fresh(record, path, mtime):
+                record = self._probe(tool_name, path, mtime)
+                tools[tool_name] = record
+                self._save()
+            return record
+
+    def is_available(self, tool_name: str) -> bool:
+        """Check if a tool is installed."""
+        return self.get(tool_name) is not None
+
+    def available_tools(self, tool_names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Return the records of every installed tool among the known (or given) ones."""
+        records = {}
+        for tool_name in tool_names or KNOWN_TOOLS:
+            record = self.get(tool_name)
+            if record:
+                records[tool_name] = record
+        return records
+
+    def has_nse_script(self, script_name: str) -> Optional[bool]:
+        """Check if an NSE script is installed; None when the scripts directory is unknown."""
+        record = self.get('nmap')
+        if not record or 'nse_scripts' not in record.get('capabilities', {}):
+            return None
+        return script_name in record['capabilities']['nse_scripts']
+
+    def nmap_data_file(self, name: str) -> Optional[Path]:
+        """Return a file of nmap's data directory, which holds the scripts directory, if installed."""
+        record = self.get('nmap')
+        scripts_dir = record.get('capabilities', {}).get('scripts_dir') if record else None
+        if not scripts_dir:
+            return None
+        path = Path(scripts_dir).parent / name
+        return path if path.is_file() else None
+
+    def missing_nse_scripts(self, command: str) -> List[str]:
+        """List the scripts requested by an nmap command that are not installed."""
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            return []
+
+        requested = []
+        for index, arg in enumerate(args):
+            if arg == '--script' and index + 1 < len(args):
+                requested.extend(args[index + 1].split(','))
+            elif arg.startswith('--script='):
+                requested.extend(arg.split('=', 1)[1].split(','))
+
+        missing = []
+        for name in requested:
+            # Wildcards, expressions and categories cannot be checked by name
+            if not re.fullmatch(r"[\w-]+", name) or name in NSE_CATEGORIES:
+                continue
+            if self.has_nse_script(name) is False:
+                missing.append(name)
+        return missing
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_tool_registry(cache_path: Path) -> ToolRegistry:
+    """Return the process-wide registry for a cache file."""
+    cache_path = Path(cache_path)
+    with _registries_lock:
+        if cache_path not in _registries:
+            _registries[cache_path] = ToolRegistry(cache_path)
+        return _registries[cache_path]
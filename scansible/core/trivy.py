@@ -0,0 +1,252 @@
+"""
+Trivy ingestion module for Scansible
+-----------------------------------
+Streams Trivy image, filesystem and Kubernetes JSON reports one vulnerability
+at a time, so cluster-wide reports are never loaded in memory as a whole.
+"""
+
+import json
+from json.decoder import scanstring
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from scansible.core.model import SEVERITIES, PackageFinding, VulnCatalogue, parse_trivy_vulnerability
+
+# Size of the chunks read from the report
+CHUNK_SIZE = 64 * 1024
+
+# Paths of the vulnerability arrays in the layouts written by 'trivy image/fs/repo' and 'trivy k8s'
+VULNERABILITY_PATHS = (
+    ('Results', '[]', 'Vulnerabilities', '[]'),
+    ('Resources', '[]', 'Results', '[]', 'Vulnerabilities', '[]'),
+    ('Vulnerabilities', '[]', 'Results', '[]', 'Vulnerabilities', '[]'),
+)
+
+# Top-level keys Trivy JSON reports start with
+TRIVY_TOP_LEVEL_KEYS = {
+    'SchemaVersion', 'CreatedAt', 'ArtifactName', 'ArtifactType', 'Metadata', 'Results',
+    'ClusterName', 'Resources', 'Vulnerabilities', 'Misconfigurations',
+}
+
+_WHITESPACE = ' \t\n\r'
+_DECODER = json.JSONDecoder()
+
+JsonPath = Tuple[str, ...]
+
+_DESCEND_PATHS = {path[:length] for path in VULNERABILITY_PATHS for length in range(len(path))}
+
+
+class _JsonReader:
+    """Buffered reader that decodes JSON tokens from a text stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read another chunk, dropping the consumed part of the buffer."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char: str):
+        """Consume a structural character."""
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.position}")
+        self.position += 1
+
+    def read_value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except ValueError:
+                pass
+            if not self._fill():
+                value, self.position = _DECODER.raw_decode(self.buffer, self.position)
+                return value
+
+    def read_key(self) -> str:
+        """Decode an object key and its colon."""
+        self.expect('"')
+        while True:
+            try:
+                key, end = scanstring(self.buffer, self.position)
+                self.position = end
+                break
+            except ValueError:
+                if not self._fill():
+                    raise
+        self.expect(':')
+        return key
+
+    def skip_value(self):
+        """Skip the next JSON value without building it."""
+        char = self.peek()
+        if char not in '{[':
+            self.read_value()
+            return
+
+        depth = 0
+        while True:
+            while self.position < len(self.buffer):
+                char = self.buffer[self.position]
+                if char == '"':
+                    try:
+                        _, self.position = scanstring(self.buffer, self.position + 1)
+                    except ValueError:
+                        # The string continues in the next chunk
+                        break
+                    continue
+                self.position += 1
+                if char in '{[':
+                    depth += 1
+                elif char in '}]':
+                    depth -= 1
+                    if depth == 0:
+                        return
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+
+def _descend_paths(item_paths: Tuple[JsonPath, ...]) -> set:
+    """Return the container paths leading to the given item paths."""
+    return {path[:length] for path in item_paths for length in range(len(path))}
+
+
+def _walk(reader: _JsonReader, path: JsonPath, item_paths: Tuple[JsonPath, ...] = VULNERABILITY_PATHS,
+          descend_paths: set = _DESCEND_PATHS) -> Iterator[Tuple[str, JsonPath, object]]:
+    """Walk the containers leading to the item arrays, skipping everything else.
+
+    Yields ('start', path, None) when such a container opens, ('value', path, value)
+    for its scalar fields and ('item', path, item) for each array item, i.e. each
+    vulnerability with the default paths.
+    """
+    if path in item_paths:
+        yield 'item', path, reader.read_value()
+        return
+
+    char = reader.peek()
+    if path not in descend_paths or char not in '{[':
+        if char in '{[':
+            reader.skip_value()
+        else:
+            yield 'value', path, reader.read_value()
+        return
+
+    yield 'start', path, None
+    if char == '{':
+        reader.expect('{')
+        if reader.peek() == '}':
+            reader.position += 1
+        else:
+            while True:
+                key = reader.read_key()
+                yield from _walk(reader, path + (key,), item_paths, descend_paths)
+                if reader.peek() == ',':
+                    reader.position += 1
+                    continue
+                reader.expect('}')
+                break
+    else:
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.position += 1
+        else:
+            while True:
+                yield from _walk(reader, path + ('[]',), item_paths, descend_paths)
+                if reader.peek() == ',':
+                    reader.position += 1
+                    continue
+                reader.expect(']')
+                break
+
+
+def iter_json_items(stream, item_paths: Tuple[JsonPath, ...]) -> Iterator[Tuple[JsonPath, object]]:
+    """Yield the items of the arrays at item_paths of a JSON document, one at a time.
+
+    Paths list the object keys leading to an array, with '[]' for the array
+    itself, e.g. ('vulnerabilities', '[]') for the items of a top-level array.
+    """
+    reader = _JsonReader(stream)
+    for event, path, value in _walk(reader, (), item_paths, _descend_paths(item_paths)):
+        if event == 'item':
+            yield path, value
+
+
+def report_first_key(report_path: Path) -> Optional[str]:
+    """Return the first key of a JSON report, which tells nmap and Trivy reports apart."""
+    with open(report_path, encoding='utf-8') as report:
+        reader = _JsonReader(report)
+        try:
+            reader.expect('{')
+            return None if reader.peek() == '}' else reader.read_key()
+        except ValueError:
+            return None
+
+
+def is_trivy_report(report_path: Path) -> bool:
+    """Whether a JSON report was written by Trivy."""
+    return report_first_key(report_path) in TRIVY_TOP_LEVEL_KEYS
+
+
+def iter_trivy_findings(report_path: Path, catalogue: Optional[VulnCatalogue] = None) -> Iterator[PackageFinding]:
+    """Yield the vulnerable packages of a Trivy JSON report one at a time.
+
+    The findings of one read share their vulnerability instances, through catalogue if given.
+    """
+    if catalogue is None:
+        catalogue = VulnCatalogue()
+    with open(report_path, encoding='utf-8') as report:
+        reader = _JsonReader(report)
+        # Scalar fields of the objects on the current path, e.g. a result's Target
+        fields = {}
+
+        for event, path, value in _walk(reader, ()):
+            if event == 'start':
+                fields[path] = {}
+            elif event == 'value':
+                fields.setdefault(path[:-1], {})[path[-1]] = value
+            elif isinstance(value, dict):
+                result = fields.get(path[:-2], {})
+                target = result.get('Target', '')
+                # Kubernetes reports nest results under the resource they belong to
+                resource = fields.get(path[:-4], {}) if len(path) > 4 else {}
+                if resource.get('Kind'):
+                    prefix = '/'.join(str(resource[key]) for key in ('Namespace', 'Kind', 'Name') if resource.get(key))
+                    target = f"{prefix}: {target}" if target else prefix
+                yield parse_trivy_vulnerability(target, value, catalogue)
+
+
+def ingest_trivy_json(report_path: Path, on_finding: Optional[Callable[[PackageFinding], None]] = None) -> Dict[str, int]:
+    """Count the vulnerabilities of a Trivy report by severity in a single streaming pass."""
+    counts = dict.fromkeys(SEVERITIES, 0)
+    for finding in iter_trivy_findings(report_path):
+        severity = finding.vulnerability.severity
+        counts[severity if severity in counts else 'UNKNOWN'] += 1
+        if on_finding:
+            on_finding(finding)
+    return counts
@@ -0,0 +1,439 @@
+"""
+Vulnerability database module for Scansible
+------------------------------------------
+Imports NVD CVE/CPE feeds into a local indexed SQLite database and matches
+the product and version of detected services against it, so that version
+scans no longer need the vulners NSE script and its remote lookups.
+"""
+
+import gzip
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from scansible.core.hostindex import NMAP_JSON_LAYOUT, index_entry, save_host_index
+from scansible.core.ingest import write_nmap_json
+from scansible.core.model import (
+    Host, Script, Service, Vulnerability, as_list, parse_nmap_host, parse_nmap_service
+)
+from scansible.core.trivy import iter_json_items
+
+# Id of the script added to ports by the matching engine
+VULNDB_SCRIPT_ID = 'vulndb'
+
+# Array of CVE items in NVD API 2.0 and legacy 1.1 JSON feeds
+FEED_ITEM_PATHS = (
+    ('vulnerabilities', '[]'),
+    ('CVE_Items', '[]'),
+)
+
+# Rows written per transaction while importing a feed
+IMPORT_BATCH_SIZE = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cves (
+    id TEXT PRIMARY KEY,
+    cvss REAL NOT NULL DEFAULT 0,
+    severity TEXT
+);
+CREATE TABLE IF NOT EXISTS cpe_matches (
+    cve_id TEXT NOT NULL,
+    vendor TEXT NOT NULL,
+    product TEXT NOT NULL,
+    version TEXT NOT NULL,
+    start_including TEXT,
+    start_excluding TEXT,
+    end_including TEXT,
+    end_excluding TEXT
+);
+CREATE INDEX IF NOT EXISTS cpe_matches_product ON cpe_matches (product, vendor);
+CREATE INDEX IF NOT EXISTS cpe_matches_cve ON cpe_matches (cve_id);
+CREATE TABLE IF NOT EXISTS feeds (
+    name TEXT PRIMARY KEY,
+    imported REAL NOT NULL,
+    cves INTEGER NOT NULL
+);
+"""
+
+_CPE_SEPARATOR = re.compile(r"(?<!\\):")
+_VERSION_PART = re.compile(r"\d+|[a-z]+")
+
+# (vendor, product, version) of a service
+ServiceKey = Tuple[Optional[str], str, str]
+
+
+def parse_cpe(cpe: str) -> Optional[Tuple[str, str, str, str]]:
+    """Split a CPE 2.2 URI or 2.3 string into (part, vendor, product, version).
+
+    A 2.3 update field is appended to the version ('8.2' + 'p1' -> '8.2p1'),
+    the way nmap reports such versions.
+    """
+    if cpe.startswith('cpe:2.3:'):
+        fields = _CPE_SEPARATOR.split(cpe[len('cpe:2.3:'):])
+    elif cpe.startswith('cpe:/'):
+        fields = cpe[len('cpe:/'):].split(':')
+    else:
+        return None
+
+    fields = [field.replace('\\', '').lower() for field in fields] + [''] * 5
+    part, vendor, product, version, update = fields[:5]
+    if not product:
+        return None
+    if update not in ('', '*', '-') and version not in ('', '*', '-'):
+        version += update
+    return part, vendor, product, version or '*'
+
+
+def version_key(version: str) -> Tuple:
+    """Return a sort key comparing versions part by part ('8.10' > '8.9', '8.2p1' > '8.2')."""
+    return tuple((1, int(part)) if part.isdigit() else (0, part)
+                 for part in _VERSION_PART.findall(version.lower()))
+
+
+def _version_in_range(version: str, row: sqlite3.Row) -> bool:
+    """Whether a service version is covered by a cpe_matches row."""
+    if row['version'] not in ('*', '-'):
+        return version_key(row['version']) == version_key(version)
+
+    key = version_key(version)
+    if row['start_including'] and key < version_key(row['start_including']):
+        return False
+    if row['start_excluding'] and key <= version_key(row['start_excluding']):
+        return False
+    if row['end_including'] and key > version_key(row['end_including']):
+        return False
+    if row['end_excluding'] and key >= version_key(row['end_excluding']):
+        return False
+    return True
+
+
+def _iter_cpe_matches(nodes) -> Iterator[Dict]:
+    """Yield the vulnerable CPE match entries of NVD configuration nodes (both feed layouts)."""
+    for node in as_list(nodes):
+        for entry in as_list(node.get('cpeMatch')) + as_list(node.get('cpe_match')):
+            if entry.get('vulnerable', True):
+                yield entry
+        yield from _iter_cpe_matches(node.get('children'))
+
+
+def parse_feed_item(item: Dict) -> Optional[Tuple[str, float, Optional[str], List[Tuple]]]:
+    """Return (cve_id, cvss, severity, cpe match rows) of an NVD 2.0 or 1.1 feed item."""
+    if 'cve' not in item:
+        return None
+    cve = item['cve']
+
+    if 'id' in cve:
+        # NVD API 2.0: metrics by CVSS version, newest first
+        cve_id = cve['id']
+        cvss, severity = 0.0, None
+        metrics = cve.get('metrics') or {}
+        for key in ('cvssMetricV40', 'cvssMetricV31', 'cvssMetricV30', 'cvssMetricV2'):
+            for metric in metrics.get(key) or []:
+                data = metric.get('cvssData') or {}
+                cvss = float(data.get('baseScore') or 0)
+                severity = data.get('baseSeverity') or metric.get('baseSeverity')
+                break
+            if cvss:
+                break
+        nodes = [node for configuration in cve.get('configurations') or [] for node in configuration.get('nodes') or []]
+    else:
+        # Legacy 1.1 feeds
+        cve_id = ((cve.get('CVE_data_meta') or {}).get('ID'))
+        impact = item.get('impact') or {}
+        v3 = (impact.get('baseMetricV3') or {}).get('cvssV3') or {}
+        v2 = impact.get('baseMetricV2') or {}
+        cvss = float(v3.get('baseScore') or (v2.get('cvssV2') or {}).get('baseScore') or 0)
+        severity = v3.get('baseSeverity') or v2.get('severity')
+        nodes = (item.get('configurations') or {}).get('nodes')
+
+    if not cve_id:
+        return None
+
+    rows = set()
+    for entry in _iter_cpe_matches(nodes):
+        parsed = parse_cpe(entry.get('criteria') or entry.get('cpe23Uri') or '')
+        if not parsed or parsed[0] not in ('a', 'o', 'h'):
+            continue
+        _, vendor, product, version = parsed
+        rows.add((cve_id, vendor, product, version,
+                  entry.get('versionStartIncluding'), entry.get('versionStartExcluding'),
+                  entry.get('versionEndIncluding'), entry.get('versionEndExcluding')))
+
+    return cve_id, cvss, severity.upper() if severity else None, sorted(rows, key=lambda row: tuple(map(str, row)))
+
+
+def iter_feed_items(feed_path: Path) -> Iterator[Dict]:
+    """Stream the CVE items of an NVD JSON feed (optionally gzipped) one at a time."""
+    feed_path = Path(feed_path)
+    opener = gzip.open if feed_path.suffix == '.gz' else open
+    with opener(feed_path, 'rt', encoding='utf-8') as feed:
+        for _, item in iter_json_items(feed, FEED_ITEM_PATHS):
+            if isinstance(item, dict):
+                yield item
+
+
+class VulnDB:
+    """Local CVE/CPE database with an index on product names."""
+
+    def __init__(self, db_path: Path):
+        """Open (and create if needed) the SQLite database."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA)
+        # Services repeat across hosts: each product/version is looked up once
+        self._matches: Dict[ServiceKey, List[Vulnerability]] = {}
+        self._mtime = self._db_mtime()
+
+    def _db_mtime(self) -> float:
+        try:
+            return self.db_path.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def refresh(self):
+        """Forget the memoized matches if another process has changed the database file."""
+        mtime = self._db_mtime()
+        with self._lock:
+            if mtime != self._mtime:
+                self._matches.clear()
+                self._mtime = mtime
+
+    def close(self):
+        """Close the database connection."""
+        self._connection.close()
+
+    def import_feed(self, feed_path: Path) -> int:
+        """Import an NVD JSON feed and return the number of CVEs it held.
+
+        CVEs already in the database are replaced, so an updated feed can be
+        imported over an older one.
+        """
+        feed_path = Path(feed_path)
+        count = 0
+        with self._lock:
+            cursor = self._connection.cursor()
+            batch = []
+            for item in iter_feed_items(feed_path):
+                parsed = parse_feed_item(item)
+                if parsed:
+                    batch.append(parsed)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    count += self._write_batch(cursor, batch)
+                    batch = []
+            count += self._write_batch(cursor, batch)
+
+            cursor.execute("INSERT OR REPLACE INTO feeds (name, imported, cves) VALUES (?, ?, ?)",
+                           (feed_path.name, time.time(), count))
+            self._connection.commit()
+            self._matches.clear()
+            self._mtime = self._db_mtime()
+        return count
+
+    def _write_batch(self, cursor: sqlite3.Cursor, batch: List[Tuple]) -> int:
+        """Replace the CVEs of a batch and their CPE matches."""
+        if not batch:
+            return 0
+        cve_ids = [(cve_id,) for cve_id, _, _, _ in batch]
+        cursor.executemany("DELETE FROM cpe_matches WHERE cve_id = ?", cve_ids)
+        cursor.executemany("INSERT OR REPLACE INTO cves (id, cvss, severity) VALUES (?, ?, ?)",
+                           [(cve_id, cvss, severity) for cve_id, cvss, severity, _ in batch])
+        cursor.executemany("INSERT INTO cpe_matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           [row for _, _, _, rows in batch for row in rows])
+        self._connection.commit()
+        return len(batch)
+
+    def feeds(self) -> List[Dict]:
+        """Return the imported feeds with their import time and CVE count."""
+        with self._lock:
+            rows = self._connection.execute("SELECT name, imported, cves FROM feeds ORDER BY name").fetchall()
+        return [dict(row) for row in rows]
+
+    def match(self, vendor: Optional[str], product: str, version: str) -> List[Vulnerability]:
+        """Return the CVEs affecting a product version, highest CVSS first."""
+        key = (vendor, product, version)
+        if key in self._matches:
+            return self._matches[key]
+
+        query = ("SELECT m.cve_id, m.version, m.start_including, m.start_excluding, m.end_including, "
+                 "m.end_excluding, c.cvss, c.severity FROM cpe_matches m JOIN cves c ON c.id = m.cve_id "
+                 "WHERE m.product = ?")
+        params = [product]
+        if vendor:
+            query += " AND m.vendor = ?"
+            params.append(vendor)
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+
+        found = {}
+        for row in rows:
+            if row['cve_id'] not in found and _version_in_range(version, row):
+                found[row['cve_id']] = Vulnerability(row['cve_id'], row['cvss'], severity=row['severity'], type='cve')
+
+        matches = sorted(found.values(), key=lambda vuln: (-vuln.cvss, vuln.id))
+        self._matches[key] = matches
+        return matches
+
+    def match_service(self, service: Service) -> Tuple[Optional[str], List[Vulnerability]]:
+        """Match a detected service by its CPEs, else by its product name.
+
+        Returns the CPE or product the vulnerabilities were found for. Services
+        without a version are not matched, as every CVE of the product would.
+        """
+        for cpe in service.cpes:
+            parsed = parse_cpe(cpe)
+            if not parsed:
+                continue
+            _, vendor, product, version = parsed
+            if version == '*':
+                version = (service.version or '').split()[0] if service.version else '*'
+            if version == '*':
+                continue
+            matches = self.match(vendor or None, product, version)
+            if matches:
+                return f"cpe:/{parsed[0]}:{vendor}:{product}:{version}", matches
+
+        if service.product and service.version:
+            product = service.product.strip().lower().replace(' ', '_')
+            version = service.version.split()[0]
+            matches = self.match(None, product, version)
+            if matches:
+                return f"{product} {version}", matches
+
+        return None, []
+
+
+def _script_output(label: str, vulnerabilities: Iterable[Vulnerability]) -> str:
+    """Format matched vulnerabilities like the output of the vulners NSE script."""
+    lines = [f"\n  {label}: "]
+    for vulnerability in vulnerabilities:
+        lines.append(f"    \t{vulnerability.id}\t{vulnerability.cvss}\thttps://nvd.nist.gov/vuln/detail/{vulnerability.id}")
+    return '\n'.join(lines)
+
+
+def script_record(label: str, vulnerabilities: List[Vulnerability]) -> Dict:
+    """Build the xmltodict record of a vulndb script, in the table layout of vulners."""
+    return {
+        '@id': VULNDB_SCRIPT_ID,
+        '@output': _script_output(label, vulnerabilities),
+        'table': {
+            '@key': label,
+            'table': [{'elem': [
+                {'@key': 'id', '#text': vulnerability.id},
+                {'@key': 'cvss', '#text': str(vulnerability.cvss)},
+                {'@key': 'type', '#text': vulnerability.type or 'cve'},
+                {'@key': 'is_exploit', '#text': 'false'},
+            ]} for vulnerability in vulnerabilities],
+        },
+    }
+
+
+def annotate_host_record(record: Dict, db: VulnDB) -> int:
+    """Add a vulndb script to the open ports of an xmltodict host record.
+
+    Earlier vulndb scripts are replaced, so matching can be re-run after a
+    feed update. Returns the number of vulnerabilities added.
+    """
+    added = 0
+    for port in as_list((record.get('ports') or {}).get('port')):
+        if not isinstance(port, dict):
+            continue
+        scripts = [script for script in as_list(port.get('script'))
+                   if not (isinstance(script, dict) and script.get('@id') == VULNDB_SCRIPT_ID)]
+
+        if (port.get('state') or {}).get('@state') == 'open':
+            label, matches = db.match_service(parse_nmap_service(port.get('service') or {}))
+            if matches:
+                scripts.append(script_record(label, matches))
+                added += len(matches)
+
+        if not scripts:
+            port.pop('script', None)
+        else:
+            port['script'] = scripts[0] if len(scripts) == 1 else scripts
+    return added
+
+
+def annotate_host(host: Host, db: VulnDB) -> int:
+    """Add a vulndb script to the open ports of a model Host, replacing earlier ones."""
+    added = 0
+    for port in host.ports:
+        port.scripts = [script for script in port.scripts if script.id != VULNDB_SCRIPT_ID]
+        if not port.is_open or port.service is None:
+            continue
+        label, matches = db.match_service(port.service)
+        # CVEs already reported by the vulners script are not repeated
+        known = {vulnerability.id for vulnerability in port.vulnerabilities}
+        matches = [vulnerability for vulnerability in matches if vulnerability.id not in known]
+        if matches:
+            port.scripts.append(Script(VULNDB_SCRIPT_ID, _script_output(label, matches), matches))
+            added += len(matches)
+    return added
+
+
+def match_report(report_path: Path, db: VulnDB) -> int:
+    """Re-run the matching on an existing nmap report, without rescanning.
+
+    Returns the number of vulnerabilities found. Trivy reports are left as is.
+    """
+    from scansible.core.ndjson import (
+        is_ndjson_report, iter_ndjson_records, read_ndjson_header, write_ndjson_report
+    )
+
+    report_path = Path(report_path)
+    added = 0
+
+    if is_ndjson_report(report_path):
+        header = read_ndjson_header(report_path)
+
+        def hosts():
+            nonlocal added
+            for record in iter_ndjson_records(report_path):
+                if isinstance(record, Host):
+                    added += annotate_host(record, db)
+                    yield record
+
+        findings = (record for record in iter_ndjson_records(report_path) if not isinstance(record, Host))
+        write_ndjson_report(report_path, header.get('scanner', 'nmap'), header.get('metadata', {}), hosts(), findings)
+        return added
+
+    with open(report_path) as report_file:
+        data = json.load(report_file)
+    if 'nmaprun' not in data:
+        return 0
+
+    records = [record for record in as_list((data.get('nmaprun') or {}).get('host')) if isinstance(record, dict)]
+    for record in records:
+        added += annotate_host_record(record, db)
+
+    # Keep the one-host-per-line layout, and its index, of reports written by the scanner
+    spans = []
+    write_nmap_json(report_path, data, spans)
+    save_host_index(report_path, NMAP_JSON_LAYOUT, [index_entry(parse_nmap_host(record), offset, length)
+                                                    for record, (offset, length) in zip(records, spans)])
+    return added
+
+
+_vulndbs: Dict[Path, VulnDB] = {}
+_vulndbs_lock = threading.Lock()
+
+
+def get_vulndb(db_path: Path) -> Optional[VulnDB]:
+    """Return the per-process database at db_path, or None until a feed has been imported."""
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return None
+    with _vulndbs_lock:
+        if db_path not in _vulndbs:
+            _vulndbs[db_path] = VulnDB(db_path)
+        vulndb = _vulndbs[db_path]
+    # A feed imported by another process (the CLI) changes the file under this one
+    vulndb.refresh()
+    return vulndb
@@ -38,11 +38,72 @@ class Config:
         else:
             self.config_data['scans_dir'] = self.project_root / 'scans'
         
+        cache_dir = os.getenv('SCANSIBLE_CACHE_DIR')
+        if cache_dir:
+            self.config_data['cache_dir'] = Path(cache_dir)
+        else:
+            self.config_data['cache_dir'] = self.project_root / 'cache'
+        
         templates_dir = os.getenv('SCANSIBLE_TEMPLATES_DIR')
         if templates_dir:
             self.config_data['templates_dir'] = Path(templates_dir)
         else:
             self.config_data['templates_dir'] = self.project_root / 'scansible' / 'templates'
+        
+        rules_dir = os.getenv('SCANSIBLE_RULES_DIR')
+        if rules_dir:
+            self.config_data['rules_dir'] = Path(rules_dir)
+        else:
+            self.config_data['rules_dir'] = self.project_root / 'scansible' / 'rules'
+        
+        # Execution
+        self.config_data['executor'] = os.getenv('SCANSIBLE_EXECUTOR', 'auto')
+        self.config_data['max_workers'] = self._get_int_env('SCANSIBLE_MAX_WORKERS', os.cpu_count() or 4)
+        self.config_data['shard_size'] = self._get_int_env('SCANSIBLE_SHARD_SIZE', 0)
+        self.config_data['inventory'] = os.getenv('SCANSIBLE_INVENTORY')
+        self.config_data['auto_timing'] = self._get_bool_env('SCANSIBLE_AUTO_TIMING', False)
+        
+        # Reports
+        self.config_data['report_format'] = os.getenv('SCANSIBLE_REPORT_FORMAT', 'json')
+        self.config_data['report_gzip'] = self._get_bool_env('SCANSIBLE_REPORT_GZIP', False)
+        
+        # Local CVE/CPE database matched against detected service versions
+        vulndb_path = os.getenv('SCANSIBLE_VULNDB')
+        if vulndb_path:
+            self.config_data['vulndb_path'] = Path(vulndb_path)
+        else:
+            self.config_data['vulndb_path'] = self.config_data['cache_dir'] / 'vulndb.sqlite'
+        
+        # Scans the API runs at once, each on a worker thread
+        self.config_data['api_workers'] = self._get_int_env('SCANSIBLE_API_WORKERS', 2)
+        
+        # API scan history
+        scan_db_path = os.getenv('SCANSIBLE_SCAN_DB')
+        if scan_db_path:
+            self.config_data['scan_db_path'] = Path(scan_db_path)
+        else:
+            self.config_data['scan_db_path'] = self.config_data['cache_dir'] / 'scans.sqlite'
+        
+        # Scan events buffered for each API stream subscriber
+        self.config_data['event_queue_size'] = self._get_int_env('SCANSIBLE_EVENT_QUEUE_SIZE', 100)
+        
+        # Result cache (a TTL of 0 disables it)
+        self.config_data['result_cache_ttl'] = self._get_int_env('SCANSIBLE_RESULT_CACHE_TTL', 3600)
+        self.config_data['result_cache_max_mb'] = self._get_int_env('SCANSIBLE_RESULT_CACHE_MAX_MB', 512)
+    
+    def _get_int_env(self, name: str, default: int) -> int:
+        """Read an integer environment variable, falling back to a default."""
+        try:
+            return int(os.getenv(name, default))
+        except ValueError:
+            return default
+    
+    def _get_bool_env(self, name: str, default: bool) -> bool:
+        """Read a boolean environment variable ('1', 'true', 'yes' or 'on')."""
+        value = os.getenv(name)
+        if value is None:
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
     
     def get(self, key: str, default: Any = None) -> Any:
         """Get a configuration value."""
@@ -60,10 +121,20 @@ class Config:
         scans_dir.mkdir(exist_ok=True)
         return scans_dir
     
+    def get_cache_dir(self) -> Path:
+        """Get the cache directory path."""
+        cache_dir = self.get('cache_dir')
+        cache_dir.mkdir(exist_ok=True)
+        return cache_dir
+    
     def get_templates_dir(self) -> Path:
         """Get the templates directory path."""
         return self.get('templates_dir')
     
+    def get_rules_dir(self) -> Path:
+        """Get the recommendation rules directory path."""
+        return self.get('rules_dir')
+    
     def get_api_key(self, service: str) -> Optional[str]:
         """Get an API key for a specific service."""
         if service == 'ai':
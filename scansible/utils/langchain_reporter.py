@@ -24,6 +24,9 @@ from langchain.output_parsers import StructuredOutputParser, ResponseSchema
 from langchain.text_splitter import CharacterTextSplitter
 from dotenv import load_dotenv
 
+from scansible.core.model import ScanResult, VulnCatalogue, load_scan_result
+from scansible.core.summary import load_summary
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("scansible.langchain_reporter")
@@ -110,58 +113,82 @@ class VulnerabilityReportGenerator:
         logger.error("No suitable LLM found. Please set one of the API keys in your .env file")
         return None
     
-    def _extract_metadata(self, json_path: str) -> Dict:
-        """Extract scan metadata from the JSON file."""
-        try:
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-            
-            metadata = {
-                "timestamp": datetime.now().isoformat(),
-                "scan_type": "unknown",
-            }
-            
-            # Extract scan type from Nmap results
-            if "nmaprun" in data:
-                nmaprun = data.get("nmaprun", {})
-                metadata["scanner"] = "nmap"
-                metadata["scan_type"] = nmaprun.get("@scanner", "Nmap scan")
-                metadata["nmap_version"] = nmaprun.get("@version", "Unknown")
-                metadata["start_time"] = nmaprun.get("@startstr", "Unknown")
-                metadata["arguments"] = nmaprun.get("@args", "Unknown")
-            
-            # Extract scan type from Trivy results
-            elif "Results" in data:
-                metadata["scanner"] = "trivy"
-                metadata["scan_type"] = "Container security scan"
-            
-            return metadata
-            
-        except Exception as e:
-            logger.error(f"Error extracting metadata: {e}")
-            return {"timestamp": datetime.now().isoformat()}
+    def _extract_metadata(self, scan_result: ScanResult) -> Dict:
+        """Extract scan metadata from the normalized scan result."""
+        metadata = {
+            "timestamp": datetime.now().isoformat(),
+            "scan_type": "unknown",
+        }
+        
+        if scan_result.scanner != "unknown":
+            metadata["scanner"] = scan_result.scanner
+            metadata.update(scan_result.metadata)
+        
+        return metadata
     
-    def _extract_vulnerability_summary(self, json_path: str) -> Dict:
-        """Extract a vulnerability summary from the scan results."""
-        from scansible.utils.ai_reporter import extract_vulnerability_data
+    def _extract_vulnerability_summary(self, scan_result: ScanResult, scan_summary: Dict) -> Dict:
+        """Extract a vulnerability summary from the normalized scan result and its stored summary."""
+        counts = scan_summary["severities"]
+        summary = {
+            "critical": counts["CRITICAL"],
+            "high": counts["HIGH"],
+            "medium": counts["MEDIUM"],
+            "low": counts["LOW"],
+            "info": counts["INFO"],
+            "scan_summary": scan_summary,
+            "services": [],
+            "open_ports": [],
+            "vulnerabilities": []
+        }
         
-        try:
-            with open(json_path, 'r') as f:
-                json_data = json.load(f)
-            
-            return extract_vulnerability_data(json_data)
-        except Exception as e:
-            logger.error(f"Error extracting vulnerability summary: {e}")
-            return {
-                "critical": 0,
-                "high": 0,
-                "medium": 0,
-                "low": 0,
-                "info": 0,
-                "services": [],
-                "open_ports": [],
-                "vulnerabilities": []
-            }
+        for host in scan_result.hosts:
+            for port in host.open_ports:
+                summary["open_ports"].append(f"{host.address}:{port.portid}/{port.protocol}")
+                summary["services"].append({
+                    "host": host.address,
+                    "port": port.portid,
+                    "name": port.service.name,
+                    "product": port.service.product,
+                    "version": port.service.version
+                })
+        
+        # Each unique vulnerability is listed once, with the places it was found on
+        catalogue = VulnCatalogue()
+        occurrences = []
+        
+        def add_occurrence(vulnerability, occurrence):
+            ref = catalogue.ref(vulnerability)
+            if ref == len(occurrences):
+                occurrences.append([])
+            occurrences[ref].append(occurrence)
+        
+        for host in scan_result.hosts:
+            for port in host.ports:
+                for vulnerability in port.vulnerabilities:
+                    add_occurrence(vulnerability, {
+                        "host": host.address,
+                        "port": port.portid,
+                        "service": port.service.name
+                    })
+        
+        for finding in scan_result.packages:
+            add_occurrence(finding.vulnerability, {
+                "target": finding.target,
+                "package": finding.package,
+                "installed_version": finding.installed_version,
+                "fixed_version": finding.fixed_version,
+                "title": finding.title
+            })
+        
+        for vulnerability, found in zip(catalogue.entries, occurrences):
+            summary["vulnerabilities"].append({
+                "id": vulnerability.id,
+                "cvss": vulnerability.cvss,
+                "severity": vulnerability.severity,
+                "occurrences": found
+            })
+        
+        return summary
     
     def _create_vulnerability_documents(self, vulnerability_data: Dict) -> List[Document]:
         """Create LangChain documents from vulnerability data."""
@@ -180,7 +207,12 @@ class VulnerabilityReportGenerator:
             "high": vulnerability_data['high'],
             "medium": vulnerability_data['medium'],
             "low": vulnerability_data['low'],
-            "info": vulnerability_data['info']
+            "info": vulnerability_data['info'],
+            "unique_vulnerabilities": len(vulnerability_data['vulnerabilities']),
+            "hosts": vulnerability_data['scan_summary']['hosts'],
+            "open_ports": vulnerability_data['scan_summary']['open_ports'],
+            "top_services": vulnerability_data['scan_summary']['top_services'],
+            "top_cves": vulnerability_data['scan_summary']['top_cves']
         }
         
         summary_doc = Document(
@@ -211,28 +243,28 @@ class VulnerabilityReportGenerator:
             # Create separate documents for each severity level
             if critical:
                 critical_doc = Document(
-                    page_content=json.dumps(critical, indent=2),
+                    page_content=json.dumps(critical, separators=(',', ':')),
                     metadata={"source": "critical_vulnerabilities"}
                 )
                 documents.append(critical_doc)
             
             if high:
                 high_doc = Document(
-                    page_content=json.dumps(high, indent=2),
+                    page_content=json.dumps(high, separators=(',', ':')),
                     metadata={"source": "high_vulnerabilities"}
                 )
                 documents.append(high_doc)
             
             if medium:
                 medium_doc = Document(
-                    page_content=json.dumps(medium, indent=2),
+                    page_content=json.dumps(medium, separators=(',', ':')),
                     metadata={"source": "medium_vulnerabilities"}
                 )
                 documents.append(medium_doc)
             
             if low:
                 low_doc = Document(
-                    page_content=json.dumps(low, indent=2),
+                    page_content=json.dumps(low, separators=(',', ':')),
                     metadata={"source": "low_vulnerabilities"}
                 )
                 documents.append(low_doc)
@@ -435,9 +467,10 @@ Remember to:
             
             logger.info(f"Generating LangChain report for {target} ({scan_type})")
             
-            # Extract metadata and vulnerability data
-            metadata = self._extract_metadata(json_path)
-            vulnerability_data = self._extract_vulnerability_summary(json_path)
+            # Extract metadata and vulnerability data from a single parse of the report
+            scan_result = load_scan_result(json_path)
+            metadata = self._extract_metadata(scan_result)
+            vulnerability_data = self._extract_vulnerability_summary(scan_result, load_summary(json_path))
             
             # Create LangChain documents
             documents = self._create_vulnerability_documents(vulnerability_data)
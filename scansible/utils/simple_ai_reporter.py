@@ -11,6 +11,11 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 
+from scansible.core.hostindex import iter_report_hosts
+from scansible.core.rules import get_rule_set
+from scansible.core.summary import load_summary
+from scansible.utils.config import Config
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("scansible.simple_ai_reporter")
@@ -19,81 +24,59 @@ logger = logging.getLogger("scansible.simple_ai_reporter")
 class ReportGenerator:
     """Class to handle the generation of security reports from scan results."""
     
-    def __init__(self):
-        """Initialize the report generator."""
-        pass
+    def __init__(self, rules_dir=None):
+        """Initialize the report generator with the directory of its recommendation rules."""
+        self.rules_dir = Path(rules_dir or Config().get_rules_dir())
         
     def extract_basic_info(self, json_path):
         """Extract basic information from scan results."""
         try:
             logger.info(f"Extracting data from {json_path}")
-            with open(json_path, 'r') as f:
-                data = json.load(f)
             
             scan_info = {
                 'hosts': [],
                 'open_ports': [],
                 'services': [],
-                'os_detection': []
+                'os_detection': [],
+                'recommendations': [],
+                'general_recommendations': [],
+                # Counts and top lists, computed once when the report was written
+                'summary': load_summary(json_path)
             }
             
-            # Process Nmap data
-            if 'nmaprun' in data:
-                nmaprun = data.get('nmaprun', {})
-                hosts = nmaprun.get('host', [])
-                
-                if not isinstance(hosts, list):
-                    hosts = [hosts]
-                
-                for host in hosts:
-                    host_info = {'ip': None, 'ports': []}
-                    
-                    # Get IP
-                    addresses = host.get('address', [])
-                    if not isinstance(addresses, list):
-                        addresses = [addresses]
-                    
-                    for addr in addresses:
-                        if addr.get('@addrtype') == 'ipv4':
-                            host_info['ip'] = addr.get('@addr')
-                    
-                    # Get ports
-                    ports = host.get('ports', {}).get('port', [])
-                    if not isinstance(ports, list):
-                        ports = [ports]
-                    
-                    for port in ports:
-                        if not port:
-                            continue
-                        
-                        port_id = port.get('@portid')
-                        protocol = port.get('@protocol', 'tcp')
-                        state = port.get('state', {}).get('@state')
-                        service = port.get('service', {}).get('@name', 'unknown')
-                        
-                        if state == 'open':
-                            port_info = {
-                                'port': port_id,
-                                'protocol': protocol,
-                                'service': service
-                            }
-                            host_info['ports'].append(port_info)
-                            scan_info['open_ports'].append(f"{port_id}/{protocol}")
-                            scan_info['services'].append(service)
-                    
-                    # OS detection
-                    os_detection = host.get('os', {}).get('osmatch', [])
-                    if not isinstance(os_detection, list):
-                        os_detection = [os_detection]
-                    
-                    for os_match in os_detection:
-                        if os_match and '@name' in os_match:
-                            scan_info['os_detection'].append({
-                                'name': os_match.get('@name'),
-                                'accuracy': os_match.get('@accuracy')
-                            })
+            # Hosts are decoded one at a time through the report's host index
+            def hosts():
+                for host in iter_report_hosts(json_path):
+                    host_info = {'ip': host.address if host.addrtype == 'ipv4' else None, 'ports': []}
+                    
+                    for port in host.open_ports:
+                        host_info['ports'].append({
+                            'port': port.portid,
+                            'protocol': port.protocol,
+                            'service': port.service.name
+                        })
+                        scan_info['open_ports'].append(f"{port.portid}/{port.protocol}")
+                        scan_info['services'].append(port.service.name)
+                    
+                    for name, accuracy in host.os_matches:
+                        scan_info['os_detection'].append({
+                            'name': name,
+                            'accuracy': accuracy
+                        })
                     
                     scan_info['hosts'].append(host_info)
+                    yield host
+            
+            # Recommendation rules are matched in the same pass over the hosts
+            rules = get_rule_set(self.rules_dir)
+            for match in rules.evaluate(hosts()):
+                scan_info['recommendations'].append({
+                    'id': match.rule.id,
+                    'recommendation': match.rule.recommendation,
+                    'severity': match.rule.severity,
+                    'locations': match.locations
+                })
+            scan_info['general_recommendations'] = [rule.recommendation for rule in rules.general]
             
             return scan_info
         
@@ -103,11 +86,20 @@ class ReportGenerator:
                 'hosts': [],
                 'open_ports': [],
                 'services': [],
-                'os_detection': []
+                'os_detection': [],
+                'recommendations': [],
+                'general_recommendations': [],
+                'summary': {}
             }
     
     def generate_basic_report(self, scan_info, target, scan_type):
         """Generate a basic security report."""
+        summary = scan_info.get('summary') or {}
+        vulnerabilities = str(summary.get('vulnerabilities', 0))
+        severities = ", ".join(f"{severity}: {count}" for severity, count in summary.get('severities', {}).items() if count)
+        if severities:
+            vulnerabilities += f" ({severities})"
+        
         report = f"""# Security Scan Report - {target}
 
 ## Scan Information
@@ -116,9 +108,10 @@ class ReportGenerator:
 - **Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 ## Summary
-- **Hosts Scanned:** {len(scan_info['hosts'])}
-- **Open Ports Found:** {len(scan_info['open_ports'])}
-- **Services Detected:** {len(set(scan_info['services']))}
+- **Hosts Scanned:** {summary.get('hosts', 0)}
+- **Open Ports Found:** {summary.get('open_ports', 0)}
+- **Services Detected:** {summary.get('services', 0)}
+- **Vulnerabilities:** {vulnerabilities}
 
 ## Open Ports
 """
@@ -143,46 +136,27 @@ class ReportGenerator:
         else:
             report += "No services detected.\n"
         
-        report += "\n## Security Recommendations\n"
-        
-        # Basic recommendations based on services
-        recommendations = []
-        services_set = set(scan_info['services'])
-        
-        if 'http' in services_set or 'https' in services_set:
-            recommendations.append("- Ensure web servers are patched to the latest version")
-            recommendations.append("- Consider implementing a Web Application Firewall (WAF)")
-            recommendations.append("- Verify that HTTPS is properly configured with strong ciphers")
-        
-        if 'ssh' in services_set:
-            recommendations.append("- Use key-based authentication instead of passwords for SSH")
-            recommendations.append("- Restrict SSH access to specific IP addresses")
-            recommendations.append("- Consider changing the default SSH port")
+        if summary.get('top_cves'):
+            report += "\n## Top Vulnerabilities\n"
+            for cve in summary['top_cves']:
+                report += f"- {cve['id']} (CVSS {cve['cvss']}, {cve['severity'] or 'UNKNOWN'}) - {cve['count']} occurrence(s)\n"
         
-        if 'ftp' in services_set or 'telnet' in services_set:
-            recommendations.append("- Replace FTP/Telnet with more secure alternatives like SFTP/SSH")
-            recommendations.append("- If FTP is necessary, ensure it's properly configured and secured")
-        
-        if 'smb' in services_set:
-            recommendations.append("- Ensure SMB is updated to the latest version")
-            recommendations.append("- Disable SMBv1 protocol")
-            recommendations.append("- Implement proper access controls on SMB shares")
-        
-        # General recommendations
-        general_recommendations = [
-            "- Implement a regular patching schedule for all services",
-            "- Consider using a host-based firewall to restrict access to services",
-            "- Perform regular security scans to identify new vulnerabilities",
-            "- Document all exposed services and justify their necessity"
-        ]
+        report += "\n## Security Recommendations\n"
         
-        if recommendations:
-            for recommendation in recommendations:
-                report += f"{recommendation}\n"
+        # Recommendations of the rules matched against the scan (see scansible/rules)
+        for recommendation in scan_info.get('recommendations', []):
+            line = f"- {recommendation['recommendation']}"
+            if recommendation['severity']:
+                line = f"- **[{recommendation['severity']}]** {recommendation['recommendation']}"
+            locations = recommendation['locations']
+            shown = ", ".join(locations[:5])
+            if len(locations) > 5:
+                shown += f", ... and {len(locations) - 5} more"
+            report += f"{line} ({shown})\n"
         
         report += "\n### General Recommendations\n"
-        for recommendation in general_recommendations:
-            report += f"{recommendation}\n"
+        for recommendation in scan_info.get('general_recommendations', []):
+            report += f"- {recommendation}\n"
         
         report += "\n---\n*This report was automatically generated by Scansible.*"
         
@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.cache import ResultCache, get_result_cache
+
+
+def test_result_cache_ttl_and_eviction(tmp_path):
+    """Teste la clé, l'expiration et l'éviction LRU du cache de résultats."""
+    cache = ResultCache(tmp_path / "results", ttl=60, max_bytes=150)
+    commands = [{'command': 'nmap -sV [target]'}]
+
+    key = cache.make_key("10.0.0.1, Host.Example", commands, "template")
+    assert key == cache.make_key("host.example 10.0.0.1", commands, "template")
+    assert key != cache.make_key("10.0.0.1 host.example", commands, "template v2")
+
+    report = tmp_path / "report.json"
+    report.write_text("x" * 100)
+    cache.put(key, report)
+    assert cache.get(key).read_text() == report.read_text()
+
+    # Une seconde entrée dépasse la taille maximale : la moins récemment utilisée est évincée
+    old_entry = cache.get(key)
+    os.utime(old_entry, (time.time() - 100, time.time() - 100))
+    cache.put("other", report)
+    assert cache.get(key) is None
+    assert cache.get("other") is not None
+
+    expired = ResultCache(tmp_path / "results", ttl=60)
+    (tmp_path / "results" / "other.created").write_text(str(time.time() - 120))
+    assert expired.get("other") is None
+
+
+def test_result_cache_entry_removed_concurrently(tmp_path):
+    """Teste qu'une entrée supprimée par un autre processus est un simple échec de cache, partagé par répertoire."""
+    cache = get_result_cache(tmp_path / "results", ttl=60)
+    assert get_result_cache(tmp_path / "results", ttl=60) is cache
+
+    report = tmp_path / "report.json"
+    report.write_text("{}")
+    cache.put("key", report)
+    (tmp_path / "results" / "key.json").unlink()
+    assert cache.get("key") is None
+
+
+def test_result_cache_entry_evicted_before_copy(tmp_path, monkeypatch):
+    """Teste qu'une entrée évincée entre la recherche et la copie donne un simple échec de cache."""
+    from scansible.core import cache as cache_module
+
+    cache = ResultCache(tmp_path / "results", ttl=60)
+    report = tmp_path / "report.json"
+    report.write_text("{}")
+    cache.put("key", report)
+    assert cache.get_into("key", tmp_path / "hit.json") and (tmp_path / "hit.json").read_text() == "{}"
+
+    real_copy = shutil.copy
+
+    def evicting_copy(source, destination):
+        # Un autre processus supprime l'entrée juste avant la copie
+        Path(source).unlink()
+        return real_copy(source, destination)
+
+    monkeypatch.setattr(cache_module.shutil, "copy", evicting_copy)
+    assert cache.get_into("key", tmp_path / "miss.json") is False
+    assert not (tmp_path / "miss.json").exists()
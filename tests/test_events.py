@@ -0,0 +1,53 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.events import ScanEventBus, format_sse
+
+
+def test_slow_subscriber_is_bounded():
+    """Teste la fusion des statuts et l'abandon des résultats d'hôtes au-delà de la limite."""
+    async def scenario():
+        bus = ScanEventBus(queue_size=3)
+        followed = bus.subscribe("scan-1")
+        everything = bus.subscribe()
+
+        bus.publish_status("scan-1", {"status": "running", "percent": 10})
+        for index in range(4):
+            bus.publish("host", "scan-1", {"scan_id": "scan-1", "address": f"10.0.0.{index}"})
+        bus.publish_status("scan-1", {"percent": 60, "current_task": "nmap"})
+        bus.publish_status("scan-2", {"status": "running"})
+
+        events = await followed.get(1)
+        assert events[0] == ("dropped", {"count": 2})
+        assert [kind for kind, _ in events[1:]] == ["host", "host", "status"]
+        assert events[-1][1] == {"id": "scan-1", "status": "running", "percent": 60, "current_task": "nmap"}
+
+        # Le statut d'un scan n'est jamais abandonné au profit des hôtes
+        assert [data.get("id") for kind, data in await everything.get(1) if kind == "status"] == ["scan-1", "scan-2"]
+        assert await followed.get(0.01) == []
+
+        bus.unsubscribe(followed)
+        bus.unsubscribe(everything)
+        assert len(bus) == 0
+
+    asyncio.run(scenario())
+
+
+def test_events_from_worker_threads():
+    """Teste la réception d'événements publiés depuis un thread de scan."""
+    async def scenario():
+        bus = ScanEventBus()
+        subscription = bus.subscribe()
+        worker = threading.Thread(target=bus.publish_status, args=("scan-1", {"status": "completed"}))
+        worker.start()
+        events = await subscription.get(5)
+        worker.join()
+        return events
+
+    assert asyncio.run(scenario()) == [("status", {"id": "scan-1", "status": "completed"})]
+    assert format_sse("status", {"id": "scan-1"}) == 'event: status\ndata: {"id":"scan-1"}\n\n'
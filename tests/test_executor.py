@@ -0,0 +1,81 @@
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.executor import CommandExecutor
+from scansible.core.merge import merge_nmap_xml
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def _nmap_xml(addr):
+    return f"""<?xml version="1.0"?>
+<nmaprun scanner="nmap" args="nmap {addr}">
+<host><status state="up"/><address addr="{addr}" addrtype="ipv4"/></host>
+<runstats><finished time="10" timestr="t" elapsed="1.50"/><hosts up="1" down="0" total="1"/></runstats>
+</nmaprun>
+"""
+
+
+def test_executor_runs_commands_concurrently():
+    """Teste que les commandes indépendantes s'exécutent en parallèle."""
+    task = {'name': 'sleep', 'command': f'{sys.executable} -c "import time; time.sleep(0.5)"'}
+    start = time.time()
+    results = CommandExecutor(max_workers=3).run([dict(task) for _ in range(3)])
+    assert time.time() - start < 1.4
+    assert all(result['success'] for result in results)
+
+
+def test_merge_nmap_xml(tmp_path):
+    """Teste la fusion de plusieurs rapports XML nmap."""
+    paths = []
+    for index, addr in enumerate(["10.0.0.1", "10.0.0.2"]):
+        path = tmp_path / f"part_{index}.xml"
+        path.write_text(_nmap_xml(addr))
+        paths.append(path)
+
+    merged = merge_nmap_xml(paths, tmp_path / "merged.xml")
+    content = merged.read_text()
+    assert "10.0.0.1" in content and "10.0.0.2" in content
+    assert 'total="2"' in content
+    assert content.index("10.0.0.2") < content.index("<runstats>")
+
+
+def test_run_serial_stops_at_first_failure():
+    """Teste que l'exécution en série s'arrête à la première commande en échec."""
+    tasks = [{'name': 'ok', 'command': 'true'}, {'name': 'ko', 'command': 'false'}, {'name': 'skipped', 'command': 'true'}]
+    results = CommandExecutor(max_workers=1).run_serial(tasks)
+    assert [result['success'] for result in results] == [True, False]
+
+
+def test_direct_commands_merge_outputs(tmp_path, monkeypatch):
+    """Teste le choix du backend et la fusion des sorties des commandes lancées directement."""
+    for name in ("REPORTS_DIR", "SCANS_DIR", "CACHE_DIR"):
+        monkeypatch.setenv(f"SCANSIBLE_{name}", str(tmp_path / name.lower()))
+    from scansible.core.scanner import Scanner
+
+    # Un faux nmap écrit un hôte différent selon le type de scan demandé
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    hosts = {index: HOST_XML.format(index=index) for index in (5, 6)}
+    (bin_dir / "nmap").write_text(f"""#!{sys.executable}
+import sys
+hosts = {hosts!r}
+index = 5 if '-sV' in sys.argv else 6
+open(sys.argv[sys.argv.index('-oX') + 1], 'w').write({NMAP_XML!r}.format(hosts=hosts[index], count=1))
+""")
+    (bin_dir / "nmap").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:/usr/bin:/bin")
+
+    scanner = Scanner()
+    assert scanner.resolve_executor('auto', None) == 'direct'
+    assert scanner.resolve_executor(None, 'inventory.ini') == 'ansible'
+    assert scanner.resolve_executor('ansible', None) == 'ansible'
+
+    commands = [{'name': 'Version', 'command': 'nmap -sV [target]'}, {'name': 'UDP', 'command': 'nmap -sU [target]'}]
+    success, xml_path = scanner.run_direct_commands(commands, "10.0.0.5", tmp_path)
+    content = Path(xml_path).read_text()
+    assert success and "10.0.0.5" in content and "10.0.0.6" in content
+    assert 'total="2"' in content
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.hostindex import (
+    NMAP_JSON_LAYOUT, HostIndex, forget_host_index, get_host_index, index_entry, index_path, iter_report_hosts,
+    save_host_index
+)
+from scansible.core.ingest import ingest_nmap_xml
+from scansible.core.model import parse_nmap_host, to_record
+from scansible.core.ndjson import convert_nmap_xml_to_ndjson
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def _xml_report(tmp_path, count):
+    xml_path = tmp_path / f"scan_{count}.xml"
+    xml_path.write_text(NMAP_XML.format(
+        hosts="\n".join(HOST_XML.format(index=index) for index in range(1, count + 1)), count=count))
+    return xml_path
+
+
+def test_index_reads_single_hosts_from_json_report(tmp_path):
+    """Teste l'accès direct à un hôte d'un rapport JSON via l'index des décalages."""
+    for count in (1, 3):
+        json_path = tmp_path / f"report_{count}.json"
+        records = []
+        spans = []
+        ingest_nmap_xml(_xml_report(tmp_path, count), json_path, on_host=records.append, spans=spans)
+        hosts = [parse_nmap_host(record) for record in records]
+        save_host_index(json_path, NMAP_JSON_LAYOUT,
+                        [index_entry(host, offset, length) for host, (offset, length) in zip(hosts, spans)])
+
+        index = HostIndex.open(json_path)
+        assert len(index) == count
+        assert index.summaries(0, 1) == [{"address": "10.0.0.1", "status": "up", "hostnames": [],
+                                          "open_ports": ["22/tcp"], "vulnerabilities": 2, "severity": "CRITICAL"}]
+        assert to_record(index.read_host(f"10.0.0.{count}")) == to_record(hosts[-1])
+        assert index.read_host("10.0.0.99") is None
+        index.close()
+
+        # Sans index (ou avec un index périmé), il est reconstruit en une lecture du rapport
+        written = json.loads(index_path(json_path).read_text())
+        index_path(json_path).unlink()
+        assert json.loads(json.dumps(HostIndex.open(json_path).entries)) == written["hosts"]
+
+
+def test_index_written_with_ndjson_report(tmp_path):
+    """Teste que le rapport NDJSON est indexé à l'écriture, sauf s'il est compressé."""
+    xml_path = _xml_report(tmp_path, 3)
+    convert_nmap_xml_to_ndjson(xml_path, tmp_path / "report.ndjson")
+    convert_nmap_xml_to_ndjson(xml_path, tmp_path / "report.ndjson.gz")
+
+    index = HostIndex.open(tmp_path / "report.ndjson")
+    assert [host.address for host in index.iter_hosts(1, 2)] == ["10.0.0.2", "10.0.0.3"]
+    assert HostIndex.open(tmp_path / "report.ndjson.gz") is None
+    assert len(list(iter_report_hosts(tmp_path / "report.ndjson.gz"))) == 3
+
+
+def test_shared_index_reopened_when_report_changes(tmp_path):
+    """Teste que l'index partagé entre les requêtes n'est rechargé qu'après une réécriture du rapport."""
+    report_path = tmp_path / "report.ndjson"
+    convert_nmap_xml_to_ndjson(_xml_report(tmp_path, 2), report_path)
+    index = get_host_index(report_path)
+    assert get_host_index(report_path) is index and len(index) == 2
+
+    convert_nmap_xml_to_ndjson(_xml_report(tmp_path, 3), report_path)
+    os.utime(index_path(report_path), (os.path.getmtime(report_path) + 1,) * 2)
+    assert len(get_host_index(report_path)) == 3
+
+    forget_host_index(report_path)
+    assert get_host_index(report_path) is not index
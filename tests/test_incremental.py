@@ -0,0 +1,89 @@
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.incremental import (
+    build_incremental_report, detect_changes, restrict_ports, sweep_ports, template_port_selection
+)
+
+
+def _report(hosts, starttime="100"):
+    body = ""
+    for address, ports in hosts.items():
+        port_xml = "".join(
+            f'<port protocol="tcp" portid="{port}"><state state="open"/>'
+            f'<service name="{name}" product="{product}" version="{version}"/>{extra}</port>'
+            for port, (name, product, version, extra) in ports.items()
+        )
+        body += (f'<host starttime="{starttime}"><status state="up"/>'
+                 f'<address addr="{address}" addrtype="ipv4"/><ports>{port_xml}</ports></host>')
+    return ET.fromstring(f'<nmaprun>{body}<runstats><hosts up="0" down="0" total="{len(hosts)}"/></runstats></nmaprun>')
+
+
+def test_incremental_report_carries_unchanged_findings():
+    """Teste que seuls les ports modifiés sont rescannés et que le reste est repris."""
+    vulners = '<script id="vulners"/>'
+    previous = _report({
+        "10.0.0.1": {"22": ("ssh", "OpenSSH", "8.2", vulners), "80": ("http", "Apache", "2.4.41", "")},
+        "10.0.0.2": {"22": ("ssh", "OpenSSH", "8.2", vulners)},
+    })
+    sweep = _report({
+        "10.0.0.1": {"22": ("ssh", "OpenSSH", "8.2", ""), "80": ("http", "Apache", "2.4.57", ""),
+                     "443": ("https", "nginx", "1.25", "")},
+        "10.0.0.2": {"22": ("ssh", "OpenSSH", "8.2", "")},
+    }, starttime="200")
+
+    changed, unchanged = detect_changes(previous, sweep)
+    assert changed == {"10.0.0.1": ["80", "443"]}
+    assert unchanged == {"10.0.0.1": [("tcp", "22")], "10.0.0.2": [("tcp", "22")]}
+
+    deep = _report({"10.0.0.1": {"80": ("http", "Apache", "2.4.57", ""),
+                                 "443": ("https", "nginx", "1.25", "")}}, starttime="300")
+    report = build_incremental_report(sweep, deep, previous, unchanged)
+
+    hosts = report.findall("host")
+    first = hosts[0]
+    assert first.get("starttime") == "300"
+    assert [port.get("portid") for port in first.findall("ports/port")] == ["80", "443", "22"]
+    assert first.find("ports/port[@portid='22']/script").get("id") == "vulners"
+    assert first.find("ports/port[@portid='22']").get("scansible_carried_from") == "100"
+    assert hosts[1].get("starttime") == "100"
+    assert report.find("runstats/hosts").get("up") == "2"
+
+
+def test_restrict_ports():
+    """Teste le remplacement de la sélection de ports d'une commande nmap."""
+    assert restrict_ports("nmap -F --script vulners [target]", "80,443") == "nmap --script vulners -p 80,443 [target]"
+    assert restrict_ports('nmap -p80,443 -sV --script "http-*" [target]', "8080") == \
+        "nmap -sV --script 'http-*' -p 8080 [target]"
+
+
+def test_previously_open_high_port_is_swept_and_carried_forward(tmp_path):
+    """Teste qu'un port haut trouvé par un scan plus large est balayé puis repris sans être rescanné."""
+    vulners = '<script id="vulners"/>'
+    previous = _report({"10.0.0.1": {"22": ("ssh", "OpenSSH", "8.2", vulners), "50000": ("http", "Jetty", "9.4", vulners)}})
+    services = tmp_path / "nmap-services"
+    services.write_text("# nmap-services\nhttp\t80/tcp\t0.48\nssh\t22/tcp\t0.18\nhttps\t443/tcp\t0.20\ndomain\t53/udp\t0.21\n")
+
+    commands = [{'command': "nmap -sV --top-ports 2 --script vulners [target]"}, {'command': "nmap -sV -p 8080,9000-9001 [target]"}]
+    assert template_port_selection(commands) == ({8080, 9000, 9001}, 2)
+    assert sweep_ports(commands, previous, services) == "22,80,443,8080,9000-9001,50000"
+    assert sweep_ports([{'command': "nmap -sV -p- [target]"}], previous, services) == "1-65535"
+
+    # Le balayage sans -sV ne connaît que le nom de service déduit du numéro de port
+    sweep = ET.fromstring(
+        '<nmaprun><host starttime="200"><status state="up"/><address addr="10.0.0.1" addrtype="ipv4"/><ports>'
+        '<port protocol="tcp" portid="22"><state state="open"/><service name="ssh" method="table"/></port>'
+        '<port protocol="tcp" portid="8080"><state state="open"/><service name="http-proxy" method="table"/></port>'
+        '<port protocol="tcp" portid="50000"><state state="open"/><service name="ibm-db2" method="table"/></port>'
+        '</ports></host><runstats><hosts up="1" down="0" total="1"/></runstats></nmaprun>')
+    changed, unchanged = detect_changes(previous, sweep)
+    assert changed == {"10.0.0.1": ["8080"]}
+    assert unchanged == {"10.0.0.1": [("tcp", "22"), ("tcp", "50000")]}
+
+    report = build_incremental_report(sweep, None, previous, unchanged)
+    carried = report.find("host/ports/port[@portid='50000']")
+    assert carried.find("script").get("id") == "vulners" and carried.find("service").get("product") == "Jetty"
@@ -0,0 +1,47 @@
+import json
+import sys
+from pathlib import Path
+
+import xmltodict
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.ingest import ingest_nmap_xml, iter_nmap_hosts
+
+NMAP_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE nmaprun>
+<nmaprun scanner="nmap" args="nmap -sV 10.0.0.0/30" version="7.94">
+<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>
+<verbose level="0"/>
+<hosthint><status state="up" reason="arp-response"/><address addr="10.0.0.1" addrtype="ipv4"/></hosthint>
+{hosts}
+<runstats><finished time="1700000000" elapsed="12.5"/><hosts up="{count}" down="0" total="{count}"/></runstats>
+</nmaprun>
+"""
+
+HOST_XML = """<host starttime="1700000000"><status state="up" reason="syn-ack"/>
+<address addr="10.0.0.{index}" addrtype="ipv4"/>
+<ports><port protocol="tcp" portid="22"><state state="open" reason="syn-ack"/>
+<service name="ssh" product="OpenSSH" version="8.9p1"><cpe>cpe:/a:openbsd:openssh:8.9p1</cpe></service>
+<script id="vulners" output="&#xa;  cpe:/a:openbsd:openssh:8.9p1"><table key="cpe:/a:openbsd:openssh:8.9p1">
+<table><elem key="id">CVE-2023-38408</elem><elem key="cvss">9.8</elem></table>
+<table><elem key="id">CVE-2023-28531</elem><elem key="cvss">9.8</elem></table>
+</table></script></port>
+<port protocol="tcp" portid="80"><state state="closed" reason="reset"/></port></ports></host>"""
+
+
+def test_ingest_matches_xmltodict(tmp_path):
+    """Teste que l'ingestion en flux produit le même JSON que xmltodict."""
+    for count in (1, 3):
+        xml_path = tmp_path / f"scan_{count}.xml"
+        xml_path.write_text(NMAP_XML.format(
+            hosts="\n".join(HOST_XML.format(index=index) for index in range(1, count + 1)), count=count))
+        json_path = tmp_path / f"scan_{count}.json"
+
+        seen = []
+        assert ingest_nmap_xml(xml_path, json_path, on_host=seen.append) == count
+        assert json.loads(json_path.read_text()) == xmltodict.parse(xml_path.read_text())
+        assert len(seen) == count
+        assert [host['address']['@addr'] for host in iter_nmap_hosts(xml_path)] == \
+            [f"10.0.0.{index}" for index in range(1, count + 1)]
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+import yaml
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.inventory import assign_targets, load_inventory_hosts
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def test_load_inventory_and_assign_targets(tmp_path):
+    """Teste la lecture de l'inventaire et la répartition des cibles entre les nœuds."""
+    inventory = tmp_path / "inventory.ini"
+    inventory.write_text("[scanners]\nnode1 ansible_host=127.0.0.1\nnode2\n\n[other]\ndb1\n")
+
+    nodes = load_inventory_hosts(str(inventory), "scanners")
+    assert nodes == ["node1", "node2"]
+
+    assignments = assign_targets("10.0.0.0/23", nodes)
+    assert assignments == {"node1": "10.0.0.0/24", "node2": "10.0.1.0/24"}
+
+
+def test_distributed_playbook_fetches_reports(tmp_path, monkeypatch):
+    """Teste que le playbook distribué scanne chaque part et rapatrie les rapports."""
+    monkeypatch.setenv("SCANSIBLE_REPORTS_DIR", str(tmp_path / "reports"))
+    monkeypatch.setenv("SCANSIBLE_SCANS_DIR", str(tmp_path / "scans"))
+    from scansible.core.scanner import Scanner
+
+    commands = [{'name': 'Scan', 'command': 'nmap -sV [target]', 'tags': ['version']}]
+    work_dir = tmp_path / "scans" / "scan-1"
+    work_dir.mkdir(parents=True)
+    playbook_path, fetched_reports = Scanner().generate_distributed_playbook(
+        commands, {"node1": "10.0.0.0/24", "node2": "10.0.1.0/24"}, "basic", work_dir)
+
+    play = yaml.safe_load(playbook_path.read_text())[0]
+    assert play['hosts'] == "node1:node2"
+    assert play['vars']['scan_shards']['node2'] == "10.0.1.0/24"
+    assert "{{ scan_shards[inventory_hostname] }}" in play['tasks'][1]['command']
+    assert play['tasks'][2]['fetch']['src'].startswith("/tmp/scansible_scan-1/")
+    assert fetched_reports == [work_dir / "fetched" / node / "scan_report_0.xml" for node in ("node1", "node2")]
+
+
+def _no_ansible_inventory(*args, **kwargs):
+    raise FileNotFoundError("ansible-inventory")
+
+
+def test_distributed_scan_keeps_reports_of_healthy_nodes(tmp_path, monkeypatch):
+    """Teste qu'un nœud en échec n'empêche pas la fusion des rapports des autres nœuds."""
+    monkeypatch.setenv("SCANSIBLE_REPORTS_DIR", str(tmp_path / "reports"))
+    monkeypatch.setenv("SCANSIBLE_SCANS_DIR", str(tmp_path / "scans"))
+    from scansible.core.scanner import Scanner
+
+    inventory = tmp_path / "inventory.ini"
+    inventory.write_text("[scanners]\nnode1\nnode2\n")
+    monkeypatch.setattr("scansible.core.inventory.subprocess.run", _no_ansible_inventory)
+
+    def execute_ansible_playbook(self, playbook_path, inventory=None, forks=None):
+        # node2 est injoignable : seul node1 renvoie son rapport et ansible-playbook échoue
+        fetched = playbook_path.parent / "fetched" / "node1"
+        fetched.mkdir(parents=True)
+        (fetched / "scan_report_0.xml").write_text(NMAP_XML.format(hosts=HOST_XML.format(index=1), count=1))
+        return False
+
+    monkeypatch.setattr(Scanner, "execute_ansible_playbook", execute_ansible_playbook)
+    scanner = Scanner()
+    work_dir = tmp_path / "scans" / "scan-1"
+    work_dir.mkdir(parents=True)
+    success, xml_path = scanner.run_distributed_scan(
+        [{'name': 'Scan', 'command': 'nmap -sV [target]'}], "10.0.0.0/23", "basic", str(inventory), work_dir, "scanners")
+
+    assert success and "10.0.0.1" in Path(xml_path).read_text()
+    assert scanner.missing_nodes == ["node2"]
+
+    play = yaml.safe_load((work_dir / "basic_distributed_playbook.yml").read_text())[0]
+    assert play['ignore_unreachable'] and all(task['ignore_errors'] for task in play['tasks'][1:3])
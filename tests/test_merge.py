@@ -0,0 +1,113 @@
+import json
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.ingest import iter_nmap_hosts
+from scansible.core.merge import merge_nmap_xml, merge_trivy_json
+from scansible.core.model import parse_nmap_host
+from scansible.core.trivy import iter_trivy_findings
+
+VULNERS = """<script id="vulners" output="{output}">
+<table key="cpe:/a:openbsd:openssh:8.2p1">
+<table><elem key="id">CVE-2023-38408</elem><elem key="cvss">9.8</elem><elem key="type">cve</elem></table>
+</table>
+</script>"""
+
+
+def _nmap_report(path, ports, up="1", total="1"):
+    path.write_text(f"""<?xml version="1.0"?>
+<nmaprun scanner="nmap">
+<host><status state="up"/><address addr="10.0.0.1" addrtype="ipv4"/><ports>{ports}</ports></host>
+<runstats><finished time="10" elapsed="1.00"/><hosts up="{up}" down="0" total="{total}"/></runstats>
+</nmaprun>
+""")
+    return path
+
+
+def test_merge_deduplicates_hosts_ports_and_scripts(tmp_path):
+    """Teste qu'un hôte vu par deux commandes n'apparaît qu'une fois, avec le service le plus détaillé."""
+    quick = _nmap_report(tmp_path / "quick.xml", """
+<port protocol="tcp" portid="22"><state state="filtered"/><service name="ssh"/>{}</port>
+""".format(VULNERS.format(output="short")))
+    deep = _nmap_report(tmp_path / "deep.xml", """
+<port protocol="tcp" portid="22"><state state="open"/><service name="ssh" product="OpenSSH" version="8.2p1"/>{}</port>
+<port protocol="tcp" portid="80"><state state="open"/><service name="http"/></port>
+""".format(VULNERS.format(output="a much longer output")))
+
+    merged = merge_nmap_xml([quick, deep], tmp_path / "merged.xml", extra_ports={"10.0.0.1": [22, 443]})
+    root = ET.parse(merged).getroot()
+
+    hosts = root.findall("host")
+    assert len(hosts) == 1
+    ports = {port.get("portid"): port for port in hosts[0].find("ports")}
+    assert sorted(ports, key=int) == ["22", "80", "443"]
+    assert ports["22"].find("state").get("state") == "open"
+    assert ports["22"].find("service").get("product") == "OpenSSH"
+    assert [script.get("output") for script in ports["22"].findall("script")] == ["a much longer output"]
+    assert ports["443"].find("state").get("reason") == "rustscan"
+    # Les deux rapports ont scanné la même cible : les compteurs ne s'additionnent pas
+    assert root.find("runstats/hosts").attrib == {"up": "1", "down": "0", "total": "1"}
+
+    host = parse_nmap_host(next(iter_nmap_hosts(merged)))
+    assert [vuln.id for vuln in host.ports[0].vulnerabilities] == ["CVE-2023-38408"]
+
+
+def test_merge_keeps_longest_output_of_a_repeated_script(tmp_path):
+    """Teste un identifiant de script répété dans le même port d'un rapport fusionné."""
+    quick = _nmap_report(tmp_path / "quick.xml", """
+<port protocol="tcp" portid="22"><state state="open"/><service name="ssh"/>{}</port>
+""".format(VULNERS.format(output="short")))
+    deep = _nmap_report(tmp_path / "deep.xml", """
+<port protocol="tcp" portid="22"><state state="open"/><service name="ssh"/>{}{}{}</port>
+""".format(*(VULNERS.format(output=output) for output in ["longer output", "the longest output of all", "tiny"])))
+
+    root = ET.parse(merge_nmap_xml([quick, deep], tmp_path / "merged.xml")).getroot()
+    port = root.find("host/ports/port")
+    assert [script.get("output") for script in port.findall("script")] == ["the longest output of all"]
+
+
+def test_merge_rustscan_ports_without_nmap(tmp_path):
+    """Teste qu'un rapport est créé à partir des seuls ports ouverts trouvés par rustscan."""
+    merged = merge_nmap_xml([], tmp_path / "merged.xml", extra_ports={"10.0.0.2": [8080]})
+    host = parse_nmap_host(next(iter_nmap_hosts(merged)))
+    assert host.address == "10.0.0.2" and host.status == "up"
+    assert [(port.portid, port.state) for port in host.ports] == [("8080", "open")]
+
+
+def test_merge_trivy_deduplicates_findings(tmp_path):
+    """Teste la fusion de rapports Trivy : une vulnérabilité de paquet n'est listée qu'une fois par cible."""
+    def vuln(cve):
+        return {"VulnerabilityID": cve, "PkgName": "openssl", "InstalledVersion": "3.0.1", "Severity": "HIGH"}
+
+    paths = []
+    for index, cves in enumerate([["CVE-1", "CVE-2"], ["CVE-2", "CVE-3"]]):
+        path = tmp_path / f"trivy_{index}.json"
+        path.write_text(json.dumps({"SchemaVersion": 2, "Results": [
+            {"Target": "alpine:3.18", "Vulnerabilities": [vuln(cve) for cve in cves]}]}))
+        paths.append(path)
+
+    merged = merge_trivy_json(paths, tmp_path / "merged.json")
+    assert [finding.vulnerability.id for finding in iter_trivy_findings(merged)] == ["CVE-1", "CVE-2", "CVE-3"]
+
+
+def test_merge_trivy_streams_kubernetes_reports(tmp_path):
+    """Teste la fusion en flux de rapports k8s et d'images, en ignorant un rapport illisible."""
+    vuln = {"VulnerabilityID": "CVE-9", "PkgName": "busybox", "InstalledVersion": "1.36", "Severity": "LOW"}
+    resource = {"Namespace": "default", "Kind": "Deployment", "Name": "web",
+                "Results": [{"Target": "nginx:1.25", "Vulnerabilities": [vuln]}]}
+    cluster = tmp_path / "cluster.json"
+    cluster.write_text(json.dumps({"ClusterName": "prod", "Resources": [resource, resource]}))
+    image = tmp_path / "image.json"
+    image.write_text(json.dumps({"SchemaVersion": 2, "Results": [{"Target": "nginx:1.25", "Vulnerabilities": [vuln]}]}))
+    broken = tmp_path / "broken.json"
+    broken.write_text("")
+
+    merged = merge_trivy_json([cluster, broken, image], tmp_path / "merged.json")
+    report = json.loads(merged.read_text())
+    # La même ressource listée deux fois n'apporte rien de plus ; l'image est une autre cible
+    assert [entry["Results"] for entry in report["Resources"]] == [resource["Results"], []]
+    assert report["Results"] == [{"Target": "nginx:1.25", "Vulnerabilities": [vuln]}]
@@ -0,0 +1,85 @@
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.ingest import ingest_nmap_xml
+from scansible.core.model import ScanResultWriter, load_scan_result, model_path
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def test_scan_result_model_and_cache(tmp_path):
+    """Teste le modèle normalisé d'un rapport nmap et son cache à côté du rapport."""
+    xml_path = tmp_path / "scan.xml"
+    xml_path.write_text(NMAP_XML.format(hosts=HOST_XML.format(index=1), count=1))
+    json_path = tmp_path / "report.json"
+    ingest_nmap_xml(xml_path, json_path)
+
+    result = load_scan_result(json_path)
+    assert model_path(json_path).exists()
+    host = result.hosts[0]
+    assert (host.address, [port.portid for port in host.open_ports]) == ("10.0.0.1", ["22"])
+    assert host.open_ports[0].service.product == "OpenSSH"
+    assert result.metadata['nmap_version'] == "7.94"
+    assert result.severity_counts()['CRITICAL'] == 2
+
+    # Le modèle en cache est relu tel quel
+    cached = load_scan_result(json_path)
+    assert [vuln.id for _, _, vuln in cached.iter_vulnerabilities()] == ["CVE-2023-38408", "CVE-2023-28531"]
+
+
+def test_scan_result_from_trivy_report(tmp_path):
+    """Teste le modèle normalisé d'un rapport Trivy."""
+    report_path = tmp_path / "trivy.json"
+    report_path.write_text(json.dumps({"Results": [{"Target": "alpine:3.18", "Vulnerabilities": [
+        {"VulnerabilityID": "CVE-2024-0001", "PkgName": "openssl", "Severity": "HIGH",
+         "CVSS": {"nvd": {"V3Score": 7.5}}},
+        {"VulnerabilityID": "CVE-2024-0002", "PkgName": "zlib", "Severity": "negligible"},
+    ]}]}))
+
+    result = load_scan_result(report_path)
+    counts = result.severity_counts()
+    assert (counts['HIGH'], counts['UNKNOWN']) == (1, 1)
+    assert result.packages[0].vulnerability.cvss == 7.5
+
+
+def test_vulnerability_catalogue_shared_across_hosts(tmp_path):
+    """Teste que chaque vulnérabilité est stockée une seule fois et référencée par son indice."""
+    xml_path = tmp_path / "scan.xml"
+    xml_path.write_text(NMAP_XML.format(
+        hosts="\n".join(HOST_XML.format(index=index) for index in range(1, 4)), count=3))
+    json_path = tmp_path / "report.json"
+    ingest_nmap_xml(xml_path, json_path)
+
+    result = load_scan_result(json_path)
+    first, *others = [list(host.ports[0].vulnerabilities) for host in result.hosts]
+    assert all(vulns[0] is first[0] and vulns[1] is first[1] for vulns in others)
+    assert result.severity_counts()['CRITICAL'] == 6
+
+    cached = json.loads(model_path(json_path).read_text())
+    assert [entry[0] for entry in cached['catalogue']] == ["CVE-2023-38408", "CVE-2023-28531"]
+    assert cached['hosts'][2][4][0][4][0][2] == [0, 1]
+
+    # Le catalogue est propre à chaque chargement : rien ne s'accumule d'un rapport à l'autre dans le processus
+    reloaded = load_scan_result(json_path)
+    vulns = [host.ports[0].scripts[0].vulnerabilities[0] for host in reloaded.hosts]
+    assert vulns[0] is vulns[1] is vulns[2]
+    assert vulns[0] is not first[0] and vulns[0].key() == first[0].key()
+
+
+def test_model_written_one_host_at_a_time(tmp_path):
+    """Teste que le modèle écrit hôte par hôte est identique au modèle écrit d'un bloc."""
+    xml_path = tmp_path / "scan.xml"
+    xml_path.write_text(NMAP_XML.format(
+        hosts="\n".join(HOST_XML.format(index=index) for index in range(1, 4)), count=3))
+    json_path = tmp_path / "report.json"
+    ingest_nmap_xml(xml_path, json_path)
+    result = load_scan_result(json_path)
+
+    writer = ScanResultWriter(tmp_path / "streamed.json", 'nmap')
+    for host in result.hosts:
+        writer.add_host(host)
+    writer.finish(result.metadata)
+    assert json.loads(model_path(tmp_path / "streamed.json").read_text()) == result.to_dict()
@@ -0,0 +1,41 @@
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.ingest import ingest_nmap_xml
+from scansible.core.model import load_scan_result
+from scansible.core.ndjson import convert_nmap_xml_to_ndjson, iter_ndjson_hosts, read_ndjson_header
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def test_ndjson_report_roundtrip(tmp_path):
+    """Teste le format NDJSON (compressé ou non) : en-tête, un hôte par ligne, relecture en flux."""
+    xml_path = tmp_path / "scan.xml"
+    xml_path.write_text(NMAP_XML.format(
+        hosts="\n".join(HOST_XML.format(index=index) for index in range(1, 4)), count=3))
+    json_path = tmp_path / "report.json"
+    ingest_nmap_xml(xml_path, json_path)
+
+    for name in ("report.ndjson", "report.ndjson.gz"):
+        ndjson_path = tmp_path / name
+        seen = []
+        assert convert_nmap_xml_to_ndjson(xml_path, ndjson_path, on_host=seen.append) == 3
+        assert len(seen) == 3
+        assert read_ndjson_header(ndjson_path)['metadata']['nmap_version'] == "7.94"
+        assert [host.address for host in iter_ndjson_hosts(ndjson_path)] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+        # Les lecteurs obtiennent le même modèle qu'avec le rapport JSON
+        result = load_scan_result(ndjson_path)
+        assert result.severity_counts() == load_scan_result(json_path).severity_counts()
+        assert result.hosts[0].open_ports[0].service.product == "OpenSSH"
+
+    ndjson_lines = (tmp_path / "report.ndjson").read_text().splitlines()
+    # Les vulnérabilités sont définies une seule fois, avant le premier hôte qui les cite
+    assert len(ndjson_lines) == 5 and len(json.loads(ndjson_lines[1])['vulns']) == 2
+    records = [json.loads(line) for line in ndjson_lines[2:]]
+    assert [record['address'] for record in records] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert all(record['ports'][0]['scripts'][0]['vulnerabilities'] == [0, 1] for record in records)
+    assert (tmp_path / "report.ndjson.gz").stat().st_size * 3 < json_path.stat().st_size
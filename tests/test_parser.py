@@ -0,0 +1,44 @@
+import os
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.parser import TemplateIndex, TemplateParser
+
+TEMPLATE = """# Scan de test
+
+* Scan SSH
+        * `nmap -p 22 [target]`
+        * Description: Port SSH
+        * Tags: #ssh #quick
+
+* Scan Web
+        * `nmap -p 80,443 [target]`
+        * Tags: #http #quick
+"""
+
+
+def test_template_index_filters_and_invalidation(tmp_path):
+    """Teste l'index des templates : filtrage par tag, persistance et invalidation par mtime."""
+    templates_dir = tmp_path / "templates"
+    templates_dir.mkdir()
+    template_path = templates_dir / "demo_scan.md"
+    template_path.write_text(TEMPLATE)
+    cache_path = tmp_path / "templates.json"
+
+    index = TemplateIndex(templates_dir, cache_path)
+    assert [cmd['name'] for cmd in index.get_commands("demo", ["http", "ssh"])] == ["Scan SSH", "Scan Web"]
+    assert [cmd['name'] for cmd in index.get_commands("demo", ["http"])] == ["Scan Web"]
+    assert index.get_commands("demo") == TemplateParser.parse_commands_from_template(TEMPLATE)
+    assert index.all_tags() == {"ssh", "http", "quick"}
+
+    # Un nouvel index repart du fichier persisté sans relire le template
+    reloaded = TemplateIndex(templates_dir, cache_path)
+    assert reloaded.get_content("demo") == TEMPLATE
+
+    template_path.write_text(TEMPLATE.replace("#ssh", "#ssh #remote"))
+    os.utime(template_path, (0, 1))
+    assert "remote" in reloaded.all_tags()
+    assert index.get_commands("missing") == []
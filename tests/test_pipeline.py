@@ -0,0 +1,103 @@
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.pipeline import group_hosts_by_ports, parse_nmap_greppable, parse_rustscan_greppable
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+COMMANDS = [
+    {'name': "Discovery", 'command': "rustscan -a [target] -g", 'tags': ['discovery']},
+    {'name': "Fallback discovery", 'command': "nmap -p- --open [target] -oG -", 'tags': ['discovery']},
+    {'name': "Deep", 'command': "nmap -sV -p [ports] [target]", 'tags': []},
+]
+
+
+def test_parse_discovery_output():
+    """Teste l'analyse des sorties de découverte RustScan et Nmap."""
+    rustscan = "10.0.0.1 -> [22,80]\n10.0.0.2 -> [22,80]\n10.0.0.3 -> [443]\n"
+    assert parse_rustscan_greppable(rustscan) == {"10.0.0.1": [22, 80], "10.0.0.2": [22, 80], "10.0.0.3": [443]}
+
+    nmap = (
+        "# Nmap 7.94 scan initiated\n"
+        "Host: 10.0.0.1 ()\tStatus: Up\n"
+        "Host: 10.0.0.1 ()\tPorts: 22/open/tcp//ssh///, 25/closed/tcp//smtp///, 80/open/tcp//http///"
+        "\tIgnored State: filtered (997)\n"
+    )
+    assert parse_nmap_greppable(nmap) == {"10.0.0.1": [22, 80]}
+
+    groups = group_hosts_by_ports(parse_rustscan_greppable(rustscan))
+    assert groups == {"22,80": ["10.0.0.1", "10.0.0.2"], "443": ["10.0.0.3"]}
+
+
+def _pipeline_scanner(monkeypatch, tmp_path, discovered, installed):
+    """Crée un Scanner dont l'exécuteur est remplacé et renvoie la liste des commandes lancées."""
+    for name in ("REPORTS_DIR", "SCANS_DIR", "CACHE_DIR"):
+        monkeypatch.setenv(f"SCANSIBLE_{name}", str(tmp_path / name.lower()))
+    from scansible.core import scanner as scanner_module
+    from scansible.core.scanner import Scanner
+
+    executed = []
+
+    class StubExecutor:
+        def __init__(self, max_workers=1, progress=None):
+            pass
+
+        def run_serial(self, tasks):
+            executed.extend(task['command'] for task in tasks)
+            return [{'success': True, 'error': None, 'stdout': discovered[tasks[0]['command'].split()[0]]}]
+
+        def run(self, tasks):
+            results = []
+            for task in tasks:
+                executed.append(task['command'])
+                Path(task['output_file']).write_text(NMAP_XML.format(hosts=HOST_XML.format(index=5), count=1))
+                results.append({**task, 'success': True, 'error': None})
+            return results
+
+    monkeypatch.setattr(scanner_module, "CommandExecutor", StubExecutor)
+    scanner = Scanner()
+    monkeypatch.setattr(scanner.tools, "missing_nse_scripts", lambda command: [])
+    monkeypatch.setattr(scanner.tools, "is_available", lambda tool: tool in installed)
+    return scanner, executed
+
+
+def test_pipeline_scan_deep_scans_discovered_ports(tmp_path, monkeypatch):
+    """Teste le pipeline découverte puis scan approfondi, et son arrêt quand nmap est absent."""
+    installed = {'rustscan', 'nmap'}
+    discovered = {'rustscan': "10.0.0.5 -> [22,80]\n10.0.0.6 -> [22,80]\n"}
+    scanner, executed = _pipeline_scanner(monkeypatch, tmp_path, discovered, installed)
+
+    success, xml_path = scanner.run_pipeline_scan(COMMANDS, "10.0.0.5 10.0.0.6", 2, tmp_path)
+    assert success and "10.0.0.5" in Path(xml_path).read_text()
+    assert executed[0].startswith("rustscan -a 10.0.0.5,10.0.0.6 -g")
+    # Les hôtes aux mêmes ports ouverts partagent un seul scan approfondi
+    output_file = tmp_path / "scan_report_0_0.xml"
+    assert executed[1:] == [f"nmap -sV -p 22,80  10.0.0.5 10.0.0.6 -oX {output_file}"]
+
+    executed.clear()
+    installed.discard('nmap')
+    assert scanner.run_pipeline_scan(COMMANDS, "10.0.0.5", 2, tmp_path)[0] is False
+    assert executed == []
+
+
+def test_pipeline_scan_without_open_ports(tmp_path, monkeypatch, capsys):
+    """Teste qu'aucun scan approfondi n'est lancé quand la découverte ne trouve aucun port ouvert."""
+    scanner, executed = _pipeline_scanner(monkeypatch, tmp_path, {'rustscan': ""}, {'rustscan', 'nmap'})
+
+    success, xml_path = scanner.run_pipeline_scan(COMMANDS, "10.0.0.5", 2, tmp_path)
+    assert success is True and "No open ports discovered" in capsys.readouterr().out
+    assert len(executed) == 1 and not Path(xml_path).exists()
+
+
+def test_pipeline_scan_falls_back_when_rustscan_is_missing(tmp_path, monkeypatch):
+    """Teste que la commande de découverte suivante est utilisée quand rustscan n'est pas installé."""
+    discovered = {'nmap': "Host: 10.0.0.5 ()\tPorts: 22/open/tcp//ssh///, 443/open/tcp//https///\n"}
+    scanner, executed = _pipeline_scanner(monkeypatch, tmp_path, discovered, {'nmap'})
+
+    success, _ = scanner.run_pipeline_scan(COMMANDS, "10.0.0.5 10.0.0.6", 2, tmp_path)
+    assert success
+    # nmap reçoit la cible telle quelle, sans la liste séparée par des virgules de rustscan
+    assert executed[0].startswith("nmap -p- --open 10.0.0.5 10.0.0.6 -oG -")
+    assert len(executed) == 2 and executed[1].startswith("nmap -sV -p 22,443  10.0.0.5 -oX ")
@@ -0,0 +1,32 @@
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.executor import CommandExecutor
+from scansible.core.progress import PROGRESS_PREFIX, ProgressTracker, parse_nmap_stats, print_progress_json
+
+
+def test_progress_from_nmap_stats():
+    """Teste le suivi de progression à partir des lignes --stats-every de nmap."""
+    line = "SYN Stealth Scan Timing: About 45.20% done; ETC: 12:34 (0:01:23 remaining)"
+    assert parse_nmap_stats(line) == {'fraction': 0.452, 'remaining': 83}
+
+    snapshots = []
+    tracker = ProgressTracker(snapshots.append, min_interval=0)
+    script = f"print({line!r}, flush=True)"
+    tasks = [{'name': 'stats', 'command': f'{sys.executable} -c "{script}"'}, {'name': 'done', 'command': 'true'}]
+    CommandExecutor(max_workers=1, progress=tracker).run_serial(tasks)
+
+    assert any(snapshot['percent'] == 22 and snapshot['current_task'] == 'stats' for snapshot in snapshots)
+    assert snapshots[-1]['percent'] == 100
+
+
+def test_print_progress_json(capsys):
+    """Teste la ligne de progression lisible par les scripts qui enveloppent la CLI."""
+    print_progress_json({'percent': 40, 'current_task': 'Version'})
+    line = capsys.readouterr().out
+    assert line.startswith(PROGRESS_PREFIX) and line.endswith("\n")
+    assert json.loads(line[len(PROGRESS_PREFIX):]) == {'percent': 40, 'current_task': 'Version'}
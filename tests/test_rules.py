@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.ingest import ingest_nmap_xml
+from scansible.core.model import Host, Port, Service, Script, Vulnerability
+from scansible.core.rules import Rule, RuleSet, get_rule_set, load_rules
+from scansible.utils.simple_ai_reporter import ReportGenerator
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+RULES = """
+- id: ssh
+  service: ssh
+  recommendation: Use keys
+- id: old-openssh
+  product: openssh
+  version: '>=7.0,<9.3p2'
+  severity: medium
+  recommendation: Upgrade OpenSSH
+- id: dns-udp
+  port: 53/udp
+  recommendation: Restrict DNS
+- id: agent
+  cve: CVE-2023-38408
+  min_cvss: 9.0
+  severity: critical
+  recommendation: Patch ssh-agent
+- id: broken
+  version: 'around 8'
+  recommendation: Never loaded
+- id: always
+  recommendation: Patch regularly
+"""
+
+
+def _port(portid, name, product=None, version=None, protocol="tcp", vulns=()):
+    return Port(protocol, portid, "open", Service(name, product, version),
+                [Script("vulners", "", [Vulnerability(vuln, cvss) for vuln, cvss in vulns])])
+
+
+def test_rules_loaded_and_indexed(tmp_path):
+    """Teste le chargement des règles YAML, leur indexation et leur évaluation par port."""
+    (tmp_path / "rules.yml").write_text(RULES)
+    rules = RuleSet(load_rules(tmp_path))
+    assert [rule.id for rule in rules.rules] == ["ssh", "old-openssh", "dns-udp", "agent", "always"]
+    assert [rule.id for rule in rules.general] == ["always"]
+
+    ssh = _port("22", "ssh", "OpenSSH", "8.9p1 Ubuntu 3", vulns=[("CVE-2023-38408", 9.8)])
+    assert {rule.id for rule in rules.candidates(ssh)} == {"ssh", "old-openssh", "agent"}
+    hosts = [Host("10.0.0.1", ports=[ssh, _port("53", "domain", protocol="udp"), _port("53", "domain")]),
+             Host("10.0.0.2", ports=[_port("2222", "ssh", "OpenSSH", "9.6p1")])]
+    matches = rules.evaluate(hosts)
+    # Les règles les plus graves d'abord, puis dans l'ordre des fichiers
+    assert [(match.rule.id, match.locations) for match in matches] == [
+        ("agent", ["10.0.0.1:22/tcp"]),
+        ("old-openssh", ["10.0.0.1:22/tcp"]),
+        ("ssh", ["10.0.0.1:22/tcp", "10.0.0.2:2222/tcp"]),
+        ("dns-udp", ["10.0.0.1:53/udp"]),
+    ]
+    strict = Rule.from_dict({"id": "strict", "cve": "CVE-2023-38408", "min_cvss": 9.9, "recommendation": "x"})
+    assert not strict.matches(ssh)
+
+
+def test_product_and_cvss_rules_are_indexed():
+    """Teste que les règles sur un produit ou un score CVSS ne sont pas évaluées sur tous les ports."""
+    rules = RuleSet([Rule.from_dict({"id": "apache", "product": "Apache httpd", "recommendation": "x"}),
+                     Rule.from_dict({"id": "critical", "min_cvss": 9.0, "recommendation": "x"}),
+                     Rule.from_dict({"id": "any-version", "version": "<2", "recommendation": "x"})])
+    assert [rule.id for rule in rules._unindexed] == ["any-version"]
+
+    apache = _port("80", "http", "Apache httpd", "2.4.57")
+    nginx = _port("443", "https", "nginx", "1.25.3", vulns=[("CVE-2023-44487", 7.5)])
+    assert {rule.id for rule in rules.candidates(apache)} == {"apache", "any-version"}
+    assert {rule.id for rule in rules.candidates(nginx)} == {"critical", "any-version"}
+    assert rules.rules[0].matches(apache)
+    assert not rules.rules[0].matches(_port("80", "http", "httpd-tools"))
+
+
+def test_report_lists_matched_rules(tmp_path):
+    """Teste que le rapport markdown reprend les règles par défaut déclenchées par le scan."""
+    xml_path = tmp_path / "scan.xml"
+    xml_path.write_text(NMAP_XML.format(hosts=HOST_XML.format(index=1), count=1))
+    json_path = tmp_path / "report.json"
+    ingest_nmap_xml(xml_path, json_path)
+
+    generator = ReportGenerator()
+    scan_info = generator.extract_basic_info(json_path)
+    ids = [recommendation['id'] for recommendation in scan_info['recommendations']]
+    assert ids[:3] == ["openssh-agent-forwarding", "critical-cvss", "high-cvss"]
+    assert "ssh-key-auth" in ids and "web-waf" not in ids and "openssh-outdated" not in ids
+
+    report = generator.generate_basic_report(scan_info, "10.0.0.1", "basic")
+    assert "- **[CRITICAL]** Upgrade OpenSSH to 9.3p2" in report
+    assert "- Use key-based authentication instead of passwords for SSH (10.0.0.1:22/tcp)" in report
+    assert "- Implement a regular patching schedule for all services" in report
+    assert get_rule_set(generator.rules_dir) is get_rule_set(generator.rules_dir)
@@ -0,0 +1,66 @@
+import sys
+import threading
+from pathlib import Path
+
+import yaml
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def test_concurrent_scans_keep_their_own_artifacts(tmp_path, monkeypatch):
+    """Teste que des scans simultanés écrivent dans leurs propres répertoires et renvoient leurs chemins."""
+    for name in ("REPORTS_DIR", "SCANS_DIR", "CACHE_DIR"):
+        monkeypatch.setenv(f"SCANSIBLE_{name}", str(tmp_path / name.lower()))
+    monkeypatch.setenv("SCANSIBLE_VULNDB", str(tmp_path / "vulndb.sqlite"))
+    from scansible.core.scanner import Scanner
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run_direct_commands(self, commands, target, work_dir):
+        # Les deux scans se terminent dans la même seconde
+        barrier.wait()
+        xml_path = work_dir / "scan_report.xml"
+        xml_path.write_text(NMAP_XML.format(hosts=HOST_XML.format(index=target.split('.')[-1]), count=1))
+        return True, str(xml_path)
+
+    monkeypatch.setattr(Scanner, "run_direct_commands", run_direct_commands)
+
+    results = {}
+
+    def scan(scan_id, target):
+        results[scan_id] = Scanner().run_scan({'target': target, 'scan_type': 'basic', 'executor': 'direct',
+                                               'scan_id': scan_id, 'refresh': True})
+
+    threads = [threading.Thread(target=scan, args=(f"scan-{index}", f"10.0.0.{index}")) for index in (5, 6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for index, other in ((5, 6), (6, 5)):
+        result = results[f"scan-{index}"]
+        assert result['success'] and result['scan_id'] == f"scan-{index}"
+        assert result['work_dir'] == str(tmp_path / "scans_dir" / f"scan-{index}")
+        assert result['report_path'] == str(tmp_path / "reports_dir" / f"scan-{index}" / "report.json")
+        report = Path(result['report_path']).read_text()
+        assert f"10.0.0.{index}" in report and f"10.0.0.{other}" not in report
+        assert result['summary']['hosts'] == 1
+
+
+def test_ansible_playbook_never_runs_a_shell(tmp_path, monkeypatch):
+    """Teste que les sorties standard sont enregistrées sans passer la cible à un shell."""
+    for name in ("REPORTS_DIR", "SCANS_DIR", "CACHE_DIR"):
+        monkeypatch.setenv(f"SCANSIBLE_{name}", str(tmp_path / name.lower()))
+    from scansible.core.scanner import Scanner
+
+    tasks = [{'name': "Running: Fast scan", 'command': "rustscan -a 10.0.0.1;id --ulimit 5000",
+              'stdout_file': str(tmp_path / "scan_report_0_rustscan.txt"), 'tags': ['discovery']}]
+    playbook_path, _ = Scanner().generate_ansible_playbook([], "10.0.0.1;id", "rustscan", tmp_path, tasks=tasks)
+
+    run, save = yaml.safe_load(playbook_path.read_text())[0]['tasks']
+    assert 'shell' not in run and run['command'] == tasks[0]['command']
+    assert save['copy'] == {'content': f"{{{{ {run['register']}.stdout }}}}", 'dest': tasks[0]['stdout_file']}
+    assert save['tags'] == ['discovery']
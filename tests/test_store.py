@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.store import ScanStore
+
+
+def _scan(index, status="completed", scan_type="basic"):
+    return {"id": f"scan-{index:03d}", "status": status, "target": f"10.0.0.{index % 4}", "scan_type": scan_type,
+            "start_time": f"2024-01-01T00:{index // 60:02d}:{index % 60:02d}", "percent": 0,
+            "vulnerabilities_count": {"HIGH": index}}
+
+
+def test_store_batches_updates_and_survives_restart(tmp_path):
+    """Teste l'écriture groupée des progressions et la reprise de l'historique après redémarrage."""
+    store = ScanStore(tmp_path / "scans.sqlite", flush_interval=3600)
+    store.create(_scan(1, status="running"))
+    store.create(_scan(2, status="running"))
+    store.update("scan-001", percent=40, current_task="nmap")
+    assert store.get("scan-001")["percent"] == 40
+
+    # La progression attend le prochain lot, un changement de statut est écrit aussitôt
+    reopened = ScanStore(tmp_path / "scans.sqlite")
+    assert reopened.get("scan-001")["status"] == "failed"
+    store.update("scan-002", status="completed", percent=100)
+    assert ScanStore(tmp_path / "scans.sqlite").get("scan-002")["status"] == "completed"
+    assert store.get("scan-002")["vulnerabilities_count"] == {"HIGH": 2}
+    assert not store.update("missing", percent=1)
+    assert store.delete("scan-002") and store.get("scan-002") is None
+
+
+def test_store_keyset_pagination(tmp_path):
+    """Teste la pagination par curseur, avec filtres, du plus récent au plus ancien."""
+    store = ScanStore(tmp_path / "scans.sqlite")
+    for index in range(25):
+        store.create(_scan(index, scan_type="web" if index % 2 else "basic"))
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = store.list_scans(10, cursor=cursor)
+        seen.extend(scan["id"] for scan in page)
+        if cursor is None:
+            break
+    assert seen == [f"scan-{index:03d}" for index in reversed(range(25))]
+
+    # Une page ajoutée entre deux requêtes ne décale pas la suite
+    first, cursor = store.list_scans(3, scan_type="web")
+    store.create(_scan(99, scan_type="web"))
+    second, _ = store.list_scans(3, cursor=cursor, scan_type="web")
+    assert [scan["id"] for scan in first + second] == [f"scan-{index:03d}" for index in (23, 21, 19, 17, 15, 13)]
+    assert [scan["id"] for scan in store.list_scans(2, offset=1, target="10.0.0.1")[0]] == ["scan-017", "scan-013"]
+
+    with pytest.raises(ValueError):
+        store.list_scans(10, cursor="not-a-cursor")
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.model import load_scan_result
+from scansible.core.summary import load_summary, summarize, summary_path
+from tests.test_ingest import HOST_XML, NMAP_XML
+
+
+def test_summary_written_at_ingest(tmp_path, monkeypatch):
+    """Teste que le résumé est calculé pendant la conversion et relu sans reparcourir le rapport."""
+    for name in ("REPORTS_DIR", "SCANS_DIR", "CACHE_DIR"):
+        monkeypatch.setenv(f"SCANSIBLE_{name}", str(tmp_path / name.lower()))
+    monkeypatch.setenv("SCANSIBLE_VULNDB", str(tmp_path / "vulndb.sqlite"))
+    from scansible.core.scanner import Scanner
+
+    xml_path = tmp_path / "scan_report.xml"
+    xml_path.write_text(NMAP_XML.format(hosts="\n".join(HOST_XML.format(index=index) for index in (1, 2, 3)), count=3))
+
+    for report_format in ("json", "ndjson"):
+        report_path = Scanner().convert_xml_to_json(xml_path, report_format=report_format,
+                                                    output_dir=tmp_path / report_format)
+        summary = load_summary(report_path)
+        assert summary == summarize(load_scan_result(report_path))
+        assert (summary["hosts"], summary["open_ports"], summary["vulnerabilities"]) == (3, 3, 6)
+        assert summary["severities"]["CRITICAL"] == 6
+        assert summary["top_services"] == [{"name": "ssh", "count": 3}]
+        assert [cve["id"] for cve in summary["top_cves"]] == ["CVE-2023-28531", "CVE-2023-38408"]
+
+    # Un rapport sans résumé (copié depuis le cache) est résumé une seule fois
+    summary_path(report_path).unlink()
+    assert load_summary(report_path)["hosts"] == 3 and summary_path(report_path).exists()
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.targets import shard_targets
+
+
+def test_shard_targets():
+    """Teste le découpage d'une plage CIDR et d'une liste d'hôtes."""
+    shards = shard_targets("10.0.0.0/22", 256)
+    assert shards == ["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24", "10.0.3.0/24"]
+    assert shard_targets("10.0.0.1,10.0.0.2 host.example", 2) == ["10.0.0.1 10.0.0.2", "host.example"]
+
+    # Un réseau IPv6 n'est découpé qu'en un nombre borné de morceaux
+    shards = shard_targets("2001:db8::/64", 256)
+    assert len(shards) == 1024 and shards[0] == "2001:db8::/74"
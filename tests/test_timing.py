@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core import timing
+from scansible.core.timing import (
+    TimingTuner, apply_timing, build_timing_profile, get_timing_tuner, probe_latency, sample_addresses, subnet_key
+)
+
+
+def test_timing_profile_applied_to_commands():
+    """Teste le profil de timing et son application aux commandes nmap et rustscan."""
+    lan = build_timing_profile(0.001, 0.0)
+    wan = build_timing_profile(0.3, 0.25)
+    assert lan['min_rate'] > wan['min_rate']
+    assert lan['max_retries'] < wan['max_retries']
+    assert lan['batch_size'] > wan['batch_size']
+
+    nmap = apply_timing("nmap -sV -T4 [target]", lan)
+    assert "--min-rate 5000" in nmap and "--max-retries 1" in nmap and "--host-timeout 10m" in nmap
+    # Les options explicites et les templates volontairement lents sont conservés
+    assert "--min-rate 10" in apply_timing("nmap --min-rate 10 [target]", lan)
+    assert apply_timing("nmap -sS -T2 [target]", lan) == "nmap -sS -T2 [target]"
+
+    rustscan = apply_timing("rustscan -a [target] --timeout 1000 -- -sV -T4", wan)
+    assert "--timeout 1000" not in rustscan
+    assert f"-b {wan['batch_size']} --timeout {wan['timeout_ms']} -- -sV -T4" in rustscan
+    assert apply_timing("trivy image [image_name:tag]", lan) == "trivy image [image_name:tag]"
+
+
+def test_timing_tuner_measures_and_keeps_history(tmp_path):
+    """Teste l'échantillonnage, la mesure locale et l'historique par sous-réseau."""
+    assert sample_addresses("10.0.0.0/24", 4) == ["10.0.0.1", "10.0.0.64", "10.0.0.127", "10.0.0.190"]
+    assert subnet_key("10.0.0.77") == "10.0.0.0/24"
+
+    # Une connexion refusée mesure tout de même l'aller-retour
+    assert probe_latency("127.0.0.1") is not None
+
+    tuner = TimingTuner(tmp_path / "timing.json", sample_size=1)
+    profile = tuner.tune("127.0.0.1")
+    assert profile['min_rate'] == 5000
+    assert "127.0.0.0/24" in (tmp_path / "timing.json").read_text()
+
+    # Une mesure récente est réutilisée sans nouvelle sonde
+    tuner.measure = lambda addresses: {}
+    assert tuner.tune("127.0.0.1") == profile
+
+    # Les scanners des workers partagent le même historique
+    assert get_timing_tuner(tmp_path / "shared.json") is get_timing_tuner(tmp_path / "shared.json")
+
+
+def test_timing_loss_ignores_silent_addresses(tmp_path, monkeypatch):
+    """Teste que les adresses sans hôte ne comptent pas comme des pertes, contrairement aux sondes perdues."""
+    answers = {"10.0.0.1": [0.01, None, 0.01], "10.0.0.2": [None]}
+    monkeypatch.setattr(timing, "probe_latency", lambda address, timeout: answers[address].pop(0))
+
+    measurement = TimingTuner(tmp_path / "timing.json").measure(["10.0.0.1", "10.0.0.2"])["10.0.0.0/24"]
+    assert measurement['rtt'] == 0.01
+    assert round(measurement['loss'], 2) == 0.33
+
+    # Un sous-réseau dont aucune adresse ne répond n'a ni latence ni perte mesurées
+    answers["10.0.1.1"] = [None]
+    assert TimingTuner(tmp_path / "timing.json").measure(["10.0.1.1"])["10.0.1.0/24"] == {'rtt': None, 'loss': None}
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.tools import ToolRegistry
+
+
+def test_registry_caches_probe_until_binary_changes(tmp_path, monkeypatch):
+    """Teste que la version n'est sondée qu'une fois, jusqu'au changement du binaire."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    probes = tmp_path / "probes.txt"
+    tool = bin_dir / "rustscan"
+    tool.write_text(f"#!/bin/sh\necho probe >> {probes}\necho 'rustscan 2.1.1'\n")
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+
+    cache_path = tmp_path / "tools.json"
+    assert ToolRegistry(cache_path).get("rustscan")["version"] == "2.1.1"
+    # Une nouvelle instance relit le cache disque sans relancer l'outil
+    assert ToolRegistry(cache_path).is_available("rustscan")
+    assert probes.read_text().count("probe") == 1
+
+    os.utime(tool, (0, 0))
+    ToolRegistry(cache_path).get("rustscan")
+    assert probes.read_text().count("probe") == 2
+    assert not ToolRegistry(cache_path).is_available("trivy")
+
+    # Les commandes inconnues sont seulement localisées, jamais exécutées
+    other = bin_dir / "rm"
+    other.write_text(f"#!/bin/sh\necho probe >> {probes}\n")
+    other.chmod(0o755)
+    assert ToolRegistry(cache_path).is_available("rm")
+    assert probes.read_text().count("probe") == 2
+    assert "rm" not in json.loads((tmp_path / "tools.json").read_text())
+
+
+def test_missing_nse_scripts(tmp_path, monkeypatch):
+    """Teste la détection des scripts NSE absents."""
+    scripts_dir = tmp_path / "scripts"
+    scripts_dir.mkdir()
+    (scripts_dir / "http-title.nse").write_text("")
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "nmap").write_text("#!/bin/sh\necho 'Nmap version 7.94'\n")
+    (bin_dir / "nmap").chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv("NMAPDIR", str(tmp_path))
+
+    registry = ToolRegistry(tmp_path / "tools.json")
+    assert registry.get("nmap")["version"] == "7.94"
+    assert registry.missing_nse_scripts("nmap -sV --script vulners,http-title,default [target]") == ["vulners"]
+    assert registry.missing_nse_scripts('nmap --script "http-*" [target]') == []
@@ -0,0 +1,52 @@
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import scansible.core.trivy as trivy
+from scansible.core.model import build_scan_result
+from scansible.core.trivy import ingest_trivy_json, is_trivy_report, iter_trivy_findings
+
+
+def _vulnerability(index, severity):
+    return {"VulnerabilityID": f"CVE-2024-{index:04d}", "PkgName": f"pkg{index}", "InstalledVersion": "1.0",
+            "Severity": severity, "Description": "x" * 200, "CVSS": {"nvd": {"V3Score": 7.5}}}
+
+
+def test_streaming_image_report_matches_full_parse(tmp_path, monkeypatch):
+    """Teste que la lecture en flux d'un rapport d'image donne le même résultat que json.load."""
+    # De petits blocs forcent les valeurs à chevaucher plusieurs lectures
+    monkeypatch.setattr(trivy, "CHUNK_SIZE", 7)
+    report = {"SchemaVersion": 2, "ArtifactName": "alpine:3.18", "Results": [
+        {"Target": "alpine:3.18 (alpine 3.18.0)", "Class": "os-pkgs", "Misconfigurations": [{"ID": "x"}],
+         "Vulnerabilities": [_vulnerability(index, severity) for index, severity in enumerate(["HIGH", "LOW"])]},
+        {"Target": "app/package-lock.json", "Vulnerabilities": None},
+    ]}
+    report_path = tmp_path / "trivy.json"
+    report_path.write_text(json.dumps(report, indent=2))
+
+    assert is_trivy_report(report_path)
+    streamed = [(f.target, f.package, f.vulnerability.id, f.vulnerability.cvss) for f in iter_trivy_findings(report_path)]
+    loaded = [(f.target, f.package, f.vulnerability.id, f.vulnerability.cvss) for f in build_scan_result(report).packages]
+    assert streamed == loaded
+    assert ingest_trivy_json(report_path)['HIGH'] == 1
+
+
+def test_streaming_k8s_report(tmp_path):
+    """Teste un rapport 'trivy k8s --report=all' : les résultats sont rattachés à leur ressource."""
+    report = {"ClusterName": "prod", "Resources": [
+        {"Namespace": "default", "Kind": "Deployment", "Name": "web", "Results": [
+            {"Target": "nginx:1.25", "Vulnerabilities": [_vulnerability(1, "CRITICAL")]}]},
+        {"Namespace": "kube-system", "Kind": "DaemonSet", "Name": "proxy", "Results": [
+            {"Target": "kube-proxy", "Vulnerabilities": [_vulnerability(2, "MEDIUM"), _vulnerability(3, "weird")]}]},
+    ]}
+    report_path = tmp_path / "k8s.json"
+    report_path.write_text(json.dumps(report))
+
+    findings = list(iter_trivy_findings(report_path))
+    assert [finding.target for finding in findings] == [
+        "default/Deployment/web: nginx:1.25", "kube-system/DaemonSet/proxy: kube-proxy", "kube-system/DaemonSet/proxy: kube-proxy"]
+    counts = ingest_trivy_json(report_path)
+    assert (counts['CRITICAL'], counts['MEDIUM'], counts['UNKNOWN']) == (1, 1, 1)
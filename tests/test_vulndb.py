@@ -0,0 +1,110 @@
+import gzip
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scansible.core.model import Service, load_scan_result, model_path, parse_nmap_host
+from scansible.core.vulndb import VulnDB, annotate_host_record, get_vulndb, match_report, parse_cpe, version_key
+
+NVD_FEED = {"vulnerabilities": [
+    {"cve": {"id": "CVE-2023-38408", "metrics": {"cvssMetricV31": [
+        {"cvssData": {"baseScore": 9.8, "baseSeverity": "CRITICAL"}}]},
+        "configurations": [{"nodes": [{"cpeMatch": [
+            {"vulnerable": True, "criteria": "cpe:2.3:a:openbsd:openssh:*:*:*:*:*:*:*:*",
+             "versionEndExcluding": "9.3p2"}]}]}]}},
+    {"cve": {"id": "CVE-2020-15778", "metrics": {"cvssMetricV2": [
+        {"cvssData": {"baseScore": 6.8}, "baseSeverity": "MEDIUM"}]},
+        "configurations": [{"nodes": [{"cpeMatch": [
+            {"vulnerable": True, "criteria": "cpe:2.3:a:openbsd:openssh:8.2:p1:*:*:*:*:*:*"}]}]}]}},
+]}
+
+LEGACY_FEED = {"CVE_Items": [
+    {"cve": {"CVE_data_meta": {"ID": "CVE-2021-41773"}},
+     "impact": {"baseMetricV3": {"cvssV3": {"baseScore": 7.5, "baseSeverity": "HIGH"}}},
+     "configurations": {"nodes": [{"operator": "OR", "children": [], "cpe_match": [
+         {"vulnerable": True, "cpe23Uri": "cpe:2.3:a:apache:http_server:2.4.49:*:*:*:*:*:*:*"}]}]}},
+]}
+
+HOST_RECORD = {
+    "status": {"@state": "up"},
+    "address": {"@addr": "10.0.0.1", "@addrtype": "ipv4"},
+    "ports": {"port": [
+        {"@protocol": "tcp", "@portid": "22", "state": {"@state": "open"},
+         "service": {"@name": "ssh", "@product": "OpenSSH", "@version": "8.2p1 Ubuntu 4ubuntu0.5",
+                     "cpe": "cpe:/a:openbsd:openssh:8.2p1"}},
+        {"@protocol": "tcp", "@portid": "80", "state": {"@state": "open"},
+         "service": {"@name": "http", "@product": "Apache httpd", "@version": "2.4.50"}},
+    ]},
+}
+
+
+def _database(tmp_path):
+    db = VulnDB(tmp_path / "vulndb.sqlite")
+    (tmp_path / "nvd.json").write_text(json.dumps(NVD_FEED))
+    with gzip.open(tmp_path / "legacy.json.gz", "wt") as feed:
+        json.dump(LEGACY_FEED, feed)
+    assert db.import_feed(tmp_path / "nvd.json") == 2
+    assert db.import_feed(tmp_path / "legacy.json.gz") == 1
+    return db
+
+
+def test_cpe_and_version_parsing():
+    """Teste le découpage des CPE 2.2/2.3 et la comparaison des versions."""
+    assert parse_cpe("cpe:/a:openbsd:openssh:8.2p1") == ("a", "openbsd", "openssh", "8.2p1")
+    assert parse_cpe("cpe:2.3:a:openbsd:openssh:8.2:p1:*:*:*:*:*:*") == ("a", "openbsd", "openssh", "8.2p1")
+    assert version_key("8.10") > version_key("8.9")
+    assert version_key("8.2p1") < version_key("9.3p2")
+
+
+def test_match_service_by_cpe_and_range(tmp_path):
+    """Teste la correspondance d'un service par CPE, sur une version exacte et une plage de versions."""
+    db = _database(tmp_path)
+    label, matches = db.match_service(Service("ssh", "OpenSSH", "8.2p1 Ubuntu", cpes=["cpe:/a:openbsd:openssh:8.2p1"]))
+    assert label == "cpe:/a:openbsd:openssh:8.2p1"
+    assert [(vuln.id, vuln.severity) for vuln in matches] == [("CVE-2023-38408", "CRITICAL"), ("CVE-2020-15778", "MEDIUM")]
+    assert db.match_service(Service("ssh", "OpenSSH", "9.4p1", cpes=["cpe:/a:openbsd:openssh"]))[1] == []
+    # Sans version détectée, aucune correspondance n'est tentée
+    assert db.match_service(Service("ssh", "OpenSSH", None, cpes=["cpe:/a:openbsd:openssh"]))[1] == []
+
+
+def test_shared_database_sees_feeds_imported_elsewhere(tmp_path):
+    """Teste que la base partagée oublie ses correspondances après un import fait par un autre processus."""
+    db_path = tmp_path / "vulndb.sqlite"
+    with gzip.open(tmp_path / "legacy.json.gz", "wt") as feed:
+        json.dump(LEGACY_FEED, feed)
+    (tmp_path / "nvd.json").write_text(json.dumps(NVD_FEED))
+    other = VulnDB(db_path)
+    other.import_feed(tmp_path / "legacy.json.gz")
+
+    shared = get_vulndb(db_path)
+    service = Service("ssh", "OpenSSH", "8.2p1", cpes=["cpe:/a:openbsd:openssh:8.2p1"])
+    before = [vuln.id for vuln in shared.match_service(service)[1]]
+
+    other.import_feed(tmp_path / "nvd.json")
+    os.utime(db_path, (time.time() + 5, time.time() + 5))
+    after = [vuln.id for vuln in get_vulndb(db_path).match_service(service)[1]]
+    assert "CVE-2023-38408" in after and "CVE-2023-38408" not in before
+    other.close()
+
+
+def test_annotated_record_is_parsed_and_rematch_is_idempotent(tmp_path):
+    """Teste l'ajout du script vulndb au rapport et sa mise à jour sans doublon."""
+    db = _database(tmp_path)
+    record = json.loads(json.dumps(HOST_RECORD))
+    assert annotate_host_record(record, db) == 2
+    host = parse_nmap_host(record)
+    assert [vuln.id for vuln in host.ports[0].vulnerabilities] == ["CVE-2023-38408", "CVE-2020-15778"]
+    assert list(host.ports[1].vulnerabilities) == []
+
+    report = tmp_path / "report.json"
+    report.write_text(json.dumps({"nmaprun": {"@scanner": "nmap", "host": record}}))
+    assert match_report(report, db) == 2
+    assert not model_path(report).exists()
+    result = load_scan_result(report)
+    assert result.severity_counts()["CRITICAL"] == 1
+    assert [script.id for script in result.hosts[0].ports[0].scripts] == ["vulndb"]
@@ -0,0 +1,39 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au chemin Python pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.workers import ScanWorkerPool
+
+
+def test_pool_bounds_concurrency_and_reuses_scanners():
+    """Teste que le nombre de scans simultanés est borné et que chaque worker garde son scanner."""
+    created = []
+    pool = ScanWorkerPool(2, scanner_factory=lambda: created.append(object()) or created[-1])
+    lock = threading.Lock()
+    running = []
+    peak = []
+    used = []
+
+    def job(scanner):
+        with lock:
+            running.append(scanner)
+            peak.append(len(running))
+            used.append(scanner)
+        time.sleep(0.02)
+        with lock:
+            running.remove(scanner)
+
+    for _ in range(6):
+        pool.submit(job)
+    # Un scan en échec ne bloque pas le worker
+    pool.submit(lambda scanner: 1 / 0)
+    pool.join()
+
+    assert len(used) == 6 and max(peak) == 2
+    assert len(created) == 2 and set(map(id, used)) == set(map(id, created))
+    assert (pool.pending, pool.busy) == (0, 0)
+    pool.shutdown()